@@ -1,9 +1,112 @@
+import argparse
+import sys
+
 from app.ledger import Ledger
-from database.database import InMemoryDatabase
+from app.report_cache import DEFAULT_REPORT_CACHE_ROWS
+from database.database import InMemoryDatabase, DEFAULT_ACCOUNT_CACHE_SIZE
 from cli.ledger_shell import LedgerShell
 
+# Modules only some runs need (storage backends, metrics sinks, import and script mode) are
+# imported where they are used, start up time is measured by benchmarks/cold_start.py.
+
 
 if __name__ == "__main__":
-    db = InMemoryDatabase()
-    ledger = Ledger(db)
-    LedgerShell(ledger).cmdloop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Double-entry transaction ledger shell")
+    parser.add_argument("--database", type=str, default=None, help="Path to a sqlite database file. Defaults to in-memory storage.")
+    parser.add_argument("--journal", type=str, default=None, metavar="DIR", help="Keep data in memory, made durable by a journal and snapshots in DIR.")
+    parser.add_argument("--mapped", type=str, default=None, metavar="DIR", help="Store postings in memory-mapped append-only files in DIR, opened without loading them.")
+    parser.add_argument("--account-cache-size", type=int, default=DEFAULT_ACCOUNT_CACHE_SIZE, metavar="N", help="Number of accounts cached in front of the sqlite database. 0 disables the cache.")
+    parser.add_argument("--report-cache-rows", type=int, default=DEFAULT_REPORT_CACHE_ROWS, metavar="N", help="Rows of trial balance, transaction and T-account reports kept cached. 0 disables the cache.")
+    parser.add_argument("--change-feed-capacity", type=int, default=0, metavar="N", help="Publish added accounts and posted transactions to a change feed keeping the latest N changes, read by get_changes on a --serve server.")
+    parser.add_argument("--import-transactions", type=str, default=None, metavar="PATH", help="Import transactions from a CSV or JSONL file and exit instead of starting the shell.")
+    parser.add_argument("--script", type=str, default=None, metavar="PATH", help="Run the shell commands in PATH, or stdin for -, and exit with a summary instead of starting the shell.")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of every command run by --script.")
+    parser.add_argument("--serve", type=str, default=None, metavar="ADDRESS", help="Serve the ledger on the Unix socket ADDRESS, or HOST:PORT over TCP on a loopback address, until interrupted instead of starting the shell.")
+    parser.add_argument("--connect", type=str, default=None, metavar="ADDRESS", help="Use the ledger served at ADDRESS by --serve instead of opening storage.")
+    parser.add_argument("--metrics", action="store_true", help="Collect operation counters and latencies, shown by the stats command.")
+    parser.add_argument("--metrics-file", type=str, default=None, metavar="PATH", help="Also write metrics in Prometheus text format to PATH on every stats command and on exit. Implies --metrics.")
+    parser.add_argument("--metrics-log", action="store_true", help="Also log metrics on every stats command and on exit. Implies --metrics.")
+    args = parser.parse_args()
+    if sum(1 for storage in (args.database, args.journal, args.mapped) if storage) > 1:
+        parser.error("Only one of --database, --journal and --mapped can be given.")
+    if args.connect and (args.database or args.journal or args.mapped or args.serve):
+        parser.error("--connect can't be combined with --database, --journal, --mapped or --serve.")
+    if args.connect:
+        db = None
+    elif args.database:
+        from database.sqlite_database import SqliteDatabase
+        # A server uses the connection from its request threads, one request at a time
+        db = SqliteDatabase(args.database, check_same_thread=not args.serve)
+    elif args.journal:
+        from database.journal import JournaledDatabase
+        db = JournaledDatabase(args.journal)
+    elif args.mapped:
+        from database.mapped_database import MappedDatabase
+        db = MappedDatabase(args.mapped)
+    else:
+        db = InMemoryDatabase()
+    storage = db
+    if args.database and args.account_cache_size > 0:
+        from database.cached_database import CachedDatabase
+        db = CachedDatabase(db, args.account_cache_size)
+    registry = None
+    if args.metrics or args.metrics_file or args.metrics_log:
+        from database.instrumented_database import InstrumentedDatabase
+        from metrics.registry import MetricsRegistry, LogSink, PrometheusFileSink, enable
+        sinks = []
+        if args.metrics_file:
+            sinks.append(PrometheusFileSink(args.metrics_file))
+        if args.metrics_log:
+            import logging
+            logging.basicConfig(level=logging.INFO)
+            sinks.append(LogSink())
+        registry = enable(MetricsRegistry(sinks))
+        if db is not None:
+            db = InstrumentedDatabase(db)
+    if args.connect:
+        from app.ledger_client import LedgerClient
+        from app.protocol import parse_address
+        ledger = storage = LedgerClient(parse_address(args.connect))
+    else:
+        ledger = Ledger(db, args.report_cache_rows, args.change_feed_capacity)
+    if args.serve:
+        import signal
+        from app.ledger_server import LedgerServer
+        from app.protocol import parse_address
+        # Only the in-memory backends are safe to share between threads
+        try:
+            server = LedgerServer(ledger, parse_address(args.serve), thread_safe=not (args.database or args.mapped))
+        except ValueError as e:
+            parser.error(str(e))
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Serving the ledger on {args.serve}", flush=True)
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.close()
+    elif args.import_transactions:
+        from cli.transaction_import import import_transactions
+        summary = import_transactions(
+            ledger,
+            args.import_transactions,
+            on_reject=lambda line_number, reason: print(f"Line {line_number} rejected: {reason}"))
+        print(summary)
+    elif args.script:
+        from cli.script_runner import run_script
+        script = sys.stdin if args.script == "-" else open(args.script)
+        with script:
+            summary = run_script(
+                LedgerShell(ledger),
+                script,
+                echo=args.verbose,
+                on_error=lambda line_number, reason: print(f"Line {line_number}: {reason}"))
+        print(summary)
+    else:
+        LedgerShell(ledger).cmdloop()
+    close = getattr(storage, "close", None)
+    if close is not None:
+        close()
+    if registry is not None:
+        registry.flush()
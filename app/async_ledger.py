@@ -0,0 +1,207 @@
+import asyncio
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Iterable
+
+from app.ledger import build_transaction_report, build_trial_balance_report
+from database.async_database import AsyncAbstractDatabase
+from database.transaction_dao import check_period_open, check_transaction, screen_transactions
+from models.account import Account
+from models.period_close import PeriodClose
+from models.report import TransactionReport, TrialBalanceReport
+from models.transaction import Transaction, TransactionBatchResult, TransactionCursor
+
+# Most transactions written by one storage call when concurrent add_transaction calls are coalesced
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+class AsyncLedger:
+    # The Ledger API for asyncio callers, over an AsyncAbstractDatabase.
+    #
+    # Writes are serialised by one asyncio lock, so duplicate checks can't race. add_transaction
+    # calls made while a write is in flight are queued and written together as the next batch,
+    # with one duplicate lookup, one account lookup and one insert. Reads don't take the lock and
+    # run concurrently with each other and with writes. Like Ledger, current balances are kept in
+    # memory; all state lives on the event loop thread, so it needs no other locking.
+
+    def __init__(self, db: AsyncAbstractDatabase, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.db = db
+        self.max_batch_size = max_batch_size
+        self.running_balance_cache = defaultdict(int)
+        self.latest_timestamp: datetime | None = None
+        self.period_closes: list[PeriodClose] = []
+        self.write_lock = asyncio.Lock()
+        self.pending: list[tuple[Transaction, asyncio.Future]] = []
+        self.writer: asyncio.Task | None = None
+
+    @classmethod
+    async def open(cls, db: AsyncAbstractDatabase, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> "AsyncLedger":
+        ledger = cls(db, max_batch_size)
+        ledger.latest_timestamp = await db.get_latest_timestamp()
+        ledger.period_closes = await db.list_period_closes()
+        if ledger.latest_timestamp is not None:
+            account_ids = [account.id for account in await db.list_accounts()]
+            ledger.running_balance_cache.update(await db.get_balances(account_ids, ledger.latest_timestamp))
+        return ledger
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            await self.writer
+        await self.db.close()
+
+    async def add_account(self, account: Account) -> None:
+        async with self.write_lock:
+            if await self.db.get_account(account.id) is not None:
+                raise ValueError(f"Account with id {account.id} already exists.")
+            if await self.db.get_account_by_name(account.name) is not None:
+                raise ValueError(f"Account with name '{account.name}' already exists.")
+            await self.db.add_account(account)
+
+    async def get_account(self, account_id: int) -> Account | None:
+        return await self.db.get_account(account_id)
+
+    async def add_transaction(self, transaction: Transaction) -> None:
+        # Returns once the transaction is stored, raises ValueError if it was rejected
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((transaction, future))
+        if self.writer is None or self.writer.done():
+            self.writer = asyncio.create_task(self._write_pending())
+        await future
+
+    async def add_transactions(self, transactions: Iterable[Transaction], atomic: bool = True) -> TransactionBatchResult:
+        async with self.write_lock:
+            return await self._add_batch(list(transactions), atomic)
+
+    async def _write_pending(self) -> None:
+        while self.pending:
+            # Let callers scheduled in the same loop iteration join the batch
+            await asyncio.sleep(0)
+            batch, self.pending = self.pending[:self.max_batch_size], self.pending[self.max_batch_size:]
+            try:
+                async with self.write_lock:
+                    result = await self._add_batch([transaction for transaction, _ in batch], atomic=False)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            reasons = {id(transaction): reason for transaction, reason in result.rejected}
+            for transaction, future in batch:
+                if future.done():
+                    continue
+                if id(transaction) in reasons:
+                    future.set_exception(ValueError(reasons[id(transaction)]))
+                else:
+                    future.set_result(None)
+
+    async def _add_batch(self, transactions: list[Transaction], atomic: bool) -> TransactionBatchResult:
+        # Callers hold self.write_lock
+        existing_ids, known_accounts = await asyncio.gather(
+            self.db.get_existing_transaction_ids([transaction.id for transaction in transactions]),
+            self.db.get_accounts({entry.account_id for transaction in transactions for entry in transaction.entries}))
+        result = screen_transactions(transactions, existing_ids, known_accounts, atomic, self._validate_transaction)
+        if result.added:
+            await self.db.add_transactions(list(result.added))
+        for transaction in result.added:
+            self._post_to_running_balances(transaction)
+        return result
+
+    def _validate_transaction(self, transaction: Transaction, known_accounts: dict[int, Account]) -> None:
+        check_period_open(transaction, self.closed_through)
+        check_transaction(transaction, known_accounts)
+
+    @property
+    def closed_through(self) -> datetime | None:
+        # Postings dated at or before this timestamp fall in a closed period
+        return self.period_closes[-1].timestamp if self.period_closes else None
+
+    async def close_period(self, timestamp: datetime) -> PeriodClose:
+        # Like Ledger.close_period. The write lock keeps postings out while the balances are taken.
+        async with self.write_lock:
+            closed_through = self.closed_through
+            if closed_through is not None and timestamp <= closed_through:
+                raise ValueError(f"Periods up to {closed_through.isoformat()} are already closed.")
+            account_ids = [account.id for account in await self.db.list_accounts()]
+            period_close = PeriodClose(timestamp=timestamp, balances=await self._get_balances(account_ids, timestamp))
+            await self.db.add_period_close(period_close)
+            self.period_closes.append(period_close)
+            return period_close
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return list(self.period_closes)
+
+    def _post_to_running_balances(self, transaction: Transaction) -> None:
+        for entry in transaction.entries:
+            self.running_balance_cache[entry.account_id] += entry.value
+        if self.latest_timestamp is None or transaction.timestamp > self.latest_timestamp:
+            self.latest_timestamp = transaction.timestamp
+
+    async def get_transaction(self, transaction_id: int) -> Transaction | None:
+        return await self.db.get_transaction(transaction_id)
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> AsyncIterator[Transaction]:
+        return self.db.iter_transactions(start, end, account_ids, after)
+
+    async def get_transaction_report(
+            self,
+            timestamp: datetime,
+            start: datetime | None = None,
+            account_ids: list[int] | None = None,
+            page_size: int | None = None,
+            after: TransactionCursor | None = None) -> TransactionReport:
+        if page_size is not None and page_size < 1:
+            raise ValueError(f"Page size must be at least 1, got {page_size}.")
+        if account_ids is None:
+            accounts = await self.db.list_accounts()
+        else:
+            accounts_by_id = await self.db.get_accounts(account_ids)
+            missing_ids = [account_id for account_id in account_ids if account_id not in accounts_by_id]
+            if missing_ids:
+                raise ValueError(f"Account with ID {missing_ids[0]} does not exist.")
+            accounts = list(accounts_by_id.values())
+        transactions = []
+        iterator = self.iter_transactions(start, timestamp, account_ids, after)
+        try:
+            async for transaction in iterator:
+                transactions.append(transaction)
+                if page_size is not None and len(transactions) > page_size:
+                    break
+        finally:
+            await iterator.aclose()
+        return build_transaction_report(timestamp, accounts, transactions, start, page_size)
+
+    async def get_historic_balance(self, account_id: int, timestamp: datetime) -> tuple[Account, int]:
+        account = await self.get_account(account_id)
+        if account is None:
+            raise ValueError(f"Account with ID {account_id} does not exist.")
+        return (await self._get_historic_balances([account], timestamp))[0]
+
+    async def _get_historic_balances(self, account_list: list[Account], timestamp: datetime) -> list[tuple[Account, int]]:
+        if self.latest_timestamp is None or timestamp >= self.latest_timestamp:
+            return [(account, self.running_balance_cache[account.id]) for account in account_list]
+        account_balances = await self._get_balances([account.id for account in account_list], timestamp)
+        return [(account, account_balances[account.id]) for account in account_list]
+
+    async def _get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        # Like TransactionDao.get_balances, only the postings since the latest close at or before the timestamp are summed
+        position = bisect_right(self.period_closes, timestamp, key=lambda period_close: period_close.timestamp)
+        if position == 0:
+            return await self.db.get_balances(account_ids, timestamp)
+        period_close = self.period_closes[position - 1]
+        changes = await self.db.get_balance_changes(account_ids, period_close.timestamp, timestamp)
+        return {account_id: period_close.balances.get(account_id, 0) + change for account_id, change in changes.items()}
+
+    async def get_account_balance(self, account_id: int) -> tuple[Account, int]:
+        account = await self.get_account(account_id)
+        if account is None:
+            raise ValueError(f"Account with ID {account_id} does not exist.")
+        return account, self.running_balance_cache[account_id]
+
+    async def get_trial_balance_report(self, timestamp: datetime) -> TrialBalanceReport:
+        accounts = await self.db.list_accounts()
+        return build_trial_balance_report(timestamp, await self._get_historic_balances(accounts, timestamp))
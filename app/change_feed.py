@@ -0,0 +1,155 @@
+import threading
+from collections import deque
+from typing import Iterator
+
+from metrics import registry as metrics
+from models.account import Account
+from models.change import Change, ChangeKind
+from models.transaction import Transaction
+
+# Changes kept for subscribers to catch up on and resume from
+DEFAULT_CHANGE_FEED_CAPACITY = 10_000
+
+# Most changes returned by one poll
+DEFAULT_POLL_SIZE = 1000
+
+class ChangeFeed:
+    # An ordered, bounded buffer of the most recent capacity changes of a Ledger.
+    #
+    # Subscribers read at their own pace from a sequence number, and may resume from the sequence
+    # number of the last change they saw as long as the changes after it are still buffered. A
+    # subscriber that falls further behind gets a ValueError on its next poll and has to start over
+    # from fresh balances. Subscriptions made with backpressure=True never fall behind: publishing
+    # waits for them instead of dropping a change they haven't read. Writers wait in
+    # wait_for_space before taking any ledger lock, so a subscriber may query the ledger while
+    # writers are blocked on it; concurrent writers may overshoot capacity by one change each.
+
+    def __init__(self, capacity: int = DEFAULT_CHANGE_FEED_CAPACITY):
+        if capacity < 1:
+            raise ValueError(f"Change feed capacity must be at least 1, got {capacity}.")
+        self.capacity = capacity
+        self.changes: deque[Change] = deque()
+        self.next_sequence = 1
+        self.subscriptions: set["Subscription"] = set()
+        self.condition = threading.Condition()
+
+    @property
+    def latest_sequence(self) -> int:
+        # Sequence number of the latest change, 0 before the first
+        with self.condition:
+            return self.next_sequence - 1
+
+    def subscribe(self, after: int | None = None, backpressure: bool = False) -> "Subscription":
+        # Reads the changes following sequence number after, or only new changes when it's None
+        with self.condition:
+            if after is None:
+                after = self.next_sequence - 1
+            if after > self.next_sequence - 1:
+                raise ValueError(f"Sequence {after} is ahead of the latest change {self.next_sequence - 1}.")
+            if after < self._oldest_sequence() - 1:
+                raise ValueError(f"Changes after sequence {after} are no longer buffered, the oldest is {self._oldest_sequence()}.")
+            subscription = Subscription(self, after + 1, backpressure)
+            self.subscriptions.add(subscription)
+            return subscription
+
+    def wait_for_space(self, timeout: float | None = None) -> bool:
+        # Blocks while the buffer is full of changes a backpressure subscriber hasn't read yet
+        with self.condition:
+            return self.condition.wait_for(self._has_space, timeout)
+
+    def publish_account(self, account: Account) -> Change:
+        with self.condition:
+            return self._append(Change(sequence=self.next_sequence, kind=ChangeKind.ACCOUNT_ADDED, account=account))
+
+    def publish_transaction(self, transaction: Transaction, balance_deltas: dict[int, int], balances: dict[int, int]) -> Change:
+        with self.condition:
+            return self._append(Change(
+                sequence=self.next_sequence,
+                kind=ChangeKind.TRANSACTION_POSTED,
+                transaction=transaction,
+                balance_deltas=balance_deltas,
+                balances=balances))
+
+    def _append(self, change: Change) -> Change:
+        # Callers hold self.condition
+        self.next_sequence += 1
+        self.changes.append(change)
+        self._trim()
+        self.condition.notify_all()
+        metrics.increment("change_feed.published")
+        return change
+
+    def _oldest_sequence(self) -> int:
+        return self.changes[0].sequence if self.changes else self.next_sequence
+
+    def _backpressure_floor(self) -> int | None:
+        # The oldest change a backpressure subscription still has to read
+        floors = [subscription.next_sequence for subscription in self.subscriptions if subscription.backpressure]
+        return min(floors) if floors else None
+
+    def _has_space(self) -> bool:
+        if len(self.changes) < self.capacity:
+            return True
+        floor = self._backpressure_floor()
+        return floor is None or self.changes[0].sequence < floor
+
+    def _trim(self) -> None:
+        floor = self._backpressure_floor()
+        while len(self.changes) > self.capacity and (floor is None or self.changes[0].sequence < floor):
+            self.changes.popleft()
+
+    def _close(self, subscription: "Subscription") -> None:
+        with self.condition:
+            self.subscriptions.discard(subscription)
+            self._trim()
+            self.condition.notify_all()
+
+class Subscription:
+    # A reader of a ChangeFeed, created by ChangeFeed.subscribe. Not safe to share between threads.
+
+    def __init__(self, feed: ChangeFeed, next_sequence: int, backpressure: bool):
+        self.feed = feed
+        self.next_sequence = next_sequence
+        self.backpressure = backpressure
+        self.closed = False
+
+    @property
+    def last_sequence(self) -> int:
+        # Sequence number of the last change read, to resume from with ChangeFeed.subscribe(after=...)
+        return self.next_sequence - 1
+
+    def poll(self, max_changes: int = DEFAULT_POLL_SIZE, timeout: float | None = 0) -> list[Change]:
+        # The next changes in sequence order, waiting up to timeout seconds (forever for None) for one
+        feed = self.feed
+        with feed.condition:
+            if timeout != 0:
+                feed.condition.wait_for(lambda: self.closed or feed.next_sequence > self.next_sequence, timeout)
+            if self.closed:
+                return []
+            oldest = feed._oldest_sequence()
+            if self.next_sequence < oldest:
+                raise ValueError(f"Changes from sequence {self.next_sequence} were dropped, the oldest buffered is {oldest}.")
+            # Subscribers usually read near the end of the buffer, where indexing a deque is cheap
+            behind = feed.next_sequence - self.next_sequence
+            changes = [feed.changes[index] for index in range(-behind, min(0, max_changes - behind))]
+            self.next_sequence += len(changes)
+            if self.backpressure and changes:
+                feed._trim()
+                feed.condition.notify_all()
+            return changes
+
+    def __iter__(self) -> Iterator[Change]:
+        # Every change until the subscription is closed, waiting for new ones as needed
+        while not self.closed:
+            yield from self.poll(timeout=None)
+
+    def close(self) -> None:
+        with self.feed.condition:
+            self.closed = True
+        self.feed._close(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,74 +1,263 @@
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from collections import defaultdict
+from itertools import islice
+from typing import Callable, Iterable, Iterator
 
+from app.change_feed import ChangeFeed, Subscription
+from app.report_cache import DEFAULT_REPORT_CACHE_ROWS, Report, ReportCache
 from database.database import AbstractDatabase
 from database.account_dao import AccountDao
+from database.locking import StripedLock
 from database.transaction_dao import TransactionDao
+from metrics.registry import timed
 from models.account import Account, AccountType
-from models.report import TransactionReport, TrialBalanceReport, ReportEntry
-from models.transaction import Transaction
+from models.period_close import PeriodClose
+from models.report import TAccountReport, TransactionReport, TrialBalanceReport, ReportEntry
+from models.transaction import Posting, Transaction, TransactionBatchResult, TransactionCursor
 
 class Ledger:
+    # Safe to share between threads when the database is. A transaction's postings are applied to
+    # the running balances while holding the locks of all its accounts, and readers take the same
+    # locks, so every balance read from the cache reflects whole transactions.
+    #
+    # Reports are kept in a ReportCache of report_cache_rows rows, 0 disables it. Writes
+    # invalidate the reports they change: postings the reports as of their timestamp or later,
+    # new accounts every report.
+    #
+    # With a change_feed_capacity, added accounts and posted transactions are published to a
+    # ChangeFeed (see subscribe). A transaction's change is published under the same account locks
+    # that apply it to the running balances, so changes to an account are in the order its balance
+    # moved, and an account is published before any transaction posting to it.
 
-    def __init__(self, db: AbstractDatabase):
+    def __init__(self, db: AbstractDatabase, report_cache_rows: int = DEFAULT_REPORT_CACHE_ROWS, change_feed_capacity: int = 0):
+        self.report_cache = ReportCache(report_cache_rows) if report_cache_rows > 0 else None
+        self.changes = ChangeFeed(change_feed_capacity) if change_feed_capacity > 0 else None
         self.account_dao = AccountDao(db)
         self.transaction_dao = TransactionDao(db)
         self.running_balance_cache = defaultdict(int)
-        now = datetime.now()
-        for account in self.account_dao.list_accounts():
-            self.running_balance_cache[account.id] = self.get_historic_balance(account.id, now)[1]
+        self.account_locks = StripedLock()
+        self.latest_timestamp_lock = threading.Lock()
+        # Timestamp of the latest posted transaction. The running balances are the balances as of
+        # any time at or after it, so those queries are served from the cache.
+        self.latest_timestamp = self.transaction_dao.get_latest_timestamp()
+        if self.latest_timestamp is not None:
+            # One bulk as-of query warms the cache, rather than one historic query per account
+            account_ids = [account.id for account in self.account_dao.list_accounts()]
+            self.running_balance_cache.update(self.transaction_dao.get_balances(account_ids, self.latest_timestamp))
 
+    @timed("ledger.add_account")
     def add_account(self, account: Account) -> None:
-        self.account_dao.add_account(account)
+        if self.changes is None:
+            self.account_dao.add_account(account)
+        else:
+            self.changes.wait_for_space()
+            with self.account_locks.acquire([account.id]):
+                self.account_dao.add_account(account)
+                self.changes.publish_account(account)
+        self._invalidate_reports(None)
 
+    @timed("ledger.get_account")
     def get_account(self, account_id: int) -> Account | None:
         return self.account_dao.get_account(account_id)
     
+    @timed("ledger.add_transaction")
     def add_transaction(self, transaction: Transaction) -> None:
         self.transaction_dao.add_transaction(transaction)
-        for entry in transaction.entries:
-            self.running_balance_cache[entry.account_id] += entry.value
+        self._post_to_running_balances(transaction)
+        self._invalidate_reports(transaction.timestamp)
 
+    @timed("ledger.add_transactions")
+    def add_transactions(self, transactions: Iterable[Transaction], atomic: bool = True) -> TransactionBatchResult:
+        result = self.transaction_dao.add_transactions(transactions, atomic=atomic)
+        for transaction in result.added:
+            self._post_to_running_balances(transaction)
+        if result.added:
+            self._invalidate_reports(min(transaction.timestamp for transaction in result.added))
+        return result
+
+    def _invalidate_reports(self, timestamp: datetime | None) -> None:
+        if self.report_cache is not None:
+            self.report_cache.invalidate(timestamp)
+
+    def _cached_report(self, key: tuple, build: Callable[[], Report], rows: Callable[[Report], int]) -> Report:
+        if self.report_cache is None:
+            return build()
+        return self.report_cache.get_or_compute(key, build, rows)
+
+    def _post_to_running_balances(self, transaction: Transaction) -> None:
+        # Back-dated transactions apply to the running balances just the same, they only move latest_timestamp forward.
+        # latest_timestamp moves before the balances change, so a reader holding the account locks either
+        # sees the old timestamp and balances without this posting, or the new timestamp and goes to storage.
+        with self.latest_timestamp_lock:
+            if self.latest_timestamp is None or transaction.timestamp > self.latest_timestamp:
+                self.latest_timestamp = transaction.timestamp
+        if self.changes is None:
+            with self.account_locks.acquire(entry.account_id for entry in transaction.entries):
+                for entry in transaction.entries:
+                    self.running_balance_cache[entry.account_id] += entry.value
+        else:
+            balance_deltas = defaultdict(int)
+            for entry in transaction.entries:
+                balance_deltas[entry.account_id] += entry.value
+            self.changes.wait_for_space()
+            with self.account_locks.acquire(balance_deltas):
+                for account_id, delta in balance_deltas.items():
+                    self.running_balance_cache[account_id] += delta
+                balances = {account_id: self.running_balance_cache[account_id] for account_id in balance_deltas}
+                self.changes.publish_transaction(transaction, dict(balance_deltas), balances)
+
+    @timed("ledger.close_period")
+    def close_period(self, timestamp: datetime) -> PeriodClose:
+        # Persists every account's balance as of the timestamp. Later postings dated at or before it
+        # are rejected, and historic balances after it are summed from these closing balances.
+        account_ids = [account.id for account in self.account_dao.list_accounts()]
+        return self.transaction_dao.close_period(account_ids, timestamp)
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return self.transaction_dao.list_period_closes()
+
+    def subscribe(self, after: int | None = None, backpressure: bool = False) -> Subscription:
+        # Changes following sequence number after, or from now on when it's None. To follow live
+        # balances, subscribe, read get_balances, then store the balances carried by each change:
+        # changes to an account arrive in order, so the balances end up current whether or not the
+        # read already included a change. A backpressure subscription left open stalls all writes.
+        if self.changes is None:
+            raise ValueError("The change feed is disabled, create the Ledger with a change_feed_capacity.")
+        return self.changes.subscribe(after, backpressure)
+
+    @timed("ledger.get_transaction")
     def get_transaction(self, transaction_id: int) -> Transaction | None:
         return self.transaction_dao.get_transaction(transaction_id)
     
+    @timed("ledger.list_transactions")
     def list_transactions(self) -> list[Transaction]:
         return self.transaction_dao.list_transactions()
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        return self.transaction_dao.iter_transactions(start, end, account_ids, after)
     
-    def get_transaction_report(self, timestamp: datetime) -> TransactionReport:
-        accounts = self.account_dao.list_accounts()
-        transactions = [txn for txn in self.list_transactions() if txn.timestamp <= timestamp]
-        return TransactionReport(timestamp=timestamp, accounts=accounts, transactions=transactions)
+    @timed("ledger.get_transaction_report")
+    def get_transaction_report(
+            self,
+            timestamp: datetime,
+            start: datetime | None = None,
+            account_ids: list[int] | None = None,
+            page_size: int | None = None,
+            after: TransactionCursor | None = None) -> TransactionReport:
+        if page_size is not None and page_size < 1:
+            raise ValueError(f"Page size must be at least 1, got {page_size}.")
+
+        def build() -> TransactionReport:
+            if account_ids is None:
+                accounts = self.account_dao.list_accounts()
+            else:
+                accounts_by_id = self.account_dao.get_accounts(account_ids)
+                missing_ids = [account_id for account_id in account_ids if account_id not in accounts_by_id]
+                if missing_ids:
+                    raise ValueError(f"Account with ID {missing_ids[0]} does not exist.")
+                accounts = list(accounts_by_id.values())
+            transactions = self.iter_transactions(start, timestamp, account_ids, after)
+            # One extra transaction is read to tell whether another page follows
+            transactions = list(transactions) if page_size is None else list(islice(transactions, page_size + 1))
+            return build_transaction_report(timestamp, accounts, transactions, start, page_size)
+
+        key = ("transaction", timestamp, start, tuple(account_ids) if account_ids is not None else None, page_size, after)
+        return self._cached_report(key, build, lambda report: len(report.accounts) + len(report.transactions))
+
+    @timed("ledger.get_account_history")
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        # Read from the account's own postings, so the cost follows its activity rather than the whole ledger
+        if self.get_account(account_id) is None:
+            raise ValueError(f"Account with ID {account_id} does not exist.")
+        return self.transaction_dao.get_account_history(account_id, start, end)
 
+    @timed("ledger.get_t_account_report")
+    def get_t_account_report(self, account_id: int, timestamp: datetime, start: datetime | None = None) -> TAccountReport:
+        account = self.get_account(account_id)
+        if account is None:
+            raise ValueError(f"Account with ID {account_id} does not exist.")
+
+        def build() -> TAccountReport:
+            opening_balance = 0
+            if start is not None:
+                # Timestamps have microsecond resolution, so this is the balance just before start
+                opening_balance = self._get_historic_balances([account], start - timedelta(microseconds=1))[0][1]
+            postings = self.transaction_dao.get_account_history(account_id, start, timestamp)
+            return TAccountReport(timestamp=timestamp, account=account, postings=postings, opening_balance=opening_balance, start=start)
+
+        return self._cached_report(("t_account", timestamp, account_id, start), build, lambda report: 1 + len(report.postings))
+
+    @timed("ledger.get_historic_balance")
     def get_historic_balance(self, account_id: int, timestamp: datetime) -> tuple[Account, int]:
         account = self.get_account(account_id)
         if account is None:
             raise ValueError(f"Account with ID {account_id} does not exist.")
         return self._get_historic_balances([account], timestamp)[0]
 
+    @timed("ledger.get_balances")
+    def get_balances(self, account_ids: list[int], timestamp: datetime | None = None) -> dict[int, int]:
+        # Balances of many accounts in one call, current ones when no timestamp is given
+        accounts_by_id = self.account_dao.get_accounts(account_ids)
+        missing_ids = [account_id for account_id in account_ids if account_id not in accounts_by_id]
+        if missing_ids:
+            raise ValueError(f"Account with ID {missing_ids[0]} does not exist.")
+        if timestamp is None:
+            with self.account_locks.acquire(account_ids):
+                return {account_id: self.running_balance_cache[account_id] for account_id in account_ids}
+        accounts = [accounts_by_id[account_id] for account_id in account_ids]
+        return {account.id: balance for account, balance in self._get_historic_balances(accounts, timestamp)}
+
     def _get_historic_balances(self, account_list: list[Account], timestamp: datetime) -> list[tuple[Account, int]]:
-        account_balances = {account.id: 0 for account in account_list}
-        for txn in self.list_transactions():
-            if txn.timestamp > timestamp:
-                continue
-            for entry in txn.entries:
-                if entry.account_id in account_balances:
-                    account_balances[entry.account_id] += entry.value
+        with self.account_locks.acquire(account.id for account in account_list):
+            with self.latest_timestamp_lock:
+                latest_timestamp = self.latest_timestamp
+            if latest_timestamp is None or timestamp >= latest_timestamp:
+                return [(account, self.running_balance_cache[account.id]) for account in account_list]
+        account_balances = self.transaction_dao.get_balances([account.id for account in account_list], timestamp)
         return [(account, account_balances[account.id]) for account in account_list]
     
     
+    @timed("ledger.get_account_balance")
     def get_account_balance(self, account_id: int) -> tuple[Account, int]:
         account = self.get_account(account_id)
         if account is None:
             raise ValueError(f"Account with ID {account_id} does not exist.")
-        return account, self.running_balance_cache[account_id]
+        with self.account_locks.acquire([account_id]):
+            return account, self.running_balance_cache[account_id]
     
+    @timed("ledger.get_trial_balance_report")
     def get_trial_balance_report(self, timestamp: datetime) -> TrialBalanceReport:
-        accounts = self.account_dao.list_accounts()
-        account_balances = self._get_historic_balances(accounts, timestamp)
-        debit_entries = [ReportEntry(account=account, balance=balance) for account, balance in account_balances if account.type == AccountType.DEBIT]
-        debits_total = sum(entry.balance for entry in debit_entries)
-        credit_entries = [ReportEntry(account=account, balance=balance) for account, balance in account_balances if account.type == AccountType.CREDIT]
-        credits_total = sum(entry.balance for entry in credit_entries)
-        return TrialBalanceReport(timestamp=timestamp, debits=debit_entries, debits_total=debits_total, credits=credit_entries, credits_total=credits_total)
-        
\ No newline at end of file
+
+        def build() -> TrialBalanceReport:
+            accounts = self.account_dao.list_accounts()
+            account_balances = self._get_historic_balances(accounts, timestamp)
+            return build_trial_balance_report(timestamp, account_balances)
+
+        return self._cached_report(("trial_balance", timestamp), build, lambda report: len(report.debits) + len(report.credits))
+
+
+def build_transaction_report(
+        timestamp: datetime,
+        accounts: list[Account],
+        transactions: list[Transaction],
+        start: datetime | None,
+        page_size: int | None) -> TransactionReport:
+    # A paged report is built from up to page_size + 1 transactions, the extra one only tells that another page follows
+    next_cursor = None
+    if page_size is not None and len(transactions) > page_size:
+        del transactions[page_size:]
+        next_cursor = (transactions[-1].timestamp, transactions[-1].id) if transactions else None
+    return TransactionReport(timestamp=timestamp, accounts=accounts, transactions=transactions, start=start, next_cursor=next_cursor)
+
+def build_trial_balance_report(timestamp: datetime, account_balances: list[tuple[Account, int]]) -> TrialBalanceReport:
+    debit_entries = [ReportEntry(account=account, balance=balance) for account, balance in account_balances if account.type == AccountType.DEBIT]
+    debits_total = sum(entry.balance for entry in debit_entries)
+    credit_entries = [ReportEntry(account=account, balance=balance) for account, balance in account_balances if account.type == AccountType.CREDIT]
+    credits_total = sum(entry.balance for entry in credit_entries)
+    return TrialBalanceReport(timestamp=timestamp, debits=debit_entries, debits_total=debits_total, credits=credit_entries, credits_total=credits_total)
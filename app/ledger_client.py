@@ -0,0 +1,180 @@
+import socket
+from datetime import datetime
+from itertools import count
+from typing import Iterable, Iterator
+
+from app.change_feed import DEFAULT_POLL_SIZE
+from app.protocol import (
+    Address, decode_message, encode_message, timestamp_to_json, cursor_to_json, account_to_json,
+    account_from_json, transaction_to_json, transaction_from_json, posting_from_json, balances_from_json,
+    period_close_from_json, account_balance_from_json, change_from_json, trial_balance_report_from_json,
+    transaction_report_from_json, t_account_report_from_json)
+from models.account import Account
+from models.change import Change
+from models.period_close import PeriodClose
+from models.report import TAccountReport, TransactionReport, TrialBalanceReport
+from models.transaction import Posting, Transaction, TransactionBatchResult, TransactionCursor
+
+# The Ledger API served by a LedgerServer, so a LedgerClient can stand in for a Ledger, e.g. in
+# LedgerShell. Errors the server reports are raised as ValueError, like the Ledger raises them.
+# One connection is kept open for the life of the client; a client is not safe to share between threads.
+
+# Requests sent by call_many before their responses are read. A bounded window keeps both ends
+# from blocking on full socket buffers when a long pipeline has large responses.
+PIPELINE_WINDOW = 256
+
+# Transactions fetched per request by iter_transactions
+ITER_PAGE_SIZE = 1000
+
+class LedgerClient:
+
+    def __init__(self, address: Address, timeout: float | None = None):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(address)
+        except OSError:
+            self.socket.close()
+            raise
+        if family == socket.AF_INET:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile("rb")
+        self.request_ids = count(1)
+
+    def close(self) -> None:
+        self.reader.close()
+        self.socket.close()
+
+    def __enter__(self) -> "LedgerClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def call(self, method: str, **params) -> object:
+        return self.call_many([(method, params)])[0]
+
+    def call_many(self, calls: Iterable[tuple[str, dict]]) -> list:
+        # Pipelined: a window of requests is sent in one write before their responses are read.
+        # Every response is read even when some fail, so the connection stays in step, and then the
+        # first error is raised.
+        calls = list(calls)
+        results = []
+        error = None
+        for start in range(0, len(calls), PIPELINE_WINDOW):
+            request_ids = []
+            payload = []
+            for method, params in calls[start:start + PIPELINE_WINDOW]:
+                request_ids.append(next(self.request_ids))
+                payload.append(encode_message({"id": request_ids[-1], "method": method, "params": params}))
+            self.socket.sendall(b"".join(payload))
+            for request_id in request_ids:
+                response = self._read_response()
+                if response.get("id") != request_id:
+                    raise ConnectionError(f"Expected the response to request {request_id}, got {response.get('id')}: {response.get('error')}")
+                if "error" in response:
+                    error = error or ValueError(response["error"])
+                results.append(response.get("result"))
+        if error is not None:
+            raise error
+        return results
+
+    def _read_response(self) -> dict:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("The ledger server closed the connection.")
+        return decode_message(line)
+
+    def add_account(self, account: Account) -> None:
+        self.call("add_account", account=account_to_json(account))
+
+    def get_account(self, account_id: int) -> Account | None:
+        account = self.call("get_account", account_id=account_id)
+        return account_from_json(account) if account is not None else None
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        self.call("add_transaction", transaction=transaction_to_json(transaction))
+
+    def add_transactions(self, transactions: Iterable[Transaction], atomic: bool = True) -> TransactionBatchResult:
+        transactions = list(transactions)
+        result = self.call("add_transactions", transactions=[transaction_to_json(transaction) for transaction in transactions], atomic=atomic)
+        return TransactionBatchResult(
+            added=tuple(transactions[position] for position in result["added"]),
+            rejected=tuple((transactions[position], reason) for position, reason in result["rejected"]))
+
+    def close_period(self, timestamp: datetime) -> PeriodClose:
+        return period_close_from_json(self.call("close_period", timestamp=timestamp.isoformat()))
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return [period_close_from_json(period_close) for period_close in self.call("list_period_closes")]
+
+    def get_changes(self, after: int | None = None, limit: int = DEFAULT_POLL_SIZE, timeout: float = 0) -> tuple[list[Change], int]:
+        # Changes following sequence number after (or new ones when it's None), waiting up to
+        # timeout seconds for one, and the sequence number to pass as after next time
+        result = self.call("get_changes", after=after, limit=limit, timeout=timeout)
+        return [change_from_json(change) for change in result["changes"]], result["last_sequence"]
+
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        transaction = self.call("get_transaction", transaction_id=transaction_id)
+        return transaction_from_json(transaction) if transaction is not None else None
+
+    def list_transactions(self) -> list[Transaction]:
+        return [transaction_from_json(transaction) for transaction in self.call("list_transactions")]
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        # Fetched a page at a time, each page resuming after the last transaction of the one before
+        account_ids = list(account_ids) if account_ids is not None else None
+        while True:
+            page = self.call(
+                "iter_transactions",
+                start=timestamp_to_json(start),
+                end=timestamp_to_json(end),
+                account_ids=account_ids,
+                after=cursor_to_json(after),
+                limit=ITER_PAGE_SIZE)
+            for transaction in page:
+                yield transaction_from_json(transaction)
+            if len(page) < ITER_PAGE_SIZE:
+                return
+            after = (datetime.fromisoformat(page[-1]["timestamp"]), page[-1]["id"])
+
+    def get_transaction_report(
+            self,
+            timestamp: datetime,
+            start: datetime | None = None,
+            account_ids: list[int] | None = None,
+            page_size: int | None = None,
+            after: TransactionCursor | None = None) -> TransactionReport:
+        return transaction_report_from_json(self.call(
+            "get_transaction_report",
+            timestamp=timestamp.isoformat(),
+            start=timestamp_to_json(start),
+            account_ids=account_ids,
+            page_size=page_size,
+            after=cursor_to_json(after)))
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        postings = self.call("get_account_history", account_id=account_id, start=timestamp_to_json(start), end=timestamp_to_json(end))
+        return [posting_from_json(posting) for posting in postings]
+
+    def get_t_account_report(self, account_id: int, timestamp: datetime, start: datetime | None = None) -> TAccountReport:
+        return t_account_report_from_json(self.call(
+            "get_t_account_report", account_id=account_id, timestamp=timestamp.isoformat(), start=timestamp_to_json(start)))
+
+    def get_historic_balance(self, account_id: int, timestamp: datetime) -> tuple[Account, int]:
+        return account_balance_from_json(self.call("get_historic_balance", account_id=account_id, timestamp=timestamp.isoformat()))
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime | None = None) -> dict[int, int]:
+        return balances_from_json(self.call("get_balances", account_ids=list(account_ids), timestamp=timestamp_to_json(timestamp)))
+
+    def get_account_balance(self, account_id: int) -> tuple[Account, int]:
+        return account_balance_from_json(self.call("get_account_balance", account_id=account_id))
+
+    def get_trial_balance_report(self, timestamp: datetime) -> TrialBalanceReport:
+        return trial_balance_report_from_json(self.call("get_trial_balance_report", timestamp=timestamp.isoformat()))
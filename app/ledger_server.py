@@ -0,0 +1,275 @@
+import ipaddress
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+from contextlib import nullcontext
+from itertools import islice
+from typing import Callable
+
+from app.change_feed import DEFAULT_POLL_SIZE
+from app.ledger import Ledger
+from app.protocol import (
+    MAX_LINE_BYTES, Address, decode_message, encode_message, timestamp_from_json, cursor_from_json,
+    account_to_json, account_from_json, transaction_to_json, transaction_from_json, posting_to_json,
+    balances_to_json, period_close_to_json, account_balance_to_json, trial_balance_report_to_json,
+    transaction_report_to_json, t_account_report_to_json, change_to_json)
+from metrics import registry as metrics
+
+# A long-running process that owns one Ledger and serves it to thin clients (see app/ledger_client.py)
+# over a Unix domain socket or a localhost TCP port, so they don't rebuild the ledger on every run.
+#
+# Connections are kept open for any number of requests, each connection on its own thread. The
+# requests that arrive in one read are handled in order and their responses sent back in one write,
+# so a client pipelining a burst of requests pays one round trip for all of them. add_transactions
+# and get_balances take whole batches per request. Ledger over InMemoryDatabase or a journal is
+# safe to share between threads; other backends are served with thread_safe=False, which handles
+# one request at a time.
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+
+# Transactions returned by one iter_transactions request when the client doesn't ask for fewer
+DEFAULT_PAGE_SIZE = 1000
+
+# Longest a get_changes request waits for a change, later requests on its connection wait behind it
+MAX_CHANGES_TIMEOUT = 30.0
+
+def _add_account(ledger: Ledger, params: dict) -> None:
+    ledger.add_account(account_from_json(params["account"]))
+
+def _get_account(ledger: Ledger, params: dict) -> dict | None:
+    account = ledger.get_account(params["account_id"])
+    return account_to_json(account) if account is not None else None
+
+def _add_transaction(ledger: Ledger, params: dict) -> None:
+    ledger.add_transaction(transaction_from_json(params["transaction"]))
+
+def _add_transactions(ledger: Ledger, params: dict) -> dict:
+    # Transactions are referred to by their position in the request, the client already has them
+    transactions = [transaction_from_json(transaction) for transaction in params["transactions"]]
+    result = ledger.add_transactions(transactions, atomic=params.get("atomic", True))
+    positions = {id(transaction): position for position, transaction in enumerate(transactions)}
+    return {
+        "added": [positions[id(transaction)] for transaction in result.added],
+        "rejected": [[positions[id(transaction)], reason] for transaction, reason in result.rejected],
+    }
+
+def _get_transaction(ledger: Ledger, params: dict) -> dict | None:
+    transaction = ledger.get_transaction(params["transaction_id"])
+    return transaction_to_json(transaction) if transaction is not None else None
+
+def _list_transactions(ledger: Ledger, params: dict) -> list:
+    return [transaction_to_json(transaction) for transaction in ledger.list_transactions()]
+
+def _iter_transactions(ledger: Ledger, params: dict) -> list:
+    # One page of the iteration, the client resumes after the last transaction of the page
+    transactions = ledger.iter_transactions(
+        timestamp_from_json(params.get("start")),
+        timestamp_from_json(params.get("end")),
+        params.get("account_ids"),
+        cursor_from_json(params.get("after")))
+    return [transaction_to_json(transaction) for transaction in islice(transactions, params.get("limit", DEFAULT_PAGE_SIZE))]
+
+def _get_transaction_report(ledger: Ledger, params: dict) -> dict:
+    return transaction_report_to_json(ledger.get_transaction_report(
+        timestamp_from_json(params["timestamp"]),
+        timestamp_from_json(params.get("start")),
+        params.get("account_ids"),
+        params.get("page_size"),
+        cursor_from_json(params.get("after"))))
+
+def _get_account_history(ledger: Ledger, params: dict) -> list:
+    postings = ledger.get_account_history(params["account_id"], timestamp_from_json(params.get("start")), timestamp_from_json(params.get("end")))
+    return [posting_to_json(posting) for posting in postings]
+
+def _get_t_account_report(ledger: Ledger, params: dict) -> dict:
+    return t_account_report_to_json(ledger.get_t_account_report(
+        params["account_id"], timestamp_from_json(params["timestamp"]), timestamp_from_json(params.get("start"))))
+
+def _get_historic_balance(ledger: Ledger, params: dict) -> dict:
+    return account_balance_to_json(ledger.get_historic_balance(params["account_id"], timestamp_from_json(params["timestamp"])))
+
+def _get_account_balance(ledger: Ledger, params: dict) -> dict:
+    return account_balance_to_json(ledger.get_account_balance(params["account_id"]))
+
+def _get_balances(ledger: Ledger, params: dict) -> dict:
+    return balances_to_json(ledger.get_balances(params["account_ids"], timestamp_from_json(params.get("timestamp"))))
+
+def _get_trial_balance_report(ledger: Ledger, params: dict) -> dict:
+    return trial_balance_report_to_json(ledger.get_trial_balance_report(timestamp_from_json(params["timestamp"])))
+
+def _close_period(ledger: Ledger, params: dict) -> dict:
+    return period_close_to_json(ledger.close_period(timestamp_from_json(params["timestamp"])))
+
+def _list_period_closes(ledger: Ledger, params: dict) -> list:
+    return [period_close_to_json(period_close) for period_close in ledger.list_period_closes()]
+
+def _get_changes(ledger: Ledger, params: dict) -> dict:
+    # Each request resumes after the sequence number the client passes, so no subscription outlives
+    # it. Without one it starts from the latest change. last_sequence is where to resume next.
+    timeout = min(float(params.get("timeout", 0)), MAX_CHANGES_TIMEOUT)
+    with ledger.subscribe(params.get("after")) as subscription:
+        changes = subscription.poll(params.get("limit", DEFAULT_POLL_SIZE), timeout)
+        return {"changes": [change_to_json(change) for change in changes], "last_sequence": subscription.last_sequence}
+
+METHODS: dict[str, Callable[[Ledger, dict], object]] = {
+    "add_account": _add_account,
+    "get_account": _get_account,
+    "add_transaction": _add_transaction,
+    "add_transactions": _add_transactions,
+    "get_transaction": _get_transaction,
+    "list_transactions": _list_transactions,
+    "iter_transactions": _iter_transactions,
+    "get_transaction_report": _get_transaction_report,
+    "get_account_history": _get_account_history,
+    "get_t_account_report": _get_t_account_report,
+    "get_historic_balance": _get_historic_balance,
+    "get_account_balance": _get_account_balance,
+    "get_balances": _get_balances,
+    "get_trial_balance_report": _get_trial_balance_report,
+    "close_period": _close_period,
+    "list_period_closes": _list_period_closes,
+    "get_changes": _get_changes,
+}
+
+# Methods that don't touch storage, so a server for a backend that isn't thread safe doesn't
+# serialise them with every other request. A long poll for changes doesn't stall other clients.
+UNSERIALISED_METHODS = {"get_changes"}
+
+class LedgerService:
+    # Turns request lines into response lines, independent of the transport
+
+    def __init__(self, ledger: Ledger, thread_safe: bool = True):
+        self.ledger = ledger
+        self.lock = nullcontext() if thread_safe else threading.Lock()
+
+    def handle_line(self, line: bytes) -> bytes:
+        metrics.increment("ledger_server.requests")
+        try:
+            request = decode_message(line)
+        except ValueError as e:
+            metrics.increment("ledger_server.errors")
+            return encode_message({"id": None, "error": str(e)})
+        response = self.handle(request)
+        if "error" in response:
+            metrics.increment("ledger_server.errors")
+        return encode_message(response)
+
+    def handle(self, request: dict) -> dict:
+        request_id = request.get("id")
+        method = METHODS.get(request.get("method"))
+        if method is None:
+            return {"id": request_id, "error": f"Unknown method '{request.get('method')}'."}
+        params = request.get("params")
+        if params is None:
+            params = {}
+        if not isinstance(params, dict):
+            return {"id": request_id, "error": "Expected params to be a JSON object."}
+        try:
+            with nullcontext() if request["method"] in UNSERIALISED_METHODS else self.lock:
+                result = method(self.ledger, params)
+        except KeyError as e:
+            return {"id": request_id, "error": f"Missing parameter {e}."}
+        except (TypeError, ValueError) as e:
+            return {"id": request_id, "error": str(e)}
+        except Exception as e:
+            # E.g. a storage error. It fails this request only, the connection and the requests
+            # pipelined behind it carry on.
+            logger.exception("Request %r to %s failed", request_id, request["method"])
+            return {"id": request_id, "error": f"Internal error: {type(e).__name__}: {e}"}
+        return {"id": request_id, "result": result}
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        service = self.server.service
+        buffer = bytearray()
+        try:
+            while data := self.request.recv(READ_SIZE):
+                buffer += data
+                end = buffer.rfind(b"\n")
+                if end < 0:
+                    if len(buffer) > MAX_LINE_BYTES:
+                        self.request.sendall(encode_message({"id": None, "error": f"Request is longer than {MAX_LINE_BYTES} bytes."}))
+                        return
+                    continue
+                lines = bytes(buffer[:end]).split(b"\n")
+                del buffer[:end + 1]
+                responses = [service.handle_line(line) for line in lines if line.strip()]
+                if responses:
+                    self.request.sendall(b"".join(responses))
+        except ConnectionError:
+            # The client went away, there is no one left to answer
+            pass
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    block_on_close = False
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    block_on_close = False
+    allow_reuse_address = True
+
+class LedgerServer:
+
+    def __init__(self, ledger: Ledger, address: Address, thread_safe: bool = True):
+        if isinstance(address, str):
+            _remove_stale_socket(address)
+            # Only the user running the server may connect. The socket is created with those
+            # permissions rather than narrowed afterwards, so it is never reachable by anyone else.
+            umask = os.umask(0o177)
+            try:
+                self.server = _UnixServer(address, _ConnectionHandler)
+            finally:
+                os.umask(umask)
+        else:
+            _check_loopback(address)
+            self.server = _TCPServer(address, _ConnectionHandler)
+        self.server.service = LedgerService(ledger, thread_safe)
+
+    @property
+    def address(self) -> Address:
+        return self.server.server_address
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        # Stops serve_forever running on another thread
+        self.server.shutdown()
+
+    def close(self) -> None:
+        self.server.server_close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+def _check_loopback(address: tuple[str, int]) -> None:
+    # Requests aren't authenticated, so TCP is only served on addresses the local machine alone can reach
+    host, port = address
+    try:
+        resolved = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"Can't resolve {host}: {e}") from e
+    if not all(ipaddress.ip_address(info[4][0].split("%")[0]).is_loopback for info in resolved):
+        raise ValueError(f"Refusing to serve on {host}:{port}, only loopback addresses such as localhost or 127.0.0.1 are allowed.")
+
+def _remove_stale_socket(path: str) -> None:
+    # A socket file left behind by a server that didn't shut down cleanly is replaced, a live one isn't
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"Refusing to replace {path}, it exists and is not a socket.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f"A ledger server is already listening on {path}.")
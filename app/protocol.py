@@ -0,0 +1,177 @@
+import json
+from datetime import datetime
+
+from models.account import Account
+from models.change import Change, ChangeKind
+from models.period_close import PeriodClose
+from models.report import ReportEntry, TAccountReport, TransactionReport, TrialBalanceReport
+from models.transaction import Posting, Transaction, TransactionCursor, TransactionEntry
+
+# Wire format between LedgerServer and LedgerClient: newline-delimited JSON in both directions.
+#
+#   request:  {"id": 7, "method": "get_balances", "params": {"account_ids": [1, 2]}}
+#   response: {"id": 7, "result": {"1": 150, "2": -150}}
+#         or  {"id": 7, "error": "Account with ID 2 does not exist."}
+#
+# A connection carries any number of requests, and responses are written in request order, so
+# clients may send many requests before reading the first response. Timestamps are ISO 8601
+# strings and transactions use the layout of JSONL imports and exports.
+
+# Longest request line a server accepts, a connection sending more is closed
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+# A Unix domain socket path, or a (host, port) pair for TCP
+Address = str | tuple[str, int]
+
+def parse_address(value: str) -> Address:
+    # HOST:PORT is a TCP address, anything else is a socket path
+    host, separator, port = value.rpartition(":")
+    if separator and host and port.isdigit() and "/" not in value:
+        return host, int(port)
+    return value
+
+def encode_message(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+def decode_message(line: bytes) -> dict:
+    try:
+        message = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(message, dict):
+        raise ValueError("Expected a JSON object.")
+    return message
+
+def timestamp_to_json(timestamp: datetime | None) -> str | None:
+    return timestamp.isoformat() if timestamp is not None else None
+
+def timestamp_from_json(value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid timestamp: {e}")
+
+def cursor_to_json(cursor: TransactionCursor | None) -> list | None:
+    return [cursor[0].isoformat(), cursor[1]] if cursor is not None else None
+
+def cursor_from_json(value: list | None) -> TransactionCursor | None:
+    if value is None:
+        return None
+    timestamp, transaction_id = value
+    return timestamp_from_json(timestamp), int(transaction_id)
+
+def account_to_json(account: Account) -> dict:
+    return {"id": account.id, "name": account.name, "type": account.type.value, "description": account.description}
+
+def account_from_json(data: dict) -> Account:
+    return Account(id=int(data["id"]), name=data["name"], type=data["type"], description=data.get("description", ""))
+
+def transaction_to_json(transaction: Transaction) -> dict:
+    return {
+        "id": transaction.id,
+        "timestamp": transaction.timestamp.isoformat(),
+        "entries": [{"account_id": entry.account_id, "value": entry.value} for entry in transaction.entries],
+    }
+
+def transaction_from_json(data: dict) -> Transaction:
+    entries = tuple(TransactionEntry(account_id=int(entry["account_id"]), value=int(entry["value"])) for entry in data["entries"])
+    return Transaction(id=int(data["id"]), timestamp=timestamp_from_json(data["timestamp"]), entries=entries)
+
+def posting_to_json(posting: Posting) -> list:
+    return [posting.transaction_id, posting.timestamp.isoformat(), posting.value]
+
+def posting_from_json(value: list) -> Posting:
+    transaction_id, timestamp, posting_value = value
+    return Posting(transaction_id=transaction_id, timestamp=timestamp_from_json(timestamp), value=posting_value)
+
+def balances_to_json(balances: dict[int, int]) -> dict:
+    # JSON object keys are strings
+    return {str(account_id): balance for account_id, balance in balances.items()}
+
+def balances_from_json(data: dict) -> dict[int, int]:
+    return {int(account_id): balance for account_id, balance in data.items()}
+
+def period_close_to_json(period_close: PeriodClose) -> dict:
+    return {"timestamp": period_close.timestamp.isoformat(), "balances": balances_to_json(period_close.balances)}
+
+def period_close_from_json(data: dict) -> PeriodClose:
+    return PeriodClose(timestamp=timestamp_from_json(data["timestamp"]), balances=balances_from_json(data["balances"]))
+
+def account_balance_to_json(account_balance: tuple[Account, int]) -> dict:
+    account, balance = account_balance
+    return {"account": account_to_json(account), "balance": balance}
+
+def account_balance_from_json(data: dict) -> tuple[Account, int]:
+    return account_from_json(data["account"]), data["balance"]
+
+def trial_balance_report_to_json(report: TrialBalanceReport) -> dict:
+    return {
+        "timestamp": report.timestamp.isoformat(),
+        "debits": [account_balance_to_json((entry.account, entry.balance)) for entry in report.debits],
+        "debits_total": report.debits_total,
+        "credits": [account_balance_to_json((entry.account, entry.balance)) for entry in report.credits],
+        "credits_total": report.credits_total,
+    }
+
+def trial_balance_report_from_json(data: dict) -> TrialBalanceReport:
+    return TrialBalanceReport(
+        timestamp=timestamp_from_json(data["timestamp"]),
+        debits=[ReportEntry(*account_balance_from_json(entry)) for entry in data["debits"]],
+        debits_total=data["debits_total"],
+        credits=[ReportEntry(*account_balance_from_json(entry)) for entry in data["credits"]],
+        credits_total=data["credits_total"])
+
+def transaction_report_to_json(report: TransactionReport) -> dict:
+    return {
+        "timestamp": report.timestamp.isoformat(),
+        "accounts": [account_to_json(account) for account in report.accounts],
+        "transactions": [transaction_to_json(transaction) for transaction in report.transactions],
+        "start": timestamp_to_json(report.start),
+        "next_cursor": cursor_to_json(report.next_cursor),
+    }
+
+def transaction_report_from_json(data: dict) -> TransactionReport:
+    return TransactionReport(
+        timestamp=timestamp_from_json(data["timestamp"]),
+        accounts=[account_from_json(account) for account in data["accounts"]],
+        transactions=[transaction_from_json(transaction) for transaction in data["transactions"]],
+        start=timestamp_from_json(data["start"]),
+        next_cursor=cursor_from_json(data["next_cursor"]))
+
+def t_account_report_to_json(report: TAccountReport) -> dict:
+    return {
+        "timestamp": report.timestamp.isoformat(),
+        "account": account_to_json(report.account),
+        "postings": [posting_to_json(posting) for posting in report.postings],
+        "opening_balance": report.opening_balance,
+        "start": timestamp_to_json(report.start),
+    }
+
+def t_account_report_from_json(data: dict) -> TAccountReport:
+    return TAccountReport(
+        timestamp=timestamp_from_json(data["timestamp"]),
+        account=account_from_json(data["account"]),
+        postings=[posting_from_json(posting) for posting in data["postings"]],
+        opening_balance=data["opening_balance"],
+        start=timestamp_from_json(data["start"]))
+
+def change_to_json(change: Change) -> dict:
+    return {
+        "sequence": change.sequence,
+        "kind": change.kind.value,
+        "account": account_to_json(change.account) if change.account is not None else None,
+        "transaction": transaction_to_json(change.transaction) if change.transaction is not None else None,
+        "balance_deltas": balances_to_json(change.balance_deltas),
+        "balances": balances_to_json(change.balances),
+    }
+
+def change_from_json(data: dict) -> Change:
+    return Change(
+        sequence=data["sequence"],
+        kind=ChangeKind(data["kind"]),
+        account=account_from_json(data["account"]) if data["account"] is not None else None,
+        transaction=transaction_from_json(data["transaction"]) if data["transaction"] is not None else None,
+        balance_deltas=balances_from_json(data["balance_deltas"]),
+        balances=balances_from_json(data["balances"]))
@@ -0,0 +1,111 @@
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Hashable, TypeVar
+
+from models.cache_stats import CacheStats
+from metrics import registry as metrics
+
+# Total size of the cached reports, counted in rows: accounts, transactions and postings
+DEFAULT_REPORT_CACHE_ROWS = 100_000
+
+# Invalidations remembered to tell whether a report computed meanwhile is still current
+MAX_TRACKED_INVALIDATIONS = 1024
+
+Report = TypeVar("Report")
+
+class ReportCache:
+    # LRU cache of built reports, keyed by (report type, as-of timestamp, other arguments ...) and
+    # bounded by the number of rows the reports hold.
+    #
+    # A report as of T only depends on postings dated at or before T, so a posting dated t only
+    # invalidates reports as of t or later and historic reports stay cached while new postings
+    # arrive. Every invalidation bumps the cache version. A report is stored with the version it
+    # was computed at and is dropped instead when an invalidation covering its as-of timestamp
+    # happened while it was being computed, so a slow reader never caches a stale report.
+    # Cached reports are shared between callers, which must not modify them.
+
+    def __init__(self, max_rows: int = DEFAULT_REPORT_CACHE_ROWS):
+        if max_rows < 1:
+            raise ValueError(f"Cache size must be at least 1 row, got {max_rows}.")
+        self.max_rows = max_rows
+        self.entries: OrderedDict[tuple, tuple[object, int]] = OrderedDict()  # Report and its rows by key
+        self.keys_by_timestamp: dict[datetime, set[tuple]] = {}
+        self.timestamps: list[datetime] = []  # Sorted as-of timestamps of the cached reports
+        self.rows = 0
+        self.version = 0
+        self.invalidations: deque[tuple[int, datetime | None]] = deque(maxlen=MAX_TRACKED_INVALIDATIONS)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: tuple[Hashable, ...], compute: Callable[[], Report], rows: Callable[[Report], int]) -> Report:
+        # key[1] is the report's as-of timestamp
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                metrics.increment("report_cache.hits")
+                return entry[0]
+            self.misses += 1
+            metrics.increment("report_cache.misses")
+            version = self.version
+        report = compute()
+        with self.lock:
+            if not self._invalidated_since(version, key[1]):
+                self._store(key, report, rows(report))
+        return report
+
+    def invalidate(self, timestamp: datetime | None = None) -> None:
+        # Drops the reports as of timestamp or later, or every report when no timestamp is given
+        with self.lock:
+            self.version += 1
+            self.invalidations.append((self.version, timestamp))
+            start = 0 if timestamp is None else bisect_left(self.timestamps, timestamp)
+            for as_of in self.timestamps[start:]:
+                for key in self.keys_by_timestamp.pop(as_of):
+                    self.rows -= self.entries.pop(key)[1]
+            del self.timestamps[start:]
+        metrics.increment("report_cache.invalidations")
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return CacheStats(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self.entries))
+
+    def _invalidated_since(self, version: int, timestamp: datetime) -> bool:
+        # Callers hold self.lock
+        if version == self.version:
+            return False
+        if not self.invalidations or self.invalidations[0][0] > version + 1:
+            # Older invalidations were forgotten, assume one of them covered the report
+            return True
+        return any(since is None or since <= timestamp for invalidated, since in self.invalidations if invalidated > version)
+
+    def _store(self, key: tuple, report: object, rows: int) -> None:
+        # Callers hold self.lock
+        if rows > self.max_rows or key in self.entries:
+            return
+        self.entries[key] = (report, rows)
+        self.rows += rows
+        timestamp = key[1]
+        if timestamp not in self.keys_by_timestamp:
+            self.keys_by_timestamp[timestamp] = set()
+            insort(self.timestamps, timestamp)
+        self.keys_by_timestamp[timestamp].add(key)
+        while self.rows > self.max_rows:
+            evicted_key, (_, evicted_rows) = self.entries.popitem(last=False)
+            self.rows -= evicted_rows
+            self._forget_timestamp(evicted_key)
+            self.evictions += 1
+            metrics.increment("report_cache.evictions")
+
+    def _forget_timestamp(self, key: tuple) -> None:
+        timestamp = key[1]
+        keys = self.keys_by_timestamp[timestamp]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_timestamp[timestamp]
+            del self.timestamps[bisect_left(self.timestamps, timestamp)]
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from app.async_ledger import AsyncLedger
+from app.ledger import Ledger
+from database.async_database import ThreadedAsyncDatabase
+from database.database import InMemoryDatabase
+from database.sqlite_database import SqliteDatabase
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+
+def make_transaction(transaction_id: int, value: int = 10) -> Transaction:
+    return Transaction(id=transaction_id, timestamp=datetime(2024, 1, 1) + timedelta(days=transaction_id), entries=(
+        TransactionEntry(account_id=1, value=value),
+        TransactionEntry(account_id=2, value=value),
+    ))
+
+class TestAsyncLedger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.ledger = await AsyncLedger.open(await ThreadedAsyncDatabase.open(SqliteDatabase))
+        await self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        await self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+
+    async def asyncTearDown(self):
+        await self.ledger.close()
+
+    async def test_add_and_get_transaction(self):
+        await self.ledger.add_transaction(make_transaction(1))
+        self.assertEqual(await self.ledger.get_transaction(1), make_transaction(1))
+        self.assertEqual((await self.ledger.get_account_balance(1))[1], 10)
+
+    async def test_duplicate_account(self):
+        with self.assertRaises(ValueError):
+            await self.ledger.add_account(Account(id=3, name="Cash", type="debit"))
+
+    async def test_concurrent_adds_are_batched(self):
+        calls = []
+        add_transactions = self.ledger.db.add_transactions
+        async def record_batch(transactions):
+            calls.append(len(transactions))
+            await add_transactions(transactions)
+        self.ledger.db.add_transactions = record_batch
+        await asyncio.gather(*(self.ledger.add_transaction(make_transaction(i)) for i in range(1, 101)))
+        self.assertEqual(sum(calls), 100)
+        self.assertLess(len(calls), 100)
+        self.assertEqual((await self.ledger.get_account_balance(2))[1], 1000)
+
+    async def test_rejections_reach_their_caller(self):
+        results = await asyncio.gather(
+            self.ledger.add_transaction(make_transaction(1)),
+            self.ledger.add_transaction(make_transaction(1)),
+            self.ledger.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=5),))),
+            self.ledger.add_transaction(make_transaction(3)),
+            return_exceptions=True)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIn("not balanced", str(results[2]))
+        self.assertIsNone(results[3])
+        self.assertEqual((await self.ledger.get_account_balance(1))[1], 20)
+
+    async def test_atomic_batch(self):
+        with self.assertRaises(ValueError):
+            await self.ledger.add_transactions([make_transaction(1), make_transaction(1)])
+        self.assertIsNone(await self.ledger.get_transaction(1))
+        result = await self.ledger.add_transactions([make_transaction(1), make_transaction(1)], atomic=False)
+        self.assertEqual(len(result.added), 1)
+        self.assertEqual(len(result.rejected), 1)
+
+    async def test_reports(self):
+        await self.ledger.add_transactions([make_transaction(i, value=i) for i in range(1, 6)])
+        report = await self.ledger.get_trial_balance_report(datetime(2024, 1, 3))
+        self.assertEqual((report.debits_total, report.credits_total), (3, 3))
+        report = await self.ledger.get_trial_balance_report(datetime(2025, 1, 1))
+        self.assertEqual(report.debits_total, 15)
+        self.assertEqual((await self.ledger.get_historic_balance(1, datetime(2024, 1, 4)))[1], 6)
+        report = await self.ledger.get_transaction_report(datetime(2025, 1, 1), page_size=2)
+        self.assertEqual([transaction.id for transaction in report.transactions], [1, 2])
+        report = await self.ledger.get_transaction_report(datetime(2025, 1, 1), page_size=2, after=report.next_cursor)
+        self.assertEqual([transaction.id for transaction in report.transactions], [3, 4])
+        self.assertEqual([transaction.id async for transaction in self.ledger.iter_transactions(account_ids=[1])], [1, 2, 3, 4, 5])
+
+    async def test_reopen_warms_balances(self):
+        await self.ledger.add_transactions([make_transaction(i) for i in range(1, 4)])
+        reopened = await AsyncLedger.open(self.ledger.db)
+        self.assertEqual((await reopened.get_account_balance(1))[1], 30)
+
+    async def test_rejects_postings_in_closed_periods(self):
+        await self.ledger.add_transactions([make_transaction(i) for i in range(1, 4)])
+        # Closed through the sync Ledger on the same storage, on the thread owning the sqlite connection
+        sync_ledger = lambda: Ledger(self.ledger.db.db).close_period(datetime(2024, 1, 3))
+        await asyncio.get_running_loop().run_in_executor(self.ledger.db.executor, sync_ledger)
+        reopened = await AsyncLedger.open(self.ledger.db)
+        back_dated = Transaction(id=10, timestamp=datetime(2024, 1, 2), entries=make_transaction(1).entries)
+        with self.assertRaisesRegex(ValueError, "in the period closed at 2024-01-03"):
+            await reopened.add_transaction(back_dated)
+        await reopened.add_transaction(make_transaction(4))
+        close = await reopened.close_period(datetime(2024, 1, 5))
+        self.assertEqual(close.balances, {1: 40, 2: 40})
+        with self.assertRaisesRegex(ValueError, "already closed"):
+            await reopened.close_period(datetime(2024, 1, 4))
+        back_dated = Transaction(id=11, timestamp=datetime(2024, 1, 4), entries=make_transaction(1).entries)
+        result = await reopened.add_transactions([back_dated, make_transaction(6)], atomic=False)
+        self.assertEqual([transaction.id for transaction in result.added], [6])
+        self.assertIn("closed", result.rejected[0][1])
+        self.assertEqual(await self.ledger.db.list_period_closes(), reopened.list_period_closes())
+
+    async def test_historic_balances_start_from_period_close(self):
+        await self.ledger.add_transactions([make_transaction(i) for i in range(1, 6)])
+        close = await self.ledger.close_period(datetime(2024, 1, 3))
+        self.assertEqual(close.balances, {1: 20, 2: 20})
+        # Only the postings since the close are summed, never the whole history
+        with mock.patch.object(self.ledger.db, "get_balances", side_effect=AssertionError("summed from the start")), \
+                mock.patch.object(self.ledger.db, "get_balance_changes", wraps=self.ledger.db.get_balance_changes) as get_balance_changes:
+            self.assertEqual((await self.ledger.get_historic_balance(1, datetime(2024, 1, 4)))[1], 30)
+            report = await self.ledger.get_trial_balance_report(datetime(2024, 1, 5))
+        self.assertEqual([call.args[1:] for call in get_balance_changes.call_args_list], [
+            (datetime(2024, 1, 3), datetime(2024, 1, 4)),
+            (datetime(2024, 1, 3), datetime(2024, 1, 5)),
+        ])
+        self.assertEqual((report.debits_total, report.credits_total), (40, 40))
+        self.assertEqual((await self.ledger.get_historic_balance(1, datetime(2024, 1, 2)))[1], 10)
+
+
+class TestThreadedAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_off_the_event_loop(self):
+        threads = []
+        class RecordingDatabase(InMemoryDatabase):
+            def list_accounts(self):
+                threads.append(threading.current_thread())
+                return super().list_accounts()
+        db = ThreadedAsyncDatabase(RecordingDatabase(), max_workers=2)
+        await asyncio.gather(db.list_accounts(), db.list_accounts())
+        await db.close()
+        self.assertNotIn(threading.current_thread(), threads)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from app.change_feed import ChangeFeed
+from app.ledger import Ledger
+from database.database import InMemoryDatabase
+from models.account import Account
+from models.change import ChangeKind
+from models.transaction import Transaction, TransactionEntry
+
+def posting(transaction_id: int, *entries: tuple[int, int]) -> Transaction:
+    return Transaction(id=transaction_id, timestamp=datetime(2024, 1, 1) + timedelta(days=transaction_id), entries=tuple(TransactionEntry(*entry) for entry in entries))
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.feed = ChangeFeed(capacity=3)
+
+    def publish(self, count: int) -> None:
+        for _ in range(count):
+            self.feed.publish_account(Account(id=self.feed.latest_sequence + 1, name=f"account-{self.feed.latest_sequence}", type="debit"))
+
+    def sequences(self, changes) -> list[int]:
+        return [change.sequence for change in changes]
+
+    def test_subscription_reads_new_changes_in_order(self):
+        self.publish(1)
+        subscription = self.feed.subscribe()
+        self.assertEqual(subscription.poll(), [])
+        self.publish(2)
+        self.assertEqual(self.sequences(subscription.poll(max_changes=1)), [2])
+        self.assertEqual(self.sequences(subscription.poll()), [3])
+        self.assertEqual(subscription.last_sequence, 3)
+
+    def test_resume_from_sequence(self):
+        self.publish(4)
+        self.assertEqual(self.sequences(self.feed.subscribe(after=2).poll()), [3, 4])
+        self.assertEqual(self.sequences(self.feed.subscribe(after=1).poll()), [2, 3, 4])
+        with self.assertRaisesRegex(ValueError, "no longer buffered, the oldest is 2"):
+            self.feed.subscribe(after=0)
+        with self.assertRaisesRegex(ValueError, "ahead of the latest change 4"):
+            self.feed.subscribe(after=5)
+
+    def test_lagging_subscription_is_overrun(self):
+        subscription = self.feed.subscribe()
+        self.publish(4)
+        with self.assertRaisesRegex(ValueError, "Changes from sequence 1 were dropped"):
+            subscription.poll()
+
+    def test_backpressure_blocks_writers_until_read(self):
+        subscription = self.feed.subscribe(backpressure=True)
+        self.publish(3)
+        self.assertFalse(self.feed.wait_for_space(timeout=0.01))
+        writer = threading.Thread(target=lambda: (self.feed.wait_for_space(), self.publish(1)))
+        writer.start()
+        time.sleep(0.05)
+        self.assertEqual(self.feed.latest_sequence, 3)
+        self.assertEqual(self.sequences(subscription.poll(max_changes=1)), [1])
+        writer.join(timeout=5)
+        self.assertEqual(self.sequences(subscription.poll()), [2, 3, 4])
+        subscription.close()
+        self.publish(5)
+        self.assertTrue(self.feed.wait_for_space(timeout=0))
+
+    def test_poll_waits_for_changes(self):
+        subscription = self.feed.subscribe()
+        self.assertEqual(subscription.poll(timeout=0.01), [])
+        threading.Timer(0.05, self.publish, (1,)).start()
+        self.assertEqual(self.sequences(subscription.poll(timeout=5)), [1])
+
+    def test_iteration_ends_when_closed(self):
+        subscription = self.feed.subscribe()
+        seen = []
+
+        def consume():
+            for change in subscription:
+                seen.append(change.sequence)
+                if change.sequence == 2:
+                    subscription.close()
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        self.publish(3)
+        consumer.join(timeout=5)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(seen[:2], [1, 2])
+
+class TestLedgerChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(InMemoryDatabase(), change_feed_capacity=100)
+        self.subscription = self.ledger.subscribe()
+
+    def test_publishes_accounts_and_postings(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.ledger.add_transaction(posting(1, (1, 100), (2, 100)))
+        self.ledger.add_transactions([posting(2, (1, 30), (1, -10), (2, 20)), posting(2, (1, 1), (2, 1))], atomic=False)
+        changes = self.subscription.poll()
+        self.assertEqual([change.sequence for change in changes], [1, 2, 3, 4])
+        self.assertEqual([change.kind for change in changes], [ChangeKind.ACCOUNT_ADDED] * 2 + [ChangeKind.TRANSACTION_POSTED] * 2)
+        self.assertEqual(changes[1].account.name, "Equity")
+        self.assertEqual(changes[2].balance_deltas, {1: 100, 2: 100})
+        self.assertEqual(changes[3].transaction.id, 2)
+        self.assertEqual(changes[3].balance_deltas, {1: 20, 2: 20})
+        self.assertEqual(changes[3].balances, {1: 120, 2: 120})
+
+    def test_rejected_writes_are_not_published(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        with self.assertRaises(ValueError):
+            self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        with self.assertRaises(ValueError):
+            self.ledger.add_transaction(posting(1, (1, 5), (9, 5)))
+        self.assertEqual(len(self.subscription.poll()), 1)
+
+    def test_concurrent_postings_keep_balances_in_order(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.subscription.poll()
+        subscription = self.ledger.subscribe(backpressure=True)
+        threads = [
+            threading.Thread(target=lambda start=start: [self.ledger.add_transaction(posting(transaction_id, (1, 1), (2, 1))) for transaction_id in range(start, start + 25)])
+            for start in (1, 26, 51, 76, 101, 126)
+        ]
+        for thread in threads:
+            thread.start()
+        balances = []
+        deadline = time.monotonic() + 30
+        while len(balances) < 150 and time.monotonic() < deadline:
+            balances.extend(change.balances[1] for change in subscription.poll(timeout=1))
+        for thread in threads:
+            thread.join()
+        subscription.close()
+        self.assertEqual(balances, list(range(1, 151)))
+
+    def test_disabled_by_default(self):
+        ledger = Ledger(InMemoryDatabase())
+        self.assertIsNone(ledger.changes)
+        with self.assertRaisesRegex(ValueError, "change feed is disabled"):
+            ledger.subscribe()
+
+if __name__ == "__main__":
+    unittest.main()
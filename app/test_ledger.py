@@ -1,8 +1,11 @@
+import threading
 import unittest
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
 from app.ledger import Ledger
 from models.account import Account
-from models.transaction import Transaction, TransactionEntry
+from models.transaction import Posting, Transaction, TransactionEntry
 from database.database import InMemoryDatabase
 
 class TestLedger(unittest.TestCase):
@@ -115,6 +118,97 @@ class TestLedger(unittest.TestCase):
         self.assertEqual(account, acc2)
         self.assertEqual(balance, 1000)
 
+    def test_get_balances(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        for txn_id, timestamp, value in [(1, datetime(2024, 1, 1), 1000), (2, datetime(2024, 6, 1), 500)]:
+            entries = (TransactionEntry(account_id=1, value=value), TransactionEntry(account_id=2, value=value))
+            self.ledger.add_transaction(Transaction(id=txn_id, timestamp=timestamp, entries=entries))
+        self.assertEqual(self.ledger.get_balances([2, 1]), {2: 1500, 1: 1500})
+        self.assertEqual(self.ledger.get_balances([1, 2], datetime(2024, 3, 1)), {1: 1000, 2: 1000})
+        with self.assertRaisesRegex(ValueError, "Account with ID 3 does not exist"):
+            self.ledger.get_balances([1, 3])
+
+    def test_reader_between_cache_update_steps(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        entries = lambda value: (TransactionEntry(account_id=1, value=value), TransactionEntry(account_id=2, value=value))
+        self.ledger.add_transaction(Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=entries(5)))
+        # A reader runs before every lock a write takes, i.e. between the steps that update the cache
+        seen = []
+        reading = False
+        def read():
+            nonlocal reading
+            if not reading:
+                reading = True
+                report = self.ledger.get_trial_balance_report(datetime(2024, 6, 1))
+                seen.append((self.ledger.get_balances([1], datetime(2024, 6, 1))[1], report.debits_total))
+                reading = False
+        class ReadingLock:
+            def __init__(self, lock):
+                self.lock = lock
+            def __enter__(self):
+                read()
+                return self.lock.__enter__()
+            def __exit__(self, *exc_info):
+                return self.lock.__exit__(*exc_info)
+        self.ledger.latest_timestamp_lock = ReadingLock(self.ledger.latest_timestamp_lock)
+        acquire = self.ledger.account_locks.acquire
+        with mock.patch.object(self.ledger.account_locks, "acquire", lambda keys: (read(), acquire(keys))[1]):
+            self.ledger.add_transaction(Transaction(id=2, timestamp=datetime(2025, 1, 1), entries=entries(7)))
+        self.assertGreaterEqual(len(seen), 2)
+        self.assertEqual(set(seen), {(5, 5)})
+        # Nor was a wrong report left in the report cache
+        self.assertEqual(self.ledger.get_trial_balance_report(datetime(2024, 6, 1)).debits_total, 5)
+        self.assertEqual(self.ledger.get_balances([1]), {1: 12})
+
+    def test_close_period(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        self.ledger.add_transaction(Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=1000), TransactionEntry(account_id=2, value=1000))))
+        period_close = self.ledger.close_period(datetime(2024, 1, 31))
+        self.assertEqual(period_close.balances, {1: 1000, 2: 1000})
+        self.assertEqual(self.ledger.list_period_closes(), [period_close])
+        with self.assertRaises(ValueError):
+            self.ledger.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 15), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=2, value=5))))
+        self.ledger.add_transaction(Transaction(id=3, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=500), TransactionEntry(account_id=2, value=500))))
+        self.ledger.add_transaction(Transaction(id=4, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=1), TransactionEntry(account_id=2, value=1))))
+        self.assertEqual(self.ledger.get_historic_balance(1, datetime(2024, 2, 15))[1], 1500)
+        report = self.ledger.get_trial_balance_report(datetime(2024, 2, 15))
+        self.assertEqual((report.debits_total, report.credits_total), (1500, 1500))
+
+    def test_get_t_account_report(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        for transaction_id, timestamp, value in ((1, datetime(2024, 1, 1), 1000), (2, datetime(2024, 2, 1), -300), (3, datetime(2024, 3, 1), 50)):
+            self.ledger.add_transaction(Transaction(id=transaction_id, timestamp=timestamp, entries=(TransactionEntry(account_id=1, value=value), TransactionEntry(account_id=2, value=value))))
+        report = self.ledger.get_t_account_report(1, datetime(2024, 2, 15), start=datetime(2024, 2, 1))
+        self.assertEqual(report.opening_balance, 1000)
+        self.assertEqual(report.postings, [Posting(transaction_id=2, timestamp=datetime(2024, 2, 1), value=-300)])
+        self.assertEqual(list(report.iter_rows()), [[2, "2024-02-01T00:00:00", "", 300, 700]])
+        self.assertEqual(report.closing_balance, 700)
+        report = self.ledger.get_t_account_report(2, datetime(2024, 12, 31))
+        self.assertEqual(report.opening_balance, 0)
+        self.assertEqual([row[2:] for row in report.iter_rows()], [["", 1000, 1000], [300, "", 700], ["", 50, 750]])
+        self.assertIn("T-Account Revenue (credit)", report.table_str())
+        self.assertEqual(len(self.ledger.get_account_history(1)), 3)
+        with self.assertRaises(ValueError):
+            self.ledger.get_t_account_report(999, datetime(2024, 12, 31))
+
+    def test_running_balances_loaded_at_startup(self):
+        db = InMemoryDatabase()
+        db.add_account(Account(id=1, name="Cash", type="debit"))
+        db.add_account(Account(id=2, name="Revenue", type="credit"))
+        db.add_account(Account(id=3, name="Bank", type="debit"))
+        db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=1000),
+            TransactionEntry(account_id=2, value=1000),
+        )))
+        ledger = Ledger(db)
+        self.assertEqual(ledger.get_account_balance(1)[1], 1000)
+        self.assertEqual(ledger.get_account_balance(2)[1], 1000)
+        self.assertEqual(ledger.get_account_balance(3)[1], 0)
+
     def test_get_account_balance(self):
         acc1 = Account(id=1, name="Cash", type="debit")
         acc2 = Account(id=2, name="Revenue", type="credit")
@@ -149,6 +243,30 @@ class TestLedger(unittest.TestCase):
         self.assertEqual(balance, 1300)
 
 
+    def test_add_transactions(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        txn1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=1000),
+            TransactionEntry(account_id=2, value=1000),
+        ))
+        unbalanced = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(
+            TransactionEntry(account_id=1, value=1000),
+            TransactionEntry(account_id=2, value=10),
+        ))
+        txn3 = Transaction(id=3, timestamp=datetime(2024, 1, 3), entries=(
+            TransactionEntry(account_id=1, value=-200),
+            TransactionEntry(account_id=2, value=-200),
+        ))
+        result = self.ledger.add_transactions([txn1, unbalanced, txn3], atomic=False)
+        self.assertEqual(result.added, (txn1, txn3))
+        self.assertEqual(len(result.rejected), 1)
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 800)
+        self.assertEqual(self.ledger.get_account_balance(2)[1], 800)
+        with self.assertRaises(ValueError):
+            self.ledger.add_transactions([unbalanced])
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 800)
+
     def test_get_trial_balance_report(self):
         acc1 = Account(id=1, name="Cash", type="debit")
         acc2 = Account(id=2, name="Revenue", type="credit")
@@ -189,6 +307,39 @@ class TestLedger(unittest.TestCase):
         self.assertEqual(report.debits_total, 1500 + 3000)
         self.assertEqual(report.credits_total, 1500 + 3000)
 
+    def test_current_trial_balance_served_from_running_balances(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        self.ledger.add_transaction(Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(
+            TransactionEntry(account_id=1, value=1000),
+            TransactionEntry(account_id=2, value=1000),
+        )))
+        # Back-dated transaction
+        self.ledger.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=300),
+            TransactionEntry(account_id=2, value=300),
+        )))
+        with mock.patch.object(self.ledger.transaction_dao, "get_balances") as get_balances:
+            report = self.ledger.get_trial_balance_report(datetime(2024, 6, 1))
+            get_balances.assert_not_called()
+        self.assertEqual(report.debits_total, 1300)
+        self.assertEqual(report.credits_total, 1300)
+        report = self.ledger.get_trial_balance_report(datetime(2024, 3, 1))
+        self.assertEqual(report.debits_total, 300)
+
+    def test_latest_timestamp_loaded_at_startup(self):
+        db = InMemoryDatabase()
+        db.add_account(Account(id=1, name="Cash", type="debit"))
+        db.add_account(Account(id=2, name="Revenue", type="credit"))
+        db.add_transaction(Transaction(id=1, timestamp=datetime(2999, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=1000),
+            TransactionEntry(account_id=2, value=1000),
+        )))
+        ledger = Ledger(db)
+        self.assertEqual(ledger.latest_timestamp, datetime(2999, 1, 1))
+        self.assertEqual(ledger.get_account_balance(1)[1], 1000)
+        self.assertEqual(ledger.get_historic_balance(1, datetime.now())[1], 0)
+
     def test_get_transaction_report(self):
         acc1 = Account(id=1, name="Cash", type="debit")
         acc2 = Account(id=2, name="Revenue", type="credit")
@@ -219,4 +370,65 @@ class TestLedger(unittest.TestCase):
         self.assertIn(txn1, report2.transactions)
         self.assertIn(txn2, report2.transactions)
 
+    def test_get_transaction_report_window_and_pages(self):
+        acc1 = Account(id=1, name="Cash", type="debit")
+        acc2 = Account(id=2, name="Revenue", type="credit")
+        acc3 = Account(id=3, name="Bank", type="debit")
+        for account in (acc1, acc2, acc3):
+            self.ledger.add_account(account)
+        transactions = [
+            Transaction(id=i, timestamp=datetime(2024, i, 1), entries=(
+                TransactionEntry(account_id=1 if i % 2 else 3, value=i),
+                TransactionEntry(account_id=2, value=i),
+            ))
+            for i in range(1, 8)
+        ]
+        for txn in transactions:
+            self.ledger.add_transaction(txn)
+        report = self.ledger.get_transaction_report(datetime(2024, 6, 1), start=datetime(2024, 2, 1), account_ids=[1], page_size=1)
+        self.assertEqual(report.accounts, [acc1])
+        self.assertEqual(report.transactions, [transactions[2]])
+        self.assertEqual(report.next_cursor, (datetime(2024, 3, 1), 3))
+        report = self.ledger.get_transaction_report(datetime(2024, 6, 1), start=datetime(2024, 2, 1), account_ids=[1], page_size=1, after=report.next_cursor)
+        self.assertEqual(report.transactions, [transactions[4]])
+        self.assertIsNone(report.next_cursor)
+        self.assertEqual(list(report.iter_rows()), [[5, "2024-05-01T00:00:00", 5]])
+        with self.assertRaises(ValueError):
+            self.ledger.get_transaction_report(datetime(2024, 6, 1), account_ids=[999])
+
+    def test_concurrent_posting(self):
+        for account in (Account(id=1, name="Cash", type="debit"), Account(id=2, name="Revenue", type="credit"), Account(id=3, name="Bank", type="debit")):
+            self.ledger.add_account(account)
+        def post(transaction_id):
+            self.ledger.add_transaction(Transaction(id=transaction_id, timestamp=datetime(2024, 1, 1) + timedelta(minutes=transaction_id), entries=(
+                TransactionEntry(account_id=1 + transaction_id % 2 * 2, value=1),
+                TransactionEntry(account_id=2, value=1),
+            )))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(post, range(1000)))
+        self.assertEqual(self.ledger.get_account_balance(2)[1], 1000)
+        self.assertEqual(self.ledger.get_account_balance(1)[1] + self.ledger.get_account_balance(3)[1], 1000)
+        self.assertEqual(len(self.ledger.list_transactions()), 1000)
+        report = self.ledger.get_trial_balance_report(datetime(2024, 1, 1, 12))
+        self.assertEqual(report.debits_total, report.credits_total)
+
+    def test_concurrent_duplicate_ids(self):
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Revenue", type="credit"))
+        transaction = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=10),
+            TransactionEntry(account_id=2, value=10),
+        ))
+        barrier = threading.Barrier(8)
+        def post():
+            barrier.wait()
+            try:
+                self.ledger.add_transaction(transaction)
+                return True
+            except ValueError:
+                return False
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = [future.result() for future in [pool.submit(post) for _ in range(8)]]
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 10)
 
@@ -0,0 +1,220 @@
+import os
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from app import ledger_client
+from app.ledger import Ledger
+from app.ledger_client import LedgerClient
+from app.ledger_server import LedgerServer, LedgerService
+from app.protocol import decode_message, encode_message, parse_address
+from cli.ledger_shell import LedgerShell
+from database.database import InMemoryDatabase
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+
+def balanced(transaction_id: int, timestamp: datetime, value: int) -> Transaction:
+    return Transaction(id=transaction_id, timestamp=timestamp, entries=(
+        TransactionEntry(account_id=1, value=value),
+        TransactionEntry(account_id=2, value=value),
+    ))
+
+class TestLedgerServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "ledger.sock")
+        self.ledger = Ledger(InMemoryDatabase(), change_feed_capacity=100)
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.server = LedgerServer(self.ledger, self.path)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(self.server.close)
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+        self.client = LedgerClient(self.path, timeout=10)
+        self.addCleanup(self.client.close)
+
+    def test_client_mirrors_ledger(self):
+        self.client.add_transaction(balanced(1, datetime(2024, 1, 1), 100))
+        self.client.add_transaction(balanced(2, datetime(2024, 2, 1), 50))
+        self.assertEqual(self.client.get_account(1), self.ledger.get_account(1))
+        self.assertIsNone(self.client.get_account(3))
+        self.assertEqual(self.client.get_transaction(2), balanced(2, datetime(2024, 2, 1), 50))
+        self.assertEqual(self.client.list_transactions(), self.ledger.list_transactions())
+        self.assertEqual(self.client.get_account_balance(1), self.ledger.get_account_balance(1))
+        self.assertEqual(self.client.get_historic_balance(2, datetime(2024, 1, 15)), self.ledger.get_historic_balance(2, datetime(2024, 1, 15)))
+        self.assertEqual(self.client.get_trial_balance_report(datetime(2024, 3, 1)), self.ledger.get_trial_balance_report(datetime(2024, 3, 1)))
+        self.assertEqual(
+            self.client.get_transaction_report(datetime(2024, 3, 1), page_size=1),
+            self.ledger.get_transaction_report(datetime(2024, 3, 1), page_size=1))
+        self.assertEqual(
+            self.client.get_t_account_report(1, datetime(2024, 3, 1), start=datetime(2024, 2, 1)),
+            self.ledger.get_t_account_report(1, datetime(2024, 3, 1), start=datetime(2024, 2, 1)))
+        self.assertEqual(self.client.get_account_history(1), self.ledger.get_account_history(1))
+        self.assertEqual(self.client.close_period(datetime(2024, 1, 31)), self.ledger.list_period_closes()[0])
+        self.assertEqual(self.client.list_period_closes(), self.ledger.list_period_closes())
+
+    def test_errors_are_raised_as_value_error(self):
+        with self.assertRaisesRegex(ValueError, "Account with ID 3 does not exist"):
+            self.client.get_account_balance(3)
+        # The connection is still usable after an error
+        self.assertEqual(self.client.get_account_balance(1)[1], 0)
+
+    def test_add_transactions_batch(self):
+        transactions = [balanced(1, datetime(2024, 1, 1), 100), balanced(1, datetime(2024, 1, 2), 5), balanced(2, datetime(2024, 1, 3), 7)]
+        result = self.client.add_transactions(transactions, atomic=False)
+        self.assertEqual(result.added, (transactions[0], transactions[2]))
+        self.assertEqual(len(result.rejected), 1)
+        self.assertIs(result.rejected[0][0], transactions[1])
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 107)
+
+    def test_get_balances_batch(self):
+        self.client.add_transactions([balanced(1, datetime(2024, 1, 1), 100), balanced(2, datetime(2024, 2, 1), 50)])
+        self.assertEqual(self.client.get_balances([1, 2]), {1: 150, 2: 150})
+        self.assertEqual(self.client.get_balances([2], datetime(2024, 1, 15)), {2: 100})
+        with self.assertRaisesRegex(ValueError, "Account with ID 9 does not exist"):
+            self.client.get_balances([1, 9])
+
+    def test_get_changes_resumes_from_sequence(self):
+        changes, last_sequence = self.client.get_changes(after=0)
+        self.assertEqual([change.account.id for change in changes], [1, 2])
+        self.assertEqual(self.client.get_changes(), ([], 2))
+        self.client.add_transaction(balanced(1, datetime(2024, 1, 1), 100))
+        changes, last_sequence = self.client.get_changes(after=last_sequence)
+        self.assertEqual([(change.sequence, change.transaction.id) for change in changes], [(3, 1)])
+        self.assertEqual(changes[0].balances, {1: 100, 2: 100})
+        # A long poll waits for the next posting
+        threading.Timer(0.05, self.ledger.add_transaction, (balanced(2, datetime(2024, 1, 2), 5),)).start()
+        changes, last_sequence = self.client.get_changes(after=last_sequence, timeout=5)
+        self.assertEqual([change.balances for change in changes], [{1: 105, 2: 105}])
+        self.assertEqual(last_sequence, 4)
+
+    def test_iter_transactions_pages(self):
+        transactions = [balanced(transaction_id, datetime(2024, 1, transaction_id), 1) for transaction_id in range(1, 8)]
+        self.ledger.add_transactions(transactions)
+        with mock.patch.object(ledger_client, "ITER_PAGE_SIZE", 3):
+            self.assertEqual(list(self.client.iter_transactions()), transactions)
+            self.assertEqual(list(self.client.iter_transactions(start=datetime(2024, 1, 3), end=datetime(2024, 1, 6))), transactions[2:6])
+
+    def test_call_many_pipelines_requests(self):
+        with mock.patch.object(ledger_client, "PIPELINE_WINDOW", 2):
+            results = self.client.call_many([("get_account_balance", {"account_id": 1})] * 5)
+        self.assertEqual(len(results), 5)
+        with self.assertRaisesRegex(ValueError, "Unknown method 'nope'"):
+            self.client.call_many([("get_account", {"account_id": 1}), ("nope", {}), ("get_account", {"account_id": 2})])
+        # Every response of the failed pipeline was read, so the next call gets its own
+        self.assertEqual(self.client.get_account(2).name, "Equity")
+
+    def test_pipelined_requests_answered_in_order(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(10)
+            connection.connect(self.path)
+            # Requests in one write, the last one split across writes
+            connection.sendall(
+                encode_message({"id": "a", "method": "get_account", "params": {"account_id": 1}})
+                + b"not json\n"
+                + encode_message({"id": "b", "method": "get_account", "params": {}})
+                + b'{"id": "c", "method": "get_bal')
+            connection.sendall(b'ances", "params": {"account_ids": [2]}}\n')
+            reader = connection.makefile("rb")
+            responses = [decode_message(reader.readline()) for _ in range(4)]
+        self.assertEqual(responses[0], {"id": "a", "result": {"id": 1, "name": "Cash", "type": "debit", "description": ""}})
+        self.assertIsNone(responses[1]["id"])
+        self.assertIn("Invalid JSON", responses[1]["error"])
+        self.assertEqual(responses[2], {"id": "b", "error": "Missing parameter 'account_id'."})
+        self.assertEqual(responses[3], {"id": "c", "result": {"2": 0}})
+
+    def test_bad_requests_dont_end_the_connection(self):
+        with mock.patch.object(self.ledger, "get_account", side_effect=RuntimeError("disk on fire")), self.assertLogs("app.ledger_server", "ERROR"):
+            with self.assertRaisesRegex(ValueError, "Internal error: RuntimeError: disk on fire"):
+                self.client.call_many([("get_account", {"account_id": 1}), ("iter_transactions", [1])])
+        with self.assertRaisesRegex(ValueError, "Expected params to be a JSON object"):
+            self.client.call_many([("iter_transactions", [1]), ("get_account", {"account_id": 2})])
+        # Both pipelines were answered in full, so the connection is still in step
+        self.assertEqual(self.client.get_account(2).name, "Equity")
+
+    def test_shell_over_client(self):
+        shell = LedgerShell(self.client)
+        with mock.patch("builtins.print") as mock_print:
+            shell.onecmd("add_transaction 1 1:30 2:30 --timestamp 2024-01-01")
+            shell.onecmd("get_account_balance 2")
+        self.assertEqual(self.ledger.get_account_balance(2)[1], 30)
+        self.assertIn("30", str(mock_print.call_args_list[-1]))
+
+    def test_refuses_address_in_use_and_removes_socket_on_close(self):
+        with self.assertRaisesRegex(OSError, "already listening"):
+            LedgerServer(self.ledger, self.path)
+        self.server.shutdown()
+        self.server.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_replaces_stale_socket(self):
+        path = os.path.join(self.directory.name, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(path)
+        server = LedgerServer(self.ledger, path)
+        server.close()
+
+    def test_leaves_other_files_at_the_address_alone(self):
+        path = os.path.join(self.directory.name, "ledger.db")
+        with open(path, "w") as data:
+            data.write("not a socket")
+        with self.assertRaisesRegex(OSError, "not a socket"):
+            LedgerServer(self.ledger, path)
+        with open(path) as data:
+            self.assertEqual(data.read(), "not a socket")
+
+    def test_socket_is_private_from_creation(self):
+        # Even under a permissive umask the socket is bound with owner only permissions, it isn't chmod-ed later
+        path = os.path.join(self.directory.name, "private.sock")
+        umask = os.umask(0)
+        try:
+            with mock.patch("os.chmod") as chmod:
+                server = LedgerServer(self.ledger, path)
+            self.addCleanup(server.close)
+            self.assertFalse(chmod.called)
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            # The process umask is restored afterwards
+            self.assertEqual(os.umask(0), 0)
+        finally:
+            os.umask(umask)
+
+class TestTCPLedgerServer(unittest.TestCase):
+    def test_serves_loopback_only(self):
+        ledger = Ledger(InMemoryDatabase())
+        ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        for host in ("0.0.0.0", "::"):
+            with self.assertRaisesRegex(ValueError, "only loopback addresses"):
+                LedgerServer(ledger, (host, 0))
+        server = LedgerServer(ledger, ("127.0.0.1", 0))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with LedgerClient(server.address, timeout=10) as client:
+                self.assertEqual(client.get_account(1).name, "Cash")
+        finally:
+            server.shutdown()
+            thread.join()
+            server.close()
+
+class TestLedgerService(unittest.TestCase):
+    def test_serialises_requests_when_not_thread_safe(self):
+        service = LedgerService(Ledger(InMemoryDatabase()), thread_safe=False)
+        self.assertIsInstance(service.lock, type(threading.Lock()))
+        response = service.handle({"id": 1, "method": "get_account", "params": {"account_id": 1}})
+        self.assertEqual(response, {"id": 1, "result": None})
+
+class TestParseAddress(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address("localhost:8765"), ("localhost", 8765))
+        self.assertEqual(parse_address("/tmp/ledger.sock"), "/tmp/ledger.sock")
+        self.assertEqual(parse_address("ledger.sock"), "ledger.sock")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from app import report_cache
+from app.ledger import Ledger
+from app.report_cache import ReportCache
+from database.database import InMemoryDatabase
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+
+JAN = datetime(2024, 1, 31)
+FEB = datetime(2024, 2, 29)
+MAR = datetime(2024, 3, 31)
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ReportCache(max_rows=10)
+
+    def cached(self, key, report, rows=1):
+        return self.cache.get_or_compute(key, lambda: report, lambda _: rows)
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.cached(("a", JAN), "first"), "first")
+        self.assertEqual(self.cached(("a", JAN), "second"), "first")
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.size), (1, 1, 1))
+
+    def test_invalidates_reports_at_or_after_timestamp(self):
+        for key in [("a", JAN), ("a", FEB), ("b", FEB), ("a", MAR)]:
+            self.cached(key, "old")
+        self.cache.invalidate(FEB)
+        self.assertEqual(self.cached(("a", JAN), "new"), "old")
+        self.assertEqual(self.cached(("a", FEB), "new"), "new")
+        self.assertEqual(self.cached(("b", FEB), "new"), "new")
+        self.assertEqual(self.cached(("a", MAR), "new"), "new")
+
+    def test_invalidate_everything(self):
+        self.cached(("a", JAN), "old")
+        self.cache.invalidate()
+        self.assertEqual(self.cached(("a", JAN), "new"), "new")
+        self.assertEqual(self.cache.rows, 1)
+
+    def test_evicts_least_recently_used_by_rows(self):
+        self.cached(("a", JAN), "jan", rows=4)
+        self.cached(("a", FEB), "feb", rows=4)
+        self.cached(("a", JAN), "hit")
+        self.cached(("a", MAR), "mar", rows=4)
+        self.assertEqual(self.cache.stats().evictions, 1)
+        self.assertEqual(self.cached(("a", JAN), "new"), "jan")
+        self.assertEqual(self.cached(("a", FEB), "new", rows=4), "new")
+        self.assertEqual(self.cache.rows, 8)
+        self.assertEqual(self.cache.timestamps, [JAN, FEB])
+
+    def test_report_larger_than_cache_is_not_stored(self):
+        self.cached(("a", JAN), "huge", rows=11)
+        self.assertEqual(self.cache.stats().size, 0)
+
+    def test_report_invalidated_while_computing_is_not_stored(self):
+        def compute_during_posting(posted_at):
+            self.cache.invalidate(posted_at)
+            return "computed"
+        self.cache.get_or_compute(("a", FEB), lambda: compute_during_posting(JAN), lambda _: 1)
+        self.assertEqual(self.cache.stats().size, 0)
+        # A posting after the report's timestamp doesn't change it
+        self.cache.get_or_compute(("a", FEB), lambda: compute_during_posting(MAR), lambda _: 1)
+        self.assertEqual(self.cache.stats().size, 1)
+
+    def test_report_is_not_stored_when_invalidations_were_forgotten(self):
+        def compute_during_postings():
+            for _ in range(3):
+                self.cache.invalidate(MAR)
+            return "computed"
+        with mock.patch.object(report_cache, "MAX_TRACKED_INVALIDATIONS", 2):
+            cache = self.cache = ReportCache(max_rows=10)
+        cache.get_or_compute(("a", JAN), compute_during_postings, lambda _: 1)
+        self.assertEqual(cache.stats().size, 0)
+
+class TestLedgerReportCache(unittest.TestCase):
+    def setUp(self):
+        self.db = InMemoryDatabase()
+        self.ledger = Ledger(self.db)
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.post(1, datetime(2024, 1, 15), 100)
+        self.post(2, datetime(2024, 2, 15), 50)
+
+    def post(self, transaction_id, timestamp, value):
+        entries = (TransactionEntry(account_id=1, value=value), TransactionEntry(account_id=2, value=value))
+        self.ledger.add_transaction(Transaction(id=transaction_id, timestamp=timestamp, entries=entries))
+
+    def test_historic_reports_stay_cached_while_postings_arrive(self):
+        january = self.ledger.get_trial_balance_report(JAN)
+        february = self.ledger.get_trial_balance_report(FEB)
+        self.post(3, datetime(2024, 2, 20), 7)
+        with mock.patch.object(self.db, "get_balances", wraps=self.db.get_balances) as get_balances:
+            self.assertIs(self.ledger.get_trial_balance_report(JAN), january)
+            get_balances.assert_not_called()
+            self.assertEqual(self.ledger.get_trial_balance_report(FEB).debits_total, february.debits_total + 7)
+
+    def test_back_dated_posting_invalidates_later_reports(self):
+        report = self.ledger.get_transaction_report(MAR, start=JAN, account_ids=[1])
+        self.assertEqual(len(report.transactions), 1)
+        self.post(3, datetime(2024, 2, 1), 5)
+        self.assertEqual(len(self.ledger.get_transaction_report(MAR, start=JAN, account_ids=[1]).transactions), 2)
+        t_account = self.ledger.get_t_account_report(1, FEB)
+        self.ledger.add_transactions([
+            Transaction(id=4, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(1, 1), TransactionEntry(2, 1))),
+            Transaction(id=5, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(1, 2), TransactionEntry(2, 2))),
+        ])
+        self.assertEqual(self.ledger.get_t_account_report(1, FEB).closing_balance, t_account.closing_balance + 2)
+
+    def test_new_account_invalidates_every_report(self):
+        self.ledger.get_trial_balance_report(JAN)
+        self.ledger.add_account(Account(id=3, name="Loans", type="credit"))
+        self.assertEqual(len(self.ledger.get_trial_balance_report(JAN).credits), 2)
+
+    def test_cache_can_be_disabled(self):
+        ledger = Ledger(self.db, report_cache_rows=0)
+        self.assertIsNone(ledger.report_cache)
+        self.assertIsNot(ledger.get_trial_balance_report(JAN), ledger.get_trial_balance_report(JAN))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Wall time of starting the CLI, running no commands and exiting, against a bare interpreter start:
+#   python -m benchmarks.cold_start --runs 20 --budget-ms 50
+# Exits with status 1 when the median time over the bare interpreter exceeds the budget.
+# Bytecode caches are written first, a run that has to compile the sources measures the compiler.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def median_seconds(command: list[str], runs: int, stdin: bytes = b"") -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=stdin, stdout=subprocess.DEVNULL, cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold start benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Allowed start up time on top of the bare interpreter.")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "compileall", "-q", "app", "cli", "database", "metrics", "models"], cwd=ROOT, check=True)
+    bare = median_seconds([sys.executable, "-c", "pass"], args.runs)
+    script = median_seconds([sys.executable, "__main__.py", "--script", "-"], args.runs, b"exit\n")
+    shell = median_seconds([sys.executable, "__main__.py"], args.runs, b"exit\n")
+    print(f"bare interpreter: {bare * 1000:.1f} ms")
+    print(f"--script - with exit: {script * 1000:.1f} ms ({(script - bare) * 1000:.1f} ms over bare)")
+    print(f"shell with exit: {shell * 1000:.1f} ms ({(shell - bare) * 1000:.1f} ms over bare)")
+    overhead = (max(script, shell) - bare) * 1000
+    if overhead > args.budget_ms:
+        print(f"Over the {args.budget_ms:.0f} ms budget by {overhead - args.budget_ms:.1f} ms")
+        sys.exit(1)
+    print(f"Within the {args.budget_ms:.0f} ms budget")
+
+if __name__ == "__main__":
+    main()
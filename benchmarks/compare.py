@@ -0,0 +1,29 @@
+import argparse
+import json
+
+# Compares two result files written by benchmarks.run:
+#   python -m benchmarks.compare before.json after.json
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before", type=str)
+    parser.add_argument("after", type=str)
+    parser.add_argument("--metric", type=str, default="p50_us", choices=["mean_us", "p50_us", "p95_us", "max_us", "total_s"])
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    print(f"{'backend':<10} {'operation':<30} {'before':>14} {'after':>14} {'change':>8}")
+    for backend, operations in after["backends"].items():
+        for operation, result in operations.items():
+            previous = before["backends"].get(backend, {}).get(operation)
+            if previous is None:
+                continue
+            old, new = previous[args.metric], result[args.metric]
+            change = f"{new / old:.2f}x" if old else "-"
+            print(f"{backend:<10} {operation:<30} {old:>14.1f} {new:>14.1f} {change:>8}")
+
+if __name__ == "__main__":
+    main()
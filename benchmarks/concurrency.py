@@ -0,0 +1,52 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.ledger import Ledger
+from benchmarks.synthetic import generate_accounts, generate_transactions
+from database.database import InMemoryDatabase
+from models.transaction import Transaction
+
+# Posting throughput of one Ledger shared by a thread pool, and a check that no posting was lost:
+#   python -m benchmarks.concurrency --accounts 1000 --transactions 50000 --threads 1 2 4 8
+
+def post_all(ledger: Ledger, transactions: list[Transaction], threads: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        if batch_size > 1:
+            batches = [transactions[i:i + batch_size] for i in range(0, len(transactions), batch_size)]
+            list(pool.map(ledger.add_transactions, batches))
+        else:
+            list(pool.map(ledger.add_transaction, transactions))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Multithreaded ledger posting benchmark")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=50_000)
+    parser.add_argument("--entries", type=int, default=2, help="Entries per transaction.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=1, help="Transactions per add_transactions call, 1 posts them one at a time.")
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    transactions = list(generate_transactions(accounts, args.transactions, args.entries))
+    expected = Ledger(InMemoryDatabase())
+    for account in accounts:
+        expected.add_account(account)
+    expected.add_transactions(transactions)
+
+    for threads in args.threads:
+        ledger = Ledger(InMemoryDatabase())
+        for account in accounts:
+            ledger.add_account(account)
+        elapsed = post_all(ledger, transactions, threads, args.batch_size)
+        assert ledger.running_balance_cache == expected.running_balance_cache, "Lost balance updates"
+        assert len(ledger.list_transactions()) == len(transactions)
+        report = ledger.get_trial_balance_report(datetime.max)
+        assert report.debits_total == report.credits_total
+        print(f"{threads} threads: {len(transactions) / elapsed:,.0f} transactions/s ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    main()
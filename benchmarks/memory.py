@@ -0,0 +1,43 @@
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.synthetic import generate_accounts, generate_transactions, populate
+from database.columnar_database import ColumnarDatabase
+from database.database import InMemoryDatabase
+
+# Measures the memory held per million postings by each in-memory backend:
+#   python -m benchmarks.memory --transactions 200000
+
+BACKENDS = {
+    "memory": InMemoryDatabase,
+    "columnar": ColumnarDatabase,
+}
+
+def measure(backend, accounts, transaction_count: int) -> int:
+    # The transactions are generated one at a time, so only what the backend keeps is counted
+    gc.collect()
+    tracemalloc.start()
+    db = backend()
+    populate(db, accounts, generate_transactions(accounts, transaction_count))
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del db
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage memory benchmark")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    postings = args.transactions * 2
+    for name, backend in BACKENDS.items():
+        size = measure(backend, accounts, args.transactions)
+        # Bytes per posting is the same number as MB per million postings
+        print(f"{name}: {size / postings:.0f} bytes per posting ({size / postings:.0f} MB per million postings)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from app.ledger import Ledger
+from benchmarks.synthetic import DEFAULT_START, DEFAULT_SPAN, generate_accounts, generate_transactions, populate
+from database.columnar_database import ColumnarDatabase
+from database import parallel
+
+# Historic trial balances over a large columnar ledger, summed by 1..N worker processes:
+#   python -m benchmarks.parallel --accounts 10000 --transactions 2000000 --workers 1 2 4 8
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel trial balance benchmark")
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--entries", type=int, default=2, help="Entries per transaction.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=5, help="Reports timed per worker count.")
+    args = parser.parse_args()
+    # Always use the pool when more than one worker is asked for, whatever the ledger size
+    parallel.PARALLEL_MIN_POSTINGS = 0
+
+    accounts = generate_accounts(args.accounts)
+    source = ColumnarDatabase()
+    populate(source, accounts, generate_transactions(accounts, args.transactions, args.entries))
+    # Historic as-of timestamps aren't served from the running balances
+    timestamps = [DEFAULT_START + DEFAULT_SPAN * fraction for fraction in (0.5, 0.6, 0.7, 0.8, 0.9)]
+    expected = None
+    for workers in args.workers:
+        db = ColumnarDatabase(workers=workers)
+        db.accounts_by_id, db.accounts_by_name = source.accounts_by_id, source.accounts_by_name
+        for column in ("transaction_ids", "transaction_timestamps", "transaction_offsets", "posting_account_ids", "posting_values", "posting_timestamps"):
+            setattr(db, column, getattr(source, column))
+        ledger = Ledger(db, report_cache_rows=0)
+        ledger.get_trial_balance_report(timestamps[0])  # Starts the pool and shares the columns
+        start = time.perf_counter()
+        reports = [ledger.get_trial_balance_report(timestamps[i % len(timestamps)]) for i in range(args.repeat)]
+        elapsed = (time.perf_counter() - start) / args.repeat
+        db.close()
+        if expected is None:
+            expected = reports
+        assert reports == expected, "Parallel sums differ"
+        postings = len(source.posting_values)
+        print(f"{workers} workers: {elapsed * 1000:.1f} ms per trial balance over {postings} postings")
+
+if __name__ == "__main__":
+    main()
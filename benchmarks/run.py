@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from app.ledger import Ledger
+from benchmarks.synthetic import DEFAULT_START, generate_accounts, generate_transactions, populate
+from database.columnar_database import ColumnarDatabase
+from database.database import AbstractDatabase, InMemoryDatabase
+from database.mapped_database import MappedDatabase
+from database.sqlite_database import SqliteDatabase
+from database import vectorized
+from models.transaction import Transaction
+
+# Times the ledger hot paths against each storage backend and writes JSON results that can be
+# compared between commits:
+#   python -m benchmarks.run --transactions 20000 --output results.json
+
+BACKENDS: dict[str, Callable[[str], AbstractDatabase]] = {
+    "memory": lambda directory: InMemoryDatabase(),
+    "columnar": lambda directory: ColumnarDatabase(),
+    "mapped": lambda directory: MappedDatabase(os.path.join(directory, "mapped")),
+    "sqlite": lambda directory: SqliteDatabase(os.path.join(directory, "benchmark.db")),
+}
+
+def timings_summary(timings: list[float]) -> dict:
+    ordered = sorted(timings)
+    return {
+        "calls": len(ordered),
+        "total_s": sum(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p95_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6,
+        "max_us": ordered[-1] * 1e6,
+    }
+
+def time_calls(function: Callable, arguments: list[tuple]) -> dict:
+    timings = []
+    for args in arguments:
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return timings_summary(timings)
+
+def benchmark_backend(make_db: Callable[[str], AbstractDatabase], args: argparse.Namespace, directory: str) -> dict:
+    rng = random.Random(args.seed)
+    accounts = generate_accounts(args.accounts)
+    span = timedelta(days=args.span_days)
+    history = generate_transactions(accounts, args.transactions, args.entries, DEFAULT_START, span, args.seed)
+    db = make_db(directory)
+    populate(db, accounts, history)
+
+    results = {}
+    start = time.perf_counter()
+    # The hot paths are timed without the report cache, so repeated reports are computed every time
+    ledger = Ledger(db, report_cache_rows=0)
+    results["ledger_startup"] = timings_summary([time.perf_counter() - start])
+
+    # New postings go through validation, dated after the generated history
+    new_transactions = [
+        Transaction(id=transaction.id + args.transactions, timestamp=transaction.timestamp + span, entries=transaction.entries)
+        for transaction in generate_transactions(accounts, args.posts, args.entries, DEFAULT_START, span, args.seed + 1)
+    ]
+    results["add_transaction"] = time_calls(ledger.add_transaction, [(transaction,) for transaction in new_transactions])
+
+    account_ids = [account.id for account in accounts]
+    def random_timestamp() -> datetime:
+        return DEFAULT_START + span * rng.random()
+
+    results["get_account_balance"] = time_calls(ledger.get_account_balance, [(rng.choice(account_ids),) for _ in range(args.queries)])
+    results["get_historic_balance"] = time_calls(
+        ledger.get_historic_balance, [(rng.choice(account_ids), random_timestamp()) for _ in range(args.queries)])
+    results["get_trial_balance_report"] = time_calls(ledger.get_trial_balance_report, [(random_timestamp(),) for _ in range(args.reports)])
+    results["get_trial_balance_report_now"] = time_calls(ledger.get_trial_balance_report, [(datetime.max,) for _ in range(args.reports)])
+    window = timedelta(days=30)
+    def transaction_report_page(report_start: datetime) -> None:
+        ledger.get_transaction_report(report_start + window, start=report_start, page_size=args.page_size).table_str()
+    results["get_transaction_report"] = time_calls(transaction_report_page, [(random_timestamp(),) for _ in range(args.reports)])
+    # Dashboards ask for the same few reports over and over, which the report cache serves
+    cached_ledger = Ledger(db)
+    dashboard_timestamps = [random_timestamp() for _ in range(5)]
+    results["get_trial_balance_report_cached"] = time_calls(
+        cached_ledger.get_trial_balance_report, [(dashboard_timestamps[i % len(dashboard_timestamps)],) for i in range(args.reports)])
+    if isinstance(db, SqliteDatabase):
+        db.close()
+    return results
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger hot path benchmarks")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--accounts", type=int, default=100, help="Accounts in the synthetic chart of accounts.")
+    parser.add_argument("--transactions", type=int, default=20_000, help="Transactions loaded before timing.")
+    parser.add_argument("--entries", type=int, default=2, help="Entries per transaction.")
+    parser.add_argument("--span-days", type=int, default=365, help="Time span covered by the transactions.")
+    parser.add_argument("--posts", type=int, default=1_000, help="Transactions posted through Ledger.add_transaction.")
+    parser.add_argument("--queries", type=int, default=1_000, help="Calls of each balance query.")
+    parser.add_argument("--reports", type=int, default=20, help="Calls of each report.")
+    parser.add_argument("--page-size", type=int, default=100, help="Transactions per transaction report page.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": vectorized.numpy.__version__ if vectorized.numpy is not None else None,
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "backends": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.backends:
+            results["backends"][name] = benchmark_backend(BACKENDS[name], args, directory)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import contextlib
+import io
+import time
+
+from app.ledger import Ledger
+from benchmarks.synthetic import generate_accounts, generate_transactions
+from cli.ledger_shell import LedgerShell
+from cli.script_runner import run_script
+from database.database import InMemoryDatabase
+
+# Compares running a command script line by line through the shell against script mode:
+#   python -m benchmarks.script --accounts 100 --transactions 100000
+
+def script_lines(accounts, transactions) -> list[str]:
+    # The generated names contain a space, which the shell would split into two arguments
+    lines = [f"add_account {account.id} account-{account.id} {account.type}" for account in accounts]
+    for transaction in transactions:
+        entries = " ".join(f"{entry.account_id}:{entry.value}" for entry in transaction.entries)
+        lines.append(f"add_transaction {transaction.id} {entries} --timestamp {transaction.timestamp.isoformat()}")
+    lines.append("get_trial_balance_report")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Shell script mode benchmark")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    lines = script_lines(accounts, generate_transactions(accounts, args.transactions))
+
+    shell = LedgerShell(Ledger(InMemoryDatabase()))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for line in lines:
+            shell.onecmd(line)
+    elapsed = time.perf_counter() - start
+    print(f"line by line: {len(lines) / elapsed:,.0f} commands/s ({elapsed:.2f}s)")
+
+    summary = run_script(LedgerShell(Ledger(InMemoryDatabase())), lines)
+    print(f"script mode: {summary.commands_per_second:,.0f} commands/s ({summary.seconds:.2f}s), {summary.added} transactions added")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.ledger import Ledger
+from app.ledger_client import LedgerClient
+from app.ledger_server import LedgerServer
+from app.protocol import transaction_to_json
+from benchmarks.synthetic import generate_accounts, generate_transactions
+from database.database import InMemoryDatabase
+
+# Compares ways of talking to a ledger server over a Unix socket: one request per round trip,
+# pipelined requests, and the batch endpoints.
+#   python -m benchmarks.server --accounts 100 --transactions 20000 --batch-size 1000
+
+def timed(label: str, count: int, function) -> None:
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {count / elapsed:,.0f}/s ({elapsed:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger server benchmark")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    transactions = list(generate_transactions(accounts, args.transactions))
+    thirds = [transactions[part::3] for part in range(3)]
+    account_ids = [account.id for account in accounts]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ledger.sock")
+        ledger = Ledger(InMemoryDatabase())
+        for account in accounts:
+            ledger.add_account(account)
+        server = LedgerServer(ledger, path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with LedgerClient(path) as client:
+                timed("add_transaction, one round trip each", len(thirds[0]),
+                      lambda: [client.add_transaction(transaction) for transaction in thirds[0]])
+                timed("add_transaction, pipelined", len(thirds[1]),
+                      lambda: client.call_many(("add_transaction", {"transaction": transaction_to_json(transaction)}) for transaction in thirds[1]))
+                timed(f"add_transactions, batches of {args.batch_size}", len(thirds[2]),
+                      lambda: [client.add_transactions(batch, atomic=False) for batch in _batches(thirds[2], args.batch_size)])
+                timed("get_account_balance, one round trip each", len(account_ids),
+                      lambda: [client.get_account_balance(account_id) for account_id in account_ids])
+                timed("get_balances, one batch", len(account_ids),
+                      lambda: client.get_balances(account_ids))
+        finally:
+            server.shutdown()
+            thread.join()
+            server.close()
+
+def _batches(items: list, size: int) -> list[list]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+if __name__ == "__main__":
+    main()
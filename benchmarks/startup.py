@@ -0,0 +1,71 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.ledger import Ledger
+from benchmarks.synthetic import generate_accounts, generate_transactions, populate
+from database.database import AbstractDatabase, InMemoryDatabase
+from database.sqlite_database import SqliteDatabase
+from database.journal import JournaledDatabase
+
+# Compares Ledger start up against the previous per-account rescan of every transaction:
+#   python -m benchmarks.startup --accounts 200 --transactions 5000
+
+def rescan_per_account(db: AbstractDatabase) -> dict[int, int]:
+    now = datetime.now()
+    balances = {}
+    for account in db.list_accounts():
+        balance = 0
+        for txn in db.list_transactions():
+            if txn.timestamp > now:
+                continue
+            for entry in txn.entries:
+                if entry.account_id == account.id:
+                    balance += entry.value
+        balances[account.id] = balance
+    return balances
+
+def time_call(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Ledger start up benchmark")
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=5_000)
+    parser.add_argument("--skip-rescan", action="store_true", help="Skip the O(accounts x transactions) baseline.")
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            "memory": InMemoryDatabase(),
+            "sqlite": SqliteDatabase(os.path.join(directory, "ledger.db")),
+        }
+        for name, db in backends.items():
+            populate(db, accounts, generate_transactions(accounts, args.transactions))
+            elapsed, ledger = time_call(Ledger, db)
+            print(f"{name}: Ledger start up with {args.accounts} accounts, {args.transactions} transactions: {elapsed * 1000:.1f} ms")
+            if not args.skip_rescan:
+                rescan_elapsed, balances = time_call(rescan_per_account, db)
+                assert balances == dict(ledger.running_balance_cache)
+                print(f"{name}: per-account rescan baseline: {rescan_elapsed * 1000:.1f} ms")
+        backends["sqlite"].close()
+
+        # Restart of a journaled in-memory database, replaying the whole journal and from a snapshot
+        transactions = list(generate_transactions(accounts, args.transactions))
+        for snapshot in (False, True):
+            journal_directory = os.path.join(directory, f"journal-{snapshot}")
+            db = JournaledDatabase(journal_directory)
+            populate(db, accounts, iter(transactions))
+            db.close(snapshot=snapshot)
+            elapsed, db = time_call(JournaledDatabase, journal_directory)
+            db.close(snapshot=False)
+            source = "snapshot" if snapshot else "journal replay"
+            print(f"journal: restart from {source} with {args.accounts} accounts, {args.transactions} transactions: {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from database.database import AbstractDatabase
+from models.account import Account, AccountType
+from models.transaction import Transaction, TransactionEntry
+
+# Synthetic chart of accounts and journal entries for benchmarks
+
+DEFAULT_START = datetime(2020, 1, 1)
+DEFAULT_SPAN = timedelta(days=365)
+
+def generate_accounts(count: int) -> list[Account]:
+    account_types = (AccountType.DEBIT, AccountType.CREDIT)
+    return [Account(id=i, name=f"Account {i}", type=account_types[i % 2]) for i in range(1, count + 1)]
+
+def generate_transactions(
+        accounts: list[Account],
+        count: int,
+        entries_per_transaction: int = 2,
+        start: datetime = DEFAULT_START,
+        span: timedelta = DEFAULT_SPAN,
+        seed: int = 0) -> Iterator[Transaction]:
+    # Transactions are evenly spread over the span in id order, and balanced by their last entry
+    if entries_per_transaction < 2:
+        raise ValueError("Transactions need at least two entries.")
+    rng = random.Random(seed)
+    step = span / max(count, 1)
+    for i in range(count):
+        chosen = rng.sample(accounts, min(entries_per_transaction, len(accounts)))
+        chosen += rng.choices(accounts, k=entries_per_transaction - len(chosen))
+        entries = []
+        imbalance = 0  # debits - credits
+        for account in chosen[:-1]:
+            value = rng.randint(1, 100_000)
+            entries.append(TransactionEntry(account_id=account.id, value=value))
+            imbalance += value if account.type == AccountType.DEBIT else -value
+        last = chosen[-1]
+        entries.append(TransactionEntry(account_id=last.id, value=-imbalance if last.type == AccountType.DEBIT else imbalance))
+        yield Transaction(id=i + 1, timestamp=start + step * i, entries=tuple(entries))
+
+def populate(db: AbstractDatabase, accounts: list[Account], transactions: Iterator[Transaction]) -> None:
+    # Writes straight to storage, the generated data is balanced by construction
+    for account in accounts:
+        db.add_account(account)
+    for transaction in transactions:
+        db.add_transaction(transaction)
@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+from typing import Iterable
+
+from database.columnar_file import ColumnarWriter
+from database.timestamps import to_epoch_micros
+from models.account import AccountType
+from models.report import TrialBalanceReport
+from models.transaction import Transaction
+
+# Streams transactions and reports to files one row at a time.
+# csv and jsonl exports of transactions use the same layout that import_transactions reads.
+# columnar exports write int64 columns (see database/columnar_file.py), one row per posting
+# for transactions and one row per account for trial balances.
+
+EXPORT_FORMATS = ["csv", "jsonl", "columnar"]
+FORMATS_BY_EXTENSION = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".col": "columnar"}
+
+TRANSACTION_COLUMNS = ["transaction_id", "timestamp_us", "account_id", "value"]
+TRIAL_BALANCE_COLUMNS = ["account_id", "is_credit", "balance"]
+
+def export_format(path: str, file_format: str | None) -> str:
+    if file_format is not None:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS_BY_EXTENSION:
+        raise ValueError(f"Cannot infer the export format of '{path}'. Use one of {', '.join(EXPORT_FORMATS)}.")
+    return FORMATS_BY_EXTENSION[extension]
+
+def export_transactions(transactions: Iterable[Transaction], path: str, file_format: str | None = None) -> int:
+    file_format = export_format(path, file_format)
+    count = 0
+    if file_format == "columnar":
+        with ColumnarWriter(path, TRANSACTION_COLUMNS) as writer:
+            for transaction in transactions:
+                timestamp = to_epoch_micros(transaction.timestamp)
+                for entry in transaction.entries:
+                    writer.append((transaction.id, timestamp, entry.account_id, entry.value))
+                count += 1
+        return count
+    with open(path, "w", newline="") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(["id", "timestamp", "entries"])
+            for transaction in transactions:
+                entries = " ".join(f"{entry.account_id}:{entry.value}" for entry in transaction.entries)
+                writer.writerow([transaction.id, transaction.timestamp.isoformat(), entries])
+                count += 1
+        else:
+            for transaction in transactions:
+                entries = [{"account_id": entry.account_id, "value": entry.value} for entry in transaction.entries]
+                file.write(json.dumps({"id": transaction.id, "timestamp": transaction.timestamp.isoformat(), "entries": entries}) + "\n")
+                count += 1
+    return count
+
+def export_trial_balance(report: TrialBalanceReport, path: str, file_format: str | None = None) -> int:
+    file_format = export_format(path, file_format)
+    entries = [*report.debits, *report.credits]
+    if file_format == "columnar":
+        with ColumnarWriter(path, TRIAL_BALANCE_COLUMNS) as writer:
+            for entry in entries:
+                writer.append((entry.account.id, int(entry.account.type == AccountType.CREDIT), entry.balance))
+        return len(entries)
+    with open(path, "w", newline="") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(["account_id", "account_name", "type", "balance"])
+            writer.writerows(entry.table_row() for entry in entries)
+        else:
+            for entry in entries:
+                file.write(json.dumps({
+                    "account_id": entry.account.id,
+                    "account_name": entry.account.name,
+                    "type": str(entry.account.type),
+                    "balance": entry.balance,
+                    "timestamp": report.timestamp.isoformat(),
+                }) + "\n")
+    return len(entries)
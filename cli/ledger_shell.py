@@ -1,10 +1,12 @@
 import cmd
 import argparse
 from datetime import datetime
+from functools import cached_property
 
 from app.ledger import Ledger
 from models.account import Account, AccountType
 from models.transaction import Transaction, TransactionEntry
+from metrics import registry as metrics
 
 
 class LedgerShell(cmd.Cmd):
@@ -14,42 +16,144 @@ class LedgerShell(cmd.Cmd):
     def __init__(self, ledger: Ledger):
         super().__init__()
         self.ledger = ledger
+        # The error reported by the last command, None when it succeeded. Lets a caller such as
+        # run_script tell failed commands from ones that printed a result.
+        self.last_error: str | None = None
 
-        self.add_account_parser = argparse.ArgumentParser(prog="add_account", description="Add a new account")
-        self.add_account_parser.add_argument("id", type=int, help="A unique numeric ID for the account.")
-        self.add_account_parser.add_argument("name", type=str, help="The name of the account.")
-        self.add_account_parser.add_argument("type", type=AccountType, choices=[AccountType.DEBIT, AccountType.CREDIT], help="The type of the account (debit or credit).")
-        self.add_account_parser.add_argument("description", type=str, nargs="*", default="", help="An optional plain text description of the account.")
-
-        self.get_account_parser = argparse.ArgumentParser(prog="get_account", description="Get account details by ID")
-        self.get_account_parser.add_argument("id", type=int, help="The unique numeric ID of the account to retrieve.")
-
-        self.get_historic_balance_parser = argparse.ArgumentParser(prog="get_historic_balance", description="Get account balance as of a certain timestamp")
-        self.get_historic_balance_parser.add_argument("id", type=int, help="The unique numeric ID of the account.")
-        self.get_historic_balance_parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get balance as of that time. Defaults to now.")
-
-        self.get_account_balance_parser = argparse.ArgumentParser(prog="get_account_balance", description="Get current account balance")
-        self.get_account_balance_parser.add_argument("id", type=int, help="The unique numeric ID of the account.")
-
-        self.get_trial_balance_report_parser = argparse.ArgumentParser(prog="get_trial_balance_report", description="Get trial balance report as of a certain timestamp")
-        self.get_trial_balance_report_parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get report as of that time. Defaults to now.")
-
-        self.get_transaction_report_parser = argparse.ArgumentParser(prog="get_transaction_report", description="Get transaction report as of a certain timestamp")
-        self.get_transaction_report_parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get report as of that time. Defaults to now.")
+    def onecmd(self, line: str) -> bool:
+        self.last_error = None
+        try:
+            return super().onecmd(line)
+        except ValueError as e:
+            # Rejections by the ledger that a command doesn't handle itself
+            self.error(f"Invalid Input: {e}")
+            return False
 
-        self.add_transaction_parser = argparse.ArgumentParser(prog="add_transaction", description="Add a new transaction")
-        self.add_transaction_parser.add_argument("id", type=int, help="A unique numeric ID for the transaction.")
-        self.add_transaction_parser.add_argument("entries", type=str, nargs='+', help="Entries in the format <account_id>:<value> ...")
-        self.add_transaction_parser.add_argument("--timestamp", type=str, default=None, help="Optional transaction timestamp (ISO format)")
+    def error(self, message: str) -> None:
+        print(message)
+        self.last_error = message
 
-        self.get_transaction_parser = argparse.ArgumentParser(prog="get_transaction", description="Get transaction details by ID")
-        self.get_transaction_parser.add_argument("id", type=int, help="The unique numeric ID of the transaction to retrieve.")
+    def _parse_args(self, parser: argparse.ArgumentParser, line: str) -> argparse.Namespace | None:
+        # None when the arguments are invalid or help was asked for, argparse has printed why
+        try:
+            return parser.parse_args(line.split())
+        except SystemExit as e:
+            if e.code:
+                self.last_error = f"Invalid arguments: {parser.prog} {line}"
+            return None
+
+    # Parsers are built on first use, so starting the shell or running one command doesn't construct them all
+
+    @cached_property
+    def add_account_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="add_account", description="Add a new account")
+        parser.add_argument("id", type=int, help="A unique numeric ID for the account.")
+        parser.add_argument("name", type=str, help="The name of the account.")
+        parser.add_argument("type", type=AccountType, choices=[AccountType.DEBIT, AccountType.CREDIT], help="The type of the account (debit or credit).")
+        parser.add_argument("description", type=str, nargs="*", default="", help="An optional plain text description of the account.")
+        return parser
+
+    @cached_property
+    def get_account_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_account", description="Get account details by ID")
+        parser.add_argument("id", type=int, help="The unique numeric ID of the account to retrieve.")
+        return parser
+
+    @cached_property
+    def get_historic_balance_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_historic_balance", description="Get account balance as of a certain timestamp")
+        parser.add_argument("id", type=int, help="The unique numeric ID of the account.")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get balance as of that time. Defaults to now.")
+        return parser
+
+    @cached_property
+    def get_account_balance_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_account_balance", description="Get current account balance")
+        parser.add_argument("id", type=int, help="The unique numeric ID of the account.")
+        return parser
+
+    @cached_property
+    def get_trial_balance_report_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_trial_balance_report", description="Get trial balance report as of a certain timestamp")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get report as of that time. Defaults to now.")
+        return parser
+
+    @cached_property
+    def get_transaction_report_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_transaction_report", description="Get transaction report as of a certain timestamp")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get report as of that time. Defaults to now.")
+        parser.add_argument("--start", type=str, default=None, help="Optional timestamp (ISO format) of the earliest transaction to include.")
+        parser.add_argument("--accounts", type=str, default=None, help="Optional comma separated account IDs to report on, e.g. 1,3,4. Defaults to all accounts.")
+        parser.add_argument("--page-size", type=int, default=None, help="Optional maximum number of transactions to show.")
+        parser.add_argument("--after", type=str, default=None, help="Continue a paged report after the cursor printed at the end of the previous page.")
+        return parser
+
+    @cached_property
+    def t_account_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="t_account", description="Show an account's postings as a T-account with running balances")
+        parser.add_argument("account_id", type=int, help="The ID of the account.")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) of the latest posting to include. Defaults to now.")
+        parser.add_argument("--start", type=str, default=None, help="Optional timestamp (ISO format) of the earliest posting to include. Earlier postings are summed into the opening balance.")
+        return parser
+
+    @cached_property
+    def add_transaction_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="add_transaction", description="Add a new transaction")
+        parser.add_argument("id", type=int, help="A unique numeric ID for the transaction.")
+        parser.add_argument("entries", type=str, nargs='+', help="Entries in the format <account_id>:<value> ...")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional transaction timestamp (ISO format)")
+        return parser
+
+    @cached_property
+    def get_transaction_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="get_transaction", description="Get transaction details by ID")
+        parser.add_argument("id", type=int, help="The unique numeric ID of the transaction to retrieve.")
+        return parser
+
+    @cached_property
+    def import_transactions_parser(self) -> argparse.ArgumentParser:
+        from cli.transaction_import import DEFAULT_BATCH_SIZE
+        parser = argparse.ArgumentParser(prog="import_transactions", description="Import transactions from a CSV or JSONL file")
+        parser.add_argument("path", type=str, help="Path of the file to import. CSV files need an id,timestamp,entries header.")
+        parser.add_argument("--format", type=str, choices=["csv", "jsonl"], default=None, help="File format. Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Number of transactions validated and inserted together.")
+        return parser
+
+    @cached_property
+    def export_transactions_parser(self) -> argparse.ArgumentParser:
+        from cli.export import EXPORT_FORMATS
+        parser = argparse.ArgumentParser(prog="export_transactions", description="Export transactions to a CSV, JSONL or columnar file")
+        parser.add_argument("path", type=str, help="Path of the file to write.")
+        parser.add_argument("--format", type=str, choices=EXPORT_FORMATS, default=None, help="File format. Defaults to the file extension (.csv, .jsonl, .col).")
+        parser.add_argument("--start", type=str, default=None, help="Optional timestamp (ISO format) of the earliest transaction to export.")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) of the latest transaction to export. Defaults to all transactions.")
+        return parser
+
+    @cached_property
+    def export_trial_balance_parser(self) -> argparse.ArgumentParser:
+        from cli.export import EXPORT_FORMATS
+        parser = argparse.ArgumentParser(prog="export_trial_balance", description="Export a trial balance to a CSV, JSONL or columnar file")
+        parser.add_argument("path", type=str, help="Path of the file to write.")
+        parser.add_argument("--format", type=str, choices=EXPORT_FORMATS, default=None, help="File format. Defaults to the file extension (.csv, .jsonl, .col).")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) to get the trial balance as of that time. Defaults to now.")
+        return parser
+
+    @cached_property
+    def close_period_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="close_period", description="Close the accounting period ending at a timestamp")
+        parser.add_argument("--timestamp", type=str, default=None, help="Optional timestamp (ISO format) the period ends at. Defaults to now.")
+        return parser
+
+    @cached_property
+    def stats_parser(self) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(prog="stats", description="Show operation counters and latencies collected since startup")
+        parser.add_argument("--format", type=str, choices=["text", "prometheus"], default="text", help="Output format. Defaults to one line per operation.")
+        return parser
 
     def do_add_transaction(self, line: str):
         """Add a new transaction: add_transaction <id> <account_id:value> [<account_id:value> ...]"""
-        try:
-            parsed_args = self.add_transaction_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.add_transaction_parser, line)
+        if parsed_args is None:
             return
         entries = []
         for entry_str in parsed_args.entries:
@@ -59,30 +163,29 @@ class LedgerShell(cmd.Cmd):
                 value = int(value_str)
                 entries.append(TransactionEntry(account_id=account_id, value=value))
             except ValueError:
-                print(f"Invalid entry format: '{entry_str}'. Expected <account_id>:<value>.")
+                self.error(f"Invalid entry format: '{entry_str}'. Expected <account_id>:<value>.")
                 return
         txn_timestamp = datetime.now()
         if parsed_args.timestamp:
             try:
                 txn_timestamp = datetime.fromisoformat(parsed_args.timestamp)
             except ValueError as e:
-                print(f"Invalid timestamp: {e}")
+                self.error(f"Invalid timestamp: {e}")
                 return
         txn = Transaction(id=parsed_args.id, timestamp=txn_timestamp, entries=tuple(entries))
         try:
             self.ledger.add_transaction(txn)
         except ValueError as e:
-            print(f"Invalid Input: {e}")
+            self.error(f"Invalid Input: {e}")
 
     def do_get_transaction(self, line: str):
         """Get transaction details by ID: get_transaction <id>"""
-        try:
-            parsed_args = self.get_transaction_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_transaction_parser, line)
+        if parsed_args is None:
             return
         txn = self.ledger.get_transaction(parsed_args.id)
         if txn is None:
-            print(f"Transaction with id {parsed_args.id} does not exist.")
+            self.error(f"Transaction with id {parsed_args.id} does not exist.")
         else:
             print(txn)
 
@@ -92,11 +195,68 @@ class LedgerShell(cmd.Cmd):
         for txn in txns:
             print(txn)
 
+    def do_import_transactions(self, line: str):
+        """Import transactions from a CSV or JSONL file: import_transactions <path> [--format csv|jsonl] [--batch-size <n>]"""
+        parsed_args = self._parse_args(self.import_transactions_parser, line)
+        if parsed_args is None:
+            return
+        from cli.transaction_import import import_transactions
+        try:
+            summary = import_transactions(
+                self.ledger,
+                parsed_args.path,
+                file_format=parsed_args.format,
+                batch_size=parsed_args.batch_size,
+                on_reject=lambda line_number, reason: print(f"Line {line_number} rejected: {reason}"))
+        except (OSError, ValueError) as e:
+            self.error(f"Import failed: {e}")
+            return
+        print(summary)
+
+    def do_export_transactions(self, line: str):
+        """Export transactions to a file: export_transactions <path> [--format csv|jsonl|columnar] [--start <ISO timestamp>] [--timestamp <ISO timestamp>]"""
+        parsed_args = self._parse_args(self.export_transactions_parser, line)
+        if parsed_args is None:
+            return
+        try:
+            start = datetime.fromisoformat(parsed_args.start) if parsed_args.start else None
+            end = datetime.fromisoformat(parsed_args.timestamp) if parsed_args.timestamp else None
+        except ValueError as e:
+            self.error(f"Invalid timestamp: {e}")
+            return
+        from cli.export import export_transactions
+        try:
+            count = export_transactions(self.ledger.iter_transactions(start, end), parsed_args.path, parsed_args.format)
+        except (OSError, ValueError) as e:
+            self.error(f"Export failed: {e}")
+            return
+        print(f"Exported {count} transactions to {parsed_args.path}")
+
+    def do_export_trial_balance(self, line: str):
+        """Export a trial balance to a file: export_trial_balance <path> [--format csv|jsonl|columnar] [--timestamp <ISO timestamp>]"""
+        parsed_args = self._parse_args(self.export_trial_balance_parser, line)
+        if parsed_args is None:
+            return
+
+        report_timestamp = datetime.now()
+        if parsed_args.timestamp:
+            try:
+                report_timestamp = datetime.fromisoformat(parsed_args.timestamp)
+            except ValueError as e:
+                self.error(f"Invalid timestamp: {e}")
+                return
+        from cli.export import export_trial_balance
+        try:
+            count = export_trial_balance(self.ledger.get_trial_balance_report(report_timestamp), parsed_args.path, parsed_args.format)
+        except (OSError, ValueError) as e:
+            self.error(f"Export failed: {e}")
+            return
+        print(f"Exported {count} account balances to {parsed_args.path}")
+
     def do_get_transaction_report(self, line: str):
         """Get transaction report as of a certain timestamp (defaults to now): get_transaction_report [--timestamp <ISO timestamp>]"""
-        try:
-            parsed_args = self.get_transaction_report_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_transaction_report_parser, line)
+        if parsed_args is None:
             return
         
         report_timestamp = datetime.now()
@@ -104,16 +264,40 @@ class LedgerShell(cmd.Cmd):
             try:
                 report_timestamp = datetime.fromisoformat(parsed_args.timestamp)
             except ValueError as e:
-                print(f"Invalid timestamp: {e}")
+                self.error(f"Invalid timestamp: {e}")
+                return
+        options = {}
+        try:
+            if parsed_args.start:
+                options["start"] = datetime.fromisoformat(parsed_args.start)
+            if parsed_args.after:
+                cursor_timestamp, cursor_id = parsed_args.after.rsplit(",", 1)
+                options["after"] = (datetime.fromisoformat(cursor_timestamp), int(cursor_id))
+        except ValueError as e:
+            self.error(f"Invalid timestamp or cursor: {e}")
+            return
+        if parsed_args.accounts:
+            try:
+                options["account_ids"] = [int(account_id) for account_id in parsed_args.accounts.split(",")]
+            except ValueError:
+                self.error(f"Invalid account IDs: '{parsed_args.accounts}'. Expected comma separated numeric IDs.")
                 return
-        report = self.ledger.get_transaction_report(report_timestamp)
+        if parsed_args.page_size is not None:
+            options["page_size"] = parsed_args.page_size
+        try:
+            report = self.ledger.get_transaction_report(report_timestamp, **options)
+        except ValueError as e:
+            self.error(f"Invalid Input: {e}")
+            return
         print(report.table_str())
+        if report.next_cursor is not None:
+            cursor_timestamp, cursor_id = report.next_cursor
+            print(f"More transactions follow, continue with: --after {cursor_timestamp.isoformat()},{cursor_id}")
 
     def do_add_account(self, line: str):
         """Add a new account to the ledger: add_account <id> <name> <type> [<description>]"""
-        try:
-            parsed_args = self.add_account_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.add_account_parser, line)
+        if parsed_args is None:
             return
 
         new_account = Account(
@@ -124,26 +308,24 @@ class LedgerShell(cmd.Cmd):
         try:
             self.ledger.add_account(new_account)
         except ValueError as e:
-            print(f"Invalid Input: {e}")
+            self.error(f"Invalid Input: {e}")
     
     def do_get_account(self, line: str):
         """Get account details by ID: get_account <id>"""
-        try:
-            parsed_args = self.get_account_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_account_parser, line)
+        if parsed_args is None:
             return
 
         account = self.ledger.get_account(parsed_args.id)
         if account is None:
-            print(f"Account with id {parsed_args.id} does not exist.")
+            self.error(f"Account with id {parsed_args.id} does not exist.")
         else:
             print(account)
 
     def do_get_historic_balance(self, line: str):
         """Get account balance as of a certain timestamp (defaults to now): get_account_balance <id> [--timestamp <ISO timestamp>]"""
-        try:
-            parsed_args = self.get_historic_balance_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_historic_balance_parser, line)
+        if parsed_args is None:
             return
         
         txn_timestamp = datetime.now()
@@ -151,26 +333,47 @@ class LedgerShell(cmd.Cmd):
             try:
                 txn_timestamp = datetime.fromisoformat(parsed_args.timestamp)
             except ValueError as e:
-                print(f"Invalid timestamp: {e}")
+                self.error(f"Invalid timestamp: {e}")
                 return
         account, balance = self.ledger.get_historic_balance(parsed_args.id, txn_timestamp)
         print(f"ID: {account.id} Account: {account.name} type: {account.type} balance as of {txn_timestamp.isoformat()}: {balance}")
 
     def do_get_account_balance(self, line: str):
         """Get current account balance: get_account_balance <id>"""
-        try:
-            parsed_args = self.get_account_balance_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_account_balance_parser, line)
+        if parsed_args is None:
             return
         
         account, balance = self.ledger.get_account_balance(parsed_args.id)
         print(f"ID: {account.id} Account: {account.name} type: {account.type} current balance: {balance}")
 
+    def do_t_account(self, line: str):
+        """Show an account's postings with running balances: t_account <account_id> [--start <ISO timestamp>] [--timestamp <ISO timestamp>]"""
+        parsed_args = self._parse_args(self.t_account_parser, line)
+        if parsed_args is None:
+            return
+
+        report_timestamp = datetime.now()
+        start = None
+        try:
+            if parsed_args.timestamp:
+                report_timestamp = datetime.fromisoformat(parsed_args.timestamp)
+            if parsed_args.start:
+                start = datetime.fromisoformat(parsed_args.start)
+        except ValueError as e:
+            self.error(f"Invalid timestamp: {e}")
+            return
+        try:
+            report = self.ledger.get_t_account_report(parsed_args.account_id, report_timestamp, start=start)
+        except ValueError as e:
+            self.error(f"Invalid Input: {e}")
+            return
+        print(report.table_str())
+
     def do_get_trial_balance_report(self, line: str):
         """Get trial balance report as of a certain timestamp (defaults to now): get_trial_balance_report [--timestamp <ISO timestamp>]"""
-        try:
-            parsed_args = self.get_trial_balance_report_parser.parse_args(line.split())
-        except SystemExit:
+        parsed_args = self._parse_args(self.get_trial_balance_report_parser, line)
+        if parsed_args is None:
             return
         
         report_timestamp = datetime.now()
@@ -178,11 +381,47 @@ class LedgerShell(cmd.Cmd):
             try:
                 report_timestamp = datetime.fromisoformat(parsed_args.timestamp)
             except ValueError as e:
-                print(f"Invalid timestamp: {e}")
+                self.error(f"Invalid timestamp: {e}")
                 return
         report = self.ledger.get_trial_balance_report(report_timestamp)
         print(report.table_str())
 
+    def do_close_period(self, line: str):
+        """Close the accounting period ending at a timestamp (defaults to now): close_period [--timestamp <ISO timestamp>]"""
+        parsed_args = self._parse_args(self.close_period_parser, line)
+        if parsed_args is None:
+            return
+
+        timestamp = datetime.now()
+        if parsed_args.timestamp:
+            try:
+                timestamp = datetime.fromisoformat(parsed_args.timestamp)
+            except ValueError as e:
+                self.error(f"Invalid timestamp: {e}")
+                return
+        try:
+            period_close = self.ledger.close_period(timestamp)
+        except ValueError as e:
+            self.error(f"Invalid Input: {e}")
+            return
+        print(f"Closed the period up to {period_close.timestamp.isoformat()} with {len(period_close.balances)} account balances.")
+
+    def do_stats(self, line: str):
+        """Show operation counters and latencies: stats [--format text|prometheus]"""
+        parsed_args = self._parse_args(self.stats_parser, line)
+        if parsed_args is None:
+            return
+
+        registry = metrics.get_registry()
+        if registry is None:
+            print("Metrics are disabled. Start the shell with --metrics to collect them.")
+            return
+        if parsed_args.format == "prometheus":
+            print(registry.prometheus_text(), end="")
+        else:
+            print("\n".join(registry.text_lines()) or "No operations recorded yet.")
+        registry.flush()
+
     def do_exit(self, _: str):
         """Exit the Ledger shell."""
         print("Exiting...")
@@ -203,6 +442,21 @@ class LedgerShell(cmd.Cmd):
     def help_get_transaction(self):
         print(self.get_transaction_parser.format_help())
 
+    def help_import_transactions(self):
+        print(self.import_transactions_parser.format_help())
+
+    def help_export_transactions(self):
+        print(self.export_transactions_parser.format_help())
+
+    def help_export_trial_balance(self):
+        print(self.export_trial_balance_parser.format_help())
+
+    def help_close_period(self):
+        print(self.close_period_parser.format_help())
+
+    def help_stats(self):
+        print(self.stats_parser.format_help())
+
     def help_list_transactions(self):
         print("List all transactions.")
 
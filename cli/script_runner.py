@@ -0,0 +1,130 @@
+import contextlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable
+
+from cli.ledger_shell import LedgerShell
+from cli.transaction_import import DEFAULT_BATCH_SIZE, parse_entries
+from models.transaction import Transaction
+
+# Runs a file of shell commands without the interactive loop, e.g. a script piped from stdin.
+#
+# add_transaction lines are parsed by a small hand-written parser instead of argparse, and runs of
+# consecutive add_transaction lines are written with one ledger.add_transactions call per batch.
+# Any other command flushes the pending batch first, so it sees every transaction above it, and is
+# dispatched through the shell as typed. Blank lines and lines starting with # are skipped.
+
+@dataclass
+class ScriptSummary:
+    lines: int = 0
+    commands: int = 0
+    added: int = 0
+    rejected: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def commands_per_second(self) -> float:
+        return self.commands / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"Ran {self.commands} commands in {self.seconds:.2f}s ({self.commands_per_second:.0f} commands/s): "
+                f"{self.added} transactions added, {self.rejected} rejected, {self.failed} failed commands.")
+
+def parse_add_transaction(arguments: str) -> Transaction:
+    # Accepts what the add_transaction command accepts: <id> <account_id:value> ... [--timestamp <ISO timestamp>]
+    transaction_id = None
+    timestamp = None
+    entry_tokens = []
+    tokens = iter(arguments.split())
+    for token in tokens:
+        if token == "--timestamp" or token.startswith("--timestamp="):
+            value = token.partition("=")[2] or next(tokens, None)
+            if value is None:
+                raise ValueError("Missing value for --timestamp.")
+            try:
+                timestamp = datetime.fromisoformat(value)
+            except ValueError as e:
+                raise ValueError(f"Invalid timestamp: {e}")
+        elif token.startswith("--"):
+            raise ValueError(f"Unrecognized argument: '{token}'.")
+        elif transaction_id is None:
+            try:
+                transaction_id = int(token)
+            except ValueError:
+                raise ValueError(f"Invalid transaction id: '{token}'.")
+        else:
+            entry_tokens.append(token)
+    if transaction_id is None or not entry_tokens:
+        raise ValueError("Expected add_transaction <id> <account_id:value> [<account_id:value> ...].")
+    return Transaction(id=transaction_id, timestamp=timestamp or datetime.now(), entries=parse_entries(" ".join(entry_tokens)))
+
+def run_script(
+        shell: LedgerShell,
+        lines: Iterable[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        echo: bool = False,
+        on_error: Callable[[int, str], None] | None = None) -> ScriptSummary:
+    # Output of the dispatched commands is discarded unless echo is set. on_error is called with the
+    # line number and reason for every rejected transaction and every command that failed: unknown,
+    # reporting an error through shell.last_error or raising.
+    summary = ScriptSummary()
+    start = time.perf_counter()
+    pending: list[tuple[int, Transaction]] = []
+
+    def fail(line_number: int, reason: str) -> None:
+        summary.failed += 1
+        if on_error is not None:
+            on_error(line_number, reason)
+
+    def reject(line_number: int, reason: str) -> None:
+        summary.rejected += 1
+        if on_error is not None:
+            on_error(line_number, reason)
+
+    def flush() -> None:
+        if not pending:
+            return
+        line_numbers = {id(transaction): line_number for line_number, transaction in pending}
+        result = shell.ledger.add_transactions([transaction for _, transaction in pending], atomic=False)
+        summary.added += len(result.added)
+        for transaction, reason in result.rejected:
+            reject(line_numbers[id(transaction)], reason)
+        pending.clear()
+
+    with open(os.devnull, "w") as devnull:
+        for line_number, line in enumerate(lines, start=1):
+            summary.lines += 1
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            summary.commands += 1
+            command, _, arguments = line.partition(" ")
+            if command == "add_transaction":
+                try:
+                    pending.append((line_number, parse_add_transaction(arguments)))
+                except ValueError as e:
+                    reject(line_number, str(e))
+                if len(pending) >= batch_size:
+                    flush()
+                continue
+            flush()
+            if not hasattr(shell, f"do_{command}"):
+                fail(line_number, f"Unknown command '{command}'.")
+                continue
+            try:
+                with contextlib.nullcontext() if echo else contextlib.redirect_stdout(devnull):
+                    stop = shell.onecmd(line)
+            except Exception as e:
+                fail(line_number, f"{type(e).__name__}: {e}")
+                continue
+            if shell.last_error is not None:
+                fail(line_number, shell.last_error)
+            if stop:
+                break
+        flush()
+
+    summary.seconds = time.perf_counter() - start
+    return summary
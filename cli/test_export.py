@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from app.ledger import Ledger
+from cli.export import export_transactions, export_trial_balance
+from cli.transaction_import import import_transactions
+from database.columnar_file import read_columnar
+from database.database import InMemoryDatabase
+from database.timestamps import to_epoch_micros
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(InMemoryDatabase())
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.txn1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        self.txn2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=-40), TransactionEntry(account_id=2, value=-40)))
+        self.ledger.add_transaction(self.txn2)
+        self.ledger.add_transaction(self.txn1)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def test_csv_and_jsonl_round_trip_through_import(self):
+        for name in ("transactions.csv", "transactions.jsonl"):
+            self.assertEqual(export_transactions(self.ledger.iter_transactions(), self.path(name)), 2)
+            ledger = Ledger(InMemoryDatabase())
+            ledger.add_account(Account(id=1, name="Cash", type="debit"))
+            ledger.add_account(Account(id=2, name="Equity", type="credit"))
+            summary = import_transactions(ledger, self.path(name))
+            self.assertEqual(summary.added, 2)
+            self.assertEqual(ledger.list_transactions(), [self.txn1, self.txn2])
+
+    def test_columnar_transactions(self):
+        count = export_transactions(self.ledger.iter_transactions(end=datetime(2024, 1, 31)), self.path("transactions.col"))
+        self.assertEqual(count, 1)
+        columns = read_columnar(self.path("transactions.col"))
+        self.assertEqual(columns["transaction_id"].tolist(), [1, 1])
+        self.assertEqual(columns["timestamp_us"].tolist(), [to_epoch_micros(datetime(2024, 1, 1))] * 2)
+        self.assertEqual(columns["account_id"].tolist(), [1, 2])
+        self.assertEqual(columns["value"].tolist(), [100, 100])
+
+    def test_trial_balance_formats(self):
+        report = self.ledger.get_trial_balance_report(datetime(2024, 12, 31))
+        export_trial_balance(report, self.path("trial_balance.csv"))
+        with open(self.path("trial_balance.csv")) as file:
+            self.assertEqual(file.read().splitlines(), ["account_id,account_name,type,balance", "1,Cash,debit,60", "2,Equity,credit,60"])
+        export_trial_balance(report, self.path("trial_balance.col"))
+        columns = read_columnar(self.path("trial_balance.col"))
+        self.assertEqual(columns["account_id"].tolist(), [1, 2])
+        self.assertEqual(columns["is_credit"].tolist(), [0, 1])
+        self.assertEqual(columns["balance"].tolist(), [60, 60])
+
+    def test_unknown_extension(self):
+        with self.assertRaises(ValueError):
+            export_transactions(self.ledger.iter_transactions(), self.path("transactions.txt"))
+
+if __name__ == "__main__":
+    unittest.main()
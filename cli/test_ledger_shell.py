@@ -1,10 +1,16 @@
+import os
+import subprocess
+import sys
 from unittest import TestCase, mock
 from io import StringIO
 
 from parameterized import parameterized
 from cli.ledger_shell import LedgerShell
+from metrics import registry as metrics
+from metrics.registry import MetricsRegistry
 from models.account import Account, AccountType
-from models.report import TrialBalanceReport, TransactionReport
+from models.period_close import PeriodClose
+from models.report import TAccountReport, TrialBalanceReport, TransactionReport
 from models.transaction import Transaction, TransactionEntry
 from datetime import datetime
 
@@ -110,4 +116,79 @@ class TestLedgerShell(TestCase):
         self.mock_ledger.get_transaction_report.return_value = empty_report
         with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
             self.shell.do_get_transaction_report("--timestamp 2025-09-28T12:00:00")
-            self.mock_ledger.get_transaction_report.assert_called_once_with(datetime.fromisoformat("2025-09-28T12:00:00"))
\ No newline at end of file
+            self.mock_ledger.get_transaction_report.assert_called_once_with(datetime.fromisoformat("2025-09-28T12:00:00"))
+
+    def test_t_account(self):
+        report = TAccountReport(timestamp=datetime(2025, 9, 28, 12), account=Account(id=1, name="Cash", type="debit"), postings=[], opening_balance=40, start=datetime(2025, 1, 1))
+        self.mock_ledger.get_t_account_report.return_value = report
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_t_account("1 --start 2025-01-01 --timestamp 2025-09-28T12:00:00")
+            self.assertIn("T-Account Cash (debit) from 2025-01-01T00:00:00", mock_stdout.getvalue())
+        self.mock_ledger.get_t_account_report.assert_called_once_with(1, datetime(2025, 9, 28, 12), start=datetime(2025, 1, 1))
+
+    def test_import_transactions_missing_file(self):
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_import_transactions("does-not-exist.csv")
+            self.assertIn("Import failed", mock_stdout.getvalue())
+        self.mock_ledger.add_transactions.assert_not_called()
+
+    def test_get_transaction_report_paged(self):
+        report = TransactionReport(timestamp=datetime.now(), accounts=[], transactions=[], next_cursor=(datetime(2025, 1, 1), 7))
+        self.mock_ledger.get_transaction_report.return_value = report
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_get_transaction_report("--timestamp 2025-09-28T12:00:00 --accounts 1,2 --page-size 10 --after 2024-12-01T00:00:00,3")
+            self.assertIn("--after 2025-01-01T00:00:00,7", mock_stdout.getvalue())
+        self.mock_ledger.get_transaction_report.assert_called_once_with(
+            datetime.fromisoformat("2025-09-28T12:00:00"), account_ids=[1, 2], page_size=10, after=(datetime(2024, 12, 1), 3))
+
+    def test_close_period(self):
+        self.mock_ledger.close_period.return_value = PeriodClose(timestamp=datetime(2024, 1, 31), balances={1: 10, 2: 10})
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_close_period("--timestamp 2024-01-31T00:00:00")
+            self.assertIn("Closed the period up to 2024-01-31T00:00:00 with 2 account balances.", mock_stdout.getvalue())
+        self.mock_ledger.close_period.assert_called_once_with(datetime(2024, 1, 31))
+
+    def test_close_period_already_closed(self):
+        self.mock_ledger.close_period.side_effect = ValueError("Periods up to 2024-01-31T00:00:00 are already closed.")
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_close_period("--timestamp 2024-01-01T00:00:00")
+            self.assertIn("Invalid Input: Periods up to", mock_stdout.getvalue())
+
+    def test_parsers_built_on_first_use(self):
+        self.assertFalse([name for name in vars(self.shell) if name.endswith("_parser")])
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            self.shell.do_get_account("1")
+            self.shell.do_get_account("2")
+        self.assertEqual([name for name in vars(self.shell) if name.endswith("_parser")], ["get_account_parser"])
+
+    def test_start_up_defers_optional_imports(self):
+        code = ("import sys; from cli.ledger_shell import LedgerShell; LedgerShell(None); "
+                "print(sorted(set(sys.modules) & {'prettytable', 'sqlite3', 'logging', 'csv', 'json', 'tempfile'}))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_cli_defers_storage_imports(self):
+        # --script exits through sys.exit, so the loaded modules are reported at exit
+        code = ("import atexit, io, runpy, sys; sys.argv = ['__main__.py', '--script', '-']; sys.stdin = io.StringIO('exit'); "
+                "atexit.register(lambda: print(sorted(set(sys.modules) & {'database.cached_database', 'database.sqlite_database', 'sqlite3'}))); "
+                "runpy.run_path('__main__.py', run_name='__main__')")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "[]")
+
+    def test_stats_disabled(self):
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_stats("")
+            self.assertIn("Metrics are disabled", mock_stdout.getvalue())
+
+    def test_stats(self):
+        registry = metrics.enable(MetricsRegistry())
+        self.addCleanup(metrics.disable)
+        registry.observe("ledger.get_trial_balance_report", 2e-4)
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_stats("")
+            self.assertIn("ledger.get_trial_balance_report: calls=1", mock_stdout.getvalue())
+        with mock.patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            self.shell.do_stats("--format prometheus")
+            self.assertIn('ledger_operation_seconds_count{operation="ledger.get_trial_balance_report"} 1', mock_stdout.getvalue())
@@ -0,0 +1,90 @@
+import contextlib
+import io
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from app.ledger import Ledger
+from cli.ledger_shell import LedgerShell
+from cli.script_runner import parse_add_transaction, run_script
+from database.database import InMemoryDatabase
+from models.transaction import Transaction, TransactionEntry
+
+class TestScriptRunner(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(InMemoryDatabase())
+        self.shell = LedgerShell(self.ledger)
+
+    def test_parse_add_transaction(self):
+        expected = Transaction(id=7, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=-100)))
+        self.assertEqual(parse_add_transaction("7 1:100 2:-100 --timestamp 2024-01-01"), expected)
+        self.assertEqual(parse_add_transaction("7 --timestamp=2024-01-01 1:100 2:-100"), expected)
+        for arguments in ("", "7", "x 1:1", "7 1-1", "7 1:1 --timestamp", "7 1:1 --timestamp never", "7 1:1 --verbose"):
+            with self.assertRaises(ValueError):
+                parse_add_transaction(arguments)
+
+    def test_run_script(self):
+        errors = []
+        lines = [
+            "# accounts",
+            "add_account 1 Cash debit",
+            "add_account 2 Equity credit",
+            "",
+            "add_transaction 1 1:100 2:100 --timestamp 2024-01-01",
+            "add_transaction 2 1:5 2:4",
+            "add_transaction 1 1:1 2:1",
+            "add_transaction 3 1:1",
+            "unknown_command 1",
+            "add_transaction 4 1:-50 2:-50 --timestamp 2024-01-02",
+            "exit",
+            "add_transaction 5 1:1 2:1",
+        ]
+        with mock.patch.object(self.ledger, "add_transactions", wraps=self.ledger.add_transactions) as add_transactions:
+            summary = run_script(self.shell, lines, batch_size=2, on_error=lambda line_number, reason: errors.append(line_number))
+        self.assertEqual((summary.lines, summary.commands, summary.added, summary.rejected, summary.failed), (11, 9, 2, 3, 1))
+        self.assertEqual(errors, [6, 7, 8, 9])
+        # Consecutive add_transaction lines are written in batches, a batch is flushed before any other command
+        self.assertEqual([len(call.args[0]) for call in add_transactions.call_args_list], [2, 2, 1])
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 50)
+        self.assertIsNone(self.ledger.get_transaction(5))
+
+    def test_failed_commands_are_counted(self):
+        errors = []
+        lines = [
+            "add_account 1 Cash debit",
+            "add_account 2 Equity credit",
+            "add_account 1 Cash debit",
+            "add_account x Cash debit",
+            "add_transaction 1 1:5 2:5 --timestamp 2024-01-01",
+            "get_historic_balance 9",
+            "get_account 1",
+            "get_account_balance 1",
+        ]
+        with contextlib.redirect_stderr(io.StringIO()):
+            summary = run_script(self.shell, lines, on_error=lambda line_number, reason: errors.append((line_number, reason)))
+        self.assertEqual((summary.commands, summary.added, summary.failed), (8, 1, 3))
+        self.assertEqual([line_number for line_number, _ in errors], [3, 4, 6])
+        self.assertIn("already exists", errors[0][1])
+        self.assertIn("Account with ID 9 does not exist", errors[2][1])
+        # The batch pending before the failing command was still written
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 5)
+
+    def test_exceptions_fail_the_command_not_the_run(self):
+        errors = []
+        with mock.patch.object(self.ledger, "get_trial_balance_report", side_effect=OSError("disk gone")):
+            summary = run_script(self.shell, ["get_trial_balance_report", "add_account 1 Cash debit"], on_error=lambda line_number, reason: errors.append(reason))
+        self.assertEqual(summary.failed, 1)
+        self.assertEqual(errors, ["OSError: disk gone"])
+        self.assertIsNotNone(self.ledger.get_account(1))
+
+    def test_output_only_when_echoed(self):
+        lines = ["add_account 1 Cash debit", "get_account 1"]
+        with mock.patch("sys.stdout") as stdout:
+            run_script(self.shell, lines)
+            self.assertFalse(stdout.write.called)
+        with mock.patch("builtins.print") as print_mock:
+            run_script(LedgerShell(Ledger(InMemoryDatabase())), lines, echo=True)
+            self.assertTrue(print_mock.called)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from app.ledger import Ledger
+from cli.transaction_import import import_transactions, parse_transaction, batched
+from database.database import InMemoryDatabase
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+
+class TestTransactionImport(unittest.TestCase):
+    def setUp(self):
+        self.ledger = Ledger(InMemoryDatabase())
+        self.ledger.add_account(Account(id=1, name="Cash", type="debit"))
+        self.ledger.add_account(Account(id=2, name="Equity", type="credit"))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_import_csv(self):
+        path = self.write_file("transactions.csv", "id,timestamp,entries\n1,2024-01-01T00:00:00,1:100 2:100\n2,2024-02-01,1:-40 2:-40\n")
+        rejected = []
+        summary = import_transactions(self.ledger, path, batch_size=1, on_reject=lambda line, reason: rejected.append(line))
+        self.assertEqual((summary.rows, summary.added, summary.rejected), (2, 2, 0))
+        self.assertEqual(rejected, [])
+        self.assertEqual(self.ledger.get_transaction(1), Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=100),
+            TransactionEntry(account_id=2, value=100),
+        )))
+        self.assertEqual(self.ledger.get_account_balance(1)[1], 60)
+
+    def test_import_jsonl_reports_rejected_lines(self):
+        path = self.write_file("transactions.jsonl", "\n".join([
+            '{"id": 1, "timestamp": "2024-01-01", "entries": [{"account_id": 1, "value": 100}, {"account_id": 2, "value": 100}]}',
+            '{"id": 2, "timestamp": "2024-01-02", "entries": [{"account_id": 1, "value": 100}, {"account_id": 2, "value": 50}]}',
+            'not json',
+            '{"id": 1, "timestamp": "2024-01-03", "entries": [{"account_id": 1, "value": 1}, {"account_id": 2, "value": 1}]}',
+            '{"id": 4, "timestamp": "yesterday", "entries": []}',
+        ]))
+        rejected = {}
+        summary = import_transactions(self.ledger, path, on_reject=lambda line, reason: rejected.setdefault(line, reason))
+        self.assertEqual((summary.rows, summary.added, summary.rejected), (5, 1, 4))
+        self.assertEqual(sorted(rejected), [2, 3, 4, 5])
+        self.assertIn("not balanced", rejected[2])
+        self.assertIn("Invalid JSON", rejected[3])
+        self.assertIn("already exists", rejected[4])
+        self.assertIn("Invalid timestamp", rejected[5])
+
+    def test_unsupported_format(self):
+        path = self.write_file("transactions.txt", "")
+        with self.assertRaises(ValueError):
+            import_transactions(self.ledger, path)
+
+    def test_batch_size_must_be_positive(self):
+        path = self.write_file("transactions.csv", "id,timestamp,entries\n1,2024-01-01,1:100 2:100\n")
+        for batch_size in (0, -1):
+            with self.assertRaisesRegex(ValueError, f"Batch size must be at least 1, got {batch_size}"):
+                import_transactions(self.ledger, path, batch_size=batch_size)
+        self.assertEqual(self.ledger.list_transactions(), [])
+
+    def test_parse_transaction_invalid_entry(self):
+        with self.assertRaises(ValueError):
+            parse_transaction({"id": "1", "timestamp": "", "entries": "1-100 2:100"})
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+if __name__ == "__main__":
+    unittest.main()
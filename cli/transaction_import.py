@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from app.ledger import Ledger
+from models.transaction import Transaction, TransactionEntry
+
+# Streams transactions from a CSV or JSONL file into the ledger in constant memory:
+# read rows -> parse transactions -> batch -> validate and insert.
+#
+# CSV files need an "id,timestamp,entries" header, with entries written as in the shell: "1:100 2:100".
+# JSONL files hold one object per line: {"id": 1, "timestamp": "2025-09-20T10:09:08", "entries": [{"account_id": 1, "value": 100}, ...]}.
+# A missing timestamp defaults to the time of import.
+
+DEFAULT_BATCH_SIZE = 1000
+
+@dataclass
+class ImportSummary:
+    rows: int = 0
+    added: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"Imported {self.added} of {self.rows} transactions in {self.seconds:.2f}s "
+                f"({self.rows_per_second:.0f} rows/s), {self.rejected} rejected.")
+
+def read_rows(path: str, file_format: str | None = None) -> Iterator[tuple[int, dict]]:
+    file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        elif file_format in ("jsonl", "json"):
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield line_number, line
+        else:
+            raise ValueError(f"Unsupported import format '{file_format}'. Expected csv or jsonl.")
+
+def parse_entries(entries: str | list) -> tuple[TransactionEntry, ...]:
+    if isinstance(entries, str):
+        parsed = []
+        for entry_str in entries.split():
+            try:
+                account_id_str, value_str = entry_str.split(":")
+                parsed.append(TransactionEntry(account_id=int(account_id_str), value=int(value_str)))
+            except ValueError:
+                raise ValueError(f"Invalid entry format: '{entry_str}'. Expected <account_id>:<value>.")
+        return tuple(parsed)
+    try:
+        return tuple(TransactionEntry(account_id=int(entry["account_id"]), value=int(entry["value"])) for entry in entries)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid entries: {entries!r}. Expected a list of {{\"account_id\": <id>, \"value\": <value>}} objects.")
+
+def parse_transaction(row: str | dict) -> Transaction:
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(row, dict):
+            raise ValueError("Expected a JSON object.")
+    try:
+        transaction_id = int(row["id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid transaction id: {row.get('id')!r}.")
+    timestamp = datetime.now()
+    if row.get("timestamp"):
+        try:
+            timestamp = datetime.fromisoformat(row["timestamp"])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid timestamp: {e}")
+    return Transaction(id=transaction_id, timestamp=timestamp, entries=parse_entries(row.get("entries") or ""))
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def import_transactions(
+        ledger: Ledger,
+        path: str,
+        file_format: str | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        on_reject: Callable[[int, str], None] | None = None) -> ImportSummary:
+    # on_reject is called with the line number and reason for every rejected row
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be at least 1, got {batch_size}.")
+    summary = ImportSummary()
+    start = time.perf_counter()
+
+    def reject(line_number: int, reason: str) -> None:
+        summary.rejected += 1
+        if on_reject is not None:
+            on_reject(line_number, reason)
+
+    def parsed_transactions() -> Iterator[tuple[int, Transaction]]:
+        for line_number, row in read_rows(path, file_format):
+            summary.rows += 1
+            try:
+                yield line_number, parse_transaction(row)
+            except ValueError as e:
+                reject(line_number, str(e))
+
+    for batch in batched(parsed_transactions(), batch_size):
+        line_numbers = {id(transaction): line_number for line_number, transaction in batch}
+        result = ledger.add_transactions((transaction for _, transaction in batch), atomic=False)
+        summary.added += len(result.added)
+        for transaction, reason in result.rejected:
+            reject(line_numbers[id(transaction)], reason)
+
+    summary.seconds = time.perf_counter() - start
+    return summary
@@ -1,23 +1,38 @@
+import threading
+from typing import Iterable
+
 from models.account import Account
 from database.database import AbstractDatabase
+from metrics.registry import timed
 
 class AccountDao:
 
     def __init__(self, db: AbstractDatabase):
         self.db = db
+        # Accounts are added rarely, one lock makes the id and name checks atomic with the insert
+        self.lock = threading.Lock()
 
+    @timed("account_dao.add_account")
     def add_account(self, account: Account) -> None:
-        if self.db.get_account(account.id) is not None:
-            raise ValueError(f"Account with id {account.id} already exists.")
-        if self.db.get_account_by_name(account.name) is not None:
-            raise ValueError(f"Account with name '{account.name}' already exists.")
-        self.db.add_account(account)
+        with self.lock:
+            if self.db.get_account(account.id) is not None:
+                raise ValueError(f"Account with id {account.id} already exists.")
+            if self.db.get_account_by_name(account.name) is not None:
+                raise ValueError(f"Account with name '{account.name}' already exists.")
+            self.db.add_account(account)
 
+    @timed("account_dao.get_account")
     def get_account(self, account_id: int) -> Account | None:
         return self.db.get_account(account_id)
-    
+
+    @timed("account_dao.get_account_by_name")
     def get_account_by_name(self, account_name: str) -> Account | None:
         return self.db.get_account_by_name(account_name)
 
+    @timed("account_dao.get_accounts")
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return self.db.get_accounts(account_ids)
+
+    @timed("account_dao.list_accounts")
     def list_accounts(self) -> list[Account]:
-        return self.db.list_accounts()
\ No newline at end of file
+        return self.db.list_accounts()
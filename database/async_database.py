@@ -0,0 +1,166 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import AsyncIterator, Callable, Iterable
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Transaction, TransactionCursor
+from database.database import AbstractDatabase
+
+# Transactions fetched from the worker thread per step of an async iteration
+ASYNC_ITERATION_CHUNK_SIZE = 512
+
+class AsyncAbstractDatabase(ABC):
+    # The AbstractDatabase contract for asyncio callers, every operation is awaitable
+
+    @abstractmethod
+    async def add_account(self, account: Account) -> None:
+        pass
+
+    @abstractmethod
+    async def get_account(self, account_id: int) -> Account | None:
+        pass
+
+    @abstractmethod
+    async def get_account_by_name(self, account_name: str) -> Account | None:
+        pass
+
+    @abstractmethod
+    async def list_accounts(self) -> list[Account]:
+        pass
+
+    @abstractmethod
+    async def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        pass
+
+    @abstractmethod
+    async def add_transactions(self, transactions: list[Transaction]) -> None:
+        pass
+
+    @abstractmethod
+    async def get_transaction(self, transaction_id: int) -> Transaction | None:
+        pass
+
+    @abstractmethod
+    async def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        pass
+
+    @abstractmethod
+    async def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        pass
+
+    @abstractmethod
+    async def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        pass
+
+    @abstractmethod
+    async def get_latest_timestamp(self) -> datetime | None:
+        pass
+
+    @abstractmethod
+    async def add_period_close(self, period_close: PeriodClose) -> None:
+        pass
+
+    @abstractmethod
+    async def list_period_closes(self) -> list[PeriodClose]:
+        pass
+
+    # Same contract as AbstractDatabase.iter_transactions
+    @abstractmethod
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> AsyncIterator[Transaction]:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class ThreadedAsyncDatabase(AsyncAbstractDatabase):
+    # Runs a synchronous backend on worker threads so that the event loop never blocks on storage.
+    #
+    # With the default single worker every call runs on the same thread, which is what a sqlite
+    # connection needs, and calls are served in submission order. Backends that are safe for
+    # concurrent use, like InMemoryDatabase, can be given more workers to serve reads in parallel.
+
+    def __init__(self, db: AbstractDatabase, max_workers: int = 1, executor: ThreadPoolExecutor | None = None):
+        self.db = db
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ledger-db")
+
+    @classmethod
+    async def open(cls, factory: Callable[[], AbstractDatabase], max_workers: int = 1) -> "ThreadedAsyncDatabase":
+        # Creates the backend on the worker thread, e.g. open(lambda: SqliteDatabase(path))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ledger-db")
+        db = await asyncio.get_running_loop().run_in_executor(executor, factory)
+        return cls(db, executor=executor)
+
+    async def _run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args))
+
+    async def add_account(self, account: Account) -> None:
+        await self._run(self.db.add_account, account)
+
+    async def get_account(self, account_id: int) -> Account | None:
+        return await self._run(self.db.get_account, account_id)
+
+    async def get_account_by_name(self, account_name: str) -> Account | None:
+        return await self._run(self.db.get_account_by_name, account_name)
+
+    async def list_accounts(self) -> list[Account]:
+        return await self._run(self.db.list_accounts)
+
+    async def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return await self._run(self.db.get_accounts, list(account_ids))
+
+    async def add_transactions(self, transactions: list[Transaction]) -> None:
+        await self._run(self.db.add_transactions, transactions)
+
+    async def get_transaction(self, transaction_id: int) -> Transaction | None:
+        return await self._run(self.db.get_transaction, transaction_id)
+
+    async def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return await self._run(self.db.get_existing_transaction_ids, list(transaction_ids))
+
+    async def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        return await self._run(self.db.get_balances, account_ids, timestamp)
+
+    async def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        return await self._run(self.db.get_balance_changes, account_ids, start, end)
+
+    async def get_latest_timestamp(self) -> datetime | None:
+        return await self._run(self.db.get_latest_timestamp)
+
+    async def add_period_close(self, period_close: PeriodClose) -> None:
+        await self._run(self.db.add_period_close, period_close)
+
+    async def list_period_closes(self) -> list[PeriodClose]:
+        return await self._run(self.db.list_period_closes)
+
+    async def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> AsyncIterator[Transaction]:
+        # The synchronous iterator is advanced on the worker a chunk at a time
+        account_ids = list(account_ids) if account_ids is not None else None
+        iterator = await self._run(self.db.iter_transactions, start, end, account_ids, after)
+        while True:
+            chunk = await self._run(lambda: list(islice(iterator, ASYNC_ITERATION_CHUNK_SIZE)))
+            for transaction in chunk:
+                yield transaction
+            if len(chunk) < ASYNC_ITERATION_CHUNK_SIZE:
+                return
+
+    async def close(self) -> None:
+        close = getattr(self.db, "close", None)
+        if close is not None:
+            await self._run(close)
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from metrics import registry as metrics
+from models.account import Account
+from models.cache_stats import CacheStats
+from database.database import AbstractDatabase, DEFAULT_ACCOUNT_CACHE_SIZE
+from database.delegating_database import DelegatingDatabase
+
+class CachedDatabase(DelegatingDatabase):
+    # Read-through LRU cache of account lookups in front of any backend, so that validating
+    # postings against a slow backend only queries it for accounts that aren't hot.
+    # Only found accounts are cached, and add_account through this wrapper invalidates the
+    # cached entries for that id and name.
+
+    def __init__(self, db: AbstractDatabase, max_size: int = DEFAULT_ACCOUNT_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError(f"Cache size must be at least 1, got {max_size}.")
+        super().__init__(db)
+        self.max_size = max_size
+        self.accounts_by_id: OrderedDict[int, Account] = OrderedDict()
+        self.ids_by_name: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def add_account(self, account: Account) -> None:
+        self.db.add_account(account)
+        with self.lock:
+            self._evict(account.id)
+            if account.name in self.ids_by_name:
+                self._evict(self.ids_by_name[account.name])
+
+    def get_account(self, account_id: int) -> Account | None:
+        with self.lock:
+            account = self._lookup(account_id)
+        if account is not None:
+            return account
+        account = self.db.get_account(account_id)
+        self._store(account)
+        return account
+
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        with self.lock:
+            account_id = self.ids_by_name.get(account_name)
+            account = self._lookup(account_id) if account_id is not None else None
+            if account_id is None:
+                self._count_miss()
+        if account is not None:
+            return account
+        account = self.db.get_account_by_name(account_name)
+        self._store(account)
+        return account
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        # Hits are served from the cache and all misses are fetched with one backend call
+        accounts = {}
+        missing = []
+        with self.lock:
+            for account_id in set(account_ids):
+                account = self._lookup(account_id)
+                if account is not None:
+                    accounts[account_id] = account
+                else:
+                    missing.append(account_id)
+        if missing:
+            fetched = self.db.get_accounts(missing)
+            for account in fetched.values():
+                self._store(account)
+            accounts.update(fetched)
+        return accounts
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return CacheStats(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self.accounts_by_id))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.accounts_by_id.clear()
+            self.ids_by_name.clear()
+
+    def _lookup(self, account_id: int) -> Account | None:
+        # Callers hold self.lock
+        account = self.accounts_by_id.get(account_id)
+        if account is None:
+            self._count_miss()
+            return None
+        self.accounts_by_id.move_to_end(account_id)
+        self.hits += 1
+        metrics.increment("account_cache.hits")
+        return account
+
+    def _count_miss(self) -> None:
+        self.misses += 1
+        metrics.increment("account_cache.misses")
+
+    def _store(self, account: Account | None) -> None:
+        if account is None:
+            return
+        with self.lock:
+            self._evict(account.id)
+            self.accounts_by_id[account.id] = account
+            self.ids_by_name[account.name] = account.id
+            while len(self.accounts_by_id) > self.max_size:
+                _, evicted = self.accounts_by_id.popitem(last=False)
+                self._forget_name(evicted)
+                self.evictions += 1
+                metrics.increment("account_cache.evictions")
+
+    def _evict(self, account_id: int) -> None:
+        account = self.accounts_by_id.pop(account_id, None)
+        if account is not None:
+            self._forget_name(account)
+
+    def _forget_name(self, account: Account) -> None:
+        if self.ids_by_name.get(account.name) == account.id:
+            del self.ids_by_name[account.name]
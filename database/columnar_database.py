@@ -0,0 +1,196 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionEntry, TransactionCursor
+from database.database import AbstractDatabase
+from database.timestamps import to_epoch_micros, from_epoch_micros
+from database.parallel import ParallelAggregator
+
+class ColumnarDatabase(AbstractDatabase):
+    # Stores transactions column-wise in int64 arrays instead of Transaction objects.
+    # Transaction objects are only built when a caller asks for them.
+    #
+    # Transaction columns hold one row per transaction, posting columns one row per entry.
+    # The postings of transaction row i are posting rows transaction_offsets[i]:transaction_offsets[i + 1].
+    # Timestamps are epoch microseconds, see database/timestamps.py.
+    # posting_rows_by_account lists each account's posting rows in insertion order, so one
+    # account's history is read without scanning the posting columns.
+    #
+    # With workers > 1, balances over large posting sets are summed by a process pool reading the
+    # columns from shared memory, see database/parallel.py. close() stops the pool.
+
+    def __init__(self, workers: int = 1):
+        self.accounts_by_id = {}
+        self.accounts_by_name = {}
+        self.transaction_ids = array("q")
+        self.transaction_timestamps = array("q")
+        self.transaction_offsets = array("q", [0])
+        self.posting_account_ids = array("q")
+        self.posting_values = array("q")
+        self.posting_timestamps = array("q")
+        self.posting_rows_by_account: dict[int, array] = {}
+        # While transactions arrive in increasing id order, rows are found by binary search over
+        # transaction_ids. The first out of order id switches to a dict of id -> row.
+        self.rows_by_id: dict[int, int] | None = None
+        # Rows in (timestamp, id) order, None while rows were appended in that order
+        self.time_order: array | None = None
+        self.time_ordered = True
+        self.period_closes: list[PeriodClose] = []
+        self.aggregator = ParallelAggregator(workers)
+
+    def add_account(self, account: Account) -> None:
+        self.accounts_by_id[account.id] = account
+        self.accounts_by_name[account.name] = account
+
+    def get_account(self, account_id: int) -> Account | None:
+        return self.accounts_by_id.get(account_id)
+
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        return self.accounts_by_name.get(account_name)
+
+    def list_accounts(self) -> list[Account]:
+        return list(self.accounts_by_id.values())
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return {account_id: self.accounts_by_id[account_id] for account_id in account_ids if account_id in self.accounts_by_id}
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        row = len(self.transaction_ids)
+        timestamp = to_epoch_micros(transaction.timestamp)
+        if row > 0:
+            if self.rows_by_id is None and transaction.id <= self.transaction_ids[-1]:
+                self.rows_by_id = {transaction_id: position for position, transaction_id in enumerate(self.transaction_ids)}
+            if (timestamp, transaction.id) < (self.transaction_timestamps[-1], self.transaction_ids[-1]):
+                self.time_ordered = False
+        if self.rows_by_id is not None:
+            self.rows_by_id[transaction.id] = row
+        self.time_order = None
+        self.transaction_ids.append(transaction.id)
+        self.transaction_timestamps.append(timestamp)
+        for entry in transaction.entries:
+            rows = self.posting_rows_by_account.get(entry.account_id)
+            if rows is None:
+                rows = self.posting_rows_by_account[entry.account_id] = array("q")
+            rows.append(len(self.posting_values))
+            self.posting_account_ids.append(entry.account_id)
+            self.posting_values.append(entry.value)
+            self.posting_timestamps.append(timestamp)
+        self.transaction_offsets.append(len(self.posting_values))
+
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        row = self._find_row(transaction_id)
+        return self._transaction_at(row) if row is not None else None
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return {transaction_id for transaction_id in transaction_ids if self._find_row(transaction_id) is not None}
+
+    def list_transactions(self) -> list[Transaction]:
+        return list(self.iter_transactions())
+
+    def get_latest_timestamp(self) -> datetime | None:
+        return from_epoch_micros(max(self.transaction_timestamps)) if self.transaction_timestamps else None
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        account_ids = set(account_ids) if account_ids is not None else None
+        lower = (to_epoch_micros(start), float("-inf")) if start is not None else None
+        if after is not None:
+            cursor = (to_epoch_micros(after[0]), after[1])
+            lower = max(lower, cursor) if lower is not None else cursor
+        upper = to_epoch_micros(end) if end is not None else None
+        for row in self._rows_in_time_order(lower, upper):
+            if account_ids is not None:
+                postings = self.posting_account_ids[self.transaction_offsets[row]:self.transaction_offsets[row + 1]]
+                if account_ids.isdisjoint(postings):
+                    continue
+            yield self._transaction_at(row)
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        return self.aggregator.sum_balances(
+            self.posting_account_ids,
+            self.posting_values,
+            self.posting_timestamps,
+            to_epoch_micros(timestamp),
+            account_ids,
+            time_ordered=self.time_ordered)
+
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        return self.aggregator.sum_balances(
+            self.posting_account_ids,
+            self.posting_values,
+            self.posting_timestamps,
+            to_epoch_micros(end),
+            account_ids,
+            time_ordered=self.time_ordered,
+            start=to_epoch_micros(start))
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        posting_rows = self.posting_rows_by_account.get(account_id, array("q"))
+        lower = to_epoch_micros(start) if start is not None else None
+        upper = to_epoch_micros(end) if end is not None else None
+        timestamp_of = self.posting_timestamps.__getitem__
+        if self.time_ordered:
+            # The account's rows are in time order too, the bounds are binary searches
+            first = bisect_left(posting_rows, lower, key=timestamp_of) if lower is not None else 0
+            stop = bisect_right(posting_rows, upper, key=timestamp_of) if upper is not None else len(posting_rows)
+            posting_rows = posting_rows[first:stop]
+        postings = []
+        for posting_row in posting_rows:
+            timestamp = self.posting_timestamps[posting_row]
+            if (lower is None or timestamp >= lower) and (upper is None or timestamp <= upper):
+                # The transaction row owning a posting row is found by binary search over the offsets
+                row = bisect_right(self.transaction_offsets, posting_row) - 1
+                postings.append((timestamp, self.transaction_ids[row], posting_row))
+        if not self.time_ordered:
+            postings.sort()
+        return [
+            Posting(transaction_id=transaction_id, timestamp=from_epoch_micros(timestamp), value=self.posting_values[posting_row])
+            for timestamp, transaction_id, posting_row in postings
+        ]
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self.period_closes.append(period_close)
+        self.period_closes.sort(key=lambda close: close.timestamp)
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return list(self.period_closes)
+
+    def close(self) -> None:
+        self.aggregator.close()
+
+    def _find_row(self, transaction_id: int) -> int | None:
+        if self.rows_by_id is not None:
+            return self.rows_by_id.get(transaction_id)
+        row = bisect_left(self.transaction_ids, transaction_id)
+        if row < len(self.transaction_ids) and self.transaction_ids[row] == transaction_id:
+            return row
+        return None
+
+    def _transaction_at(self, row: int) -> Transaction:
+        first, stop = self.transaction_offsets[row], self.transaction_offsets[row + 1]
+        entries = tuple(
+            TransactionEntry(account_id=account_id, value=value)
+            for account_id, value in zip(self.posting_account_ids[first:stop], self.posting_values[first:stop]))
+        return Transaction(id=self.transaction_ids[row], timestamp=from_epoch_micros(self.transaction_timestamps[row]), entries=entries)
+
+    def _rows_in_time_order(self, lower: tuple[int, float] | None, upper: int | None) -> Iterator[int]:
+        # Yields rows with (timestamp, id) > lower and timestamp <= upper
+        if self.time_ordered:
+            order = range(len(self.transaction_ids))
+        else:
+            if self.time_order is None:
+                self.time_order = array("q", sorted(range(len(self.transaction_ids)), key=lambda row: (self.transaction_timestamps[row], self.transaction_ids[row])))
+            order = self.time_order
+        key = lambda row: (self.transaction_timestamps[row], self.transaction_ids[row])
+        first = bisect_right(order, lower, key=key) if lower is not None else 0
+        stop = bisect_right(order, (upper, float("inf")), key=key) if upper is not None else len(order)
+        for position in range(first, stop):
+            yield order[position]
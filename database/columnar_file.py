@@ -0,0 +1,94 @@
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+# Compact columnar file of little-endian int64 columns, laid out so that every column can be
+# memory-mapped directly (e.g. numpy.memmap(path, dtype="<i8", offset=..., shape=(rows,))):
+#
+#   magic        8 bytes   b"LDGRCOL1"
+#   row count    int64
+#   column count int64
+#   names        16 bytes per column, ascii, NUL padded
+#   data         one block of row count int64 values per column, in header order
+
+MAGIC = b"LDGRCOL1"
+NAME_SIZE = 16
+HEADER = struct.Struct("<8sqq")
+SPILL_SIZE = 65536  # Values buffered per column before spilling to a temporary file
+
+def header_size(column_count: int) -> int:
+    return HEADER.size + NAME_SIZE * column_count
+
+class ColumnarWriter:
+    # Columns are spilled to temporary files while rows are appended, so memory use stays
+    # bounded regardless of the number of rows. The final file is assembled on close.
+
+    def __init__(self, path: str, columns: list[str]):
+        for name in columns:
+            if len(name.encode("ascii")) > NAME_SIZE:
+                raise ValueError(f"Column name '{name}' is longer than {NAME_SIZE} characters.")
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.buffers = [array("q") for _ in columns]
+        self.spills = [tempfile.TemporaryFile() for _ in columns]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def append(self, row: tuple[int, ...]) -> None:
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        self.rows += 1
+        if len(self.buffers[0]) >= SPILL_SIZE:
+            self._spill()
+
+    def close(self) -> None:
+        self._spill()
+        with open(self.path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, self.rows, len(self.columns)))
+            for name in self.columns:
+                file.write(name.encode("ascii").ljust(NAME_SIZE, b"\0"))
+            for spill in self.spills:
+                spill.seek(0)
+                shutil.copyfileobj(spill, file)
+        self._discard()
+
+    def _spill(self) -> None:
+        for buffer, spill in zip(self.buffers, self.spills):
+            if sys.byteorder == "big":
+                buffer.byteswap()
+            buffer.tofile(spill)
+            del buffer[:]
+
+    def _discard(self) -> None:
+        for spill in self.spills:
+            spill.close()
+
+def read_columnar(path: str) -> dict[str, memoryview]:
+    # Maps the file and returns a zero-copy int64 view of every column
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, rows, column_count = HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a ledger columnar file.")
+    if sys.byteorder == "big":
+        raise ValueError("Reading columnar files needs a little-endian platform.")
+    view = memoryview(mapped)
+    columns = {}
+    offset = header_size(column_count)
+    for index in range(column_count):
+        name_start = HEADER.size + index * NAME_SIZE
+        name = bytes(view[name_start:name_start + NAME_SIZE]).rstrip(b"\0").decode("ascii")
+        columns[name] = view[offset:offset + rows * 8].cast("q")
+        offset += rows * 8
+    return columns
@@ -1,6 +1,21 @@
+import heapq
+import threading
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Iterable, Iterator
+
 from models.account import Account
-from models.transaction import Transaction
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionCursor
+from database.posting_index import PostingIndex
+from database.locking import StripedLock
+
+# Number of transactions copied out of the time ordered list per lock acquisition while iterating
+ITERATION_CHUNK_SIZE = 1024
+
+# Accounts CachedDatabase keeps by default, defined here so the CLI can show it without importing the cache
+DEFAULT_ACCOUNT_CACHE_SIZE = 4096
 
 class AbstractDatabase(ABC):
 
@@ -28,15 +43,100 @@ class AbstractDatabase(ABC):
     def get_transaction(self, transaction_id: int) -> Transaction | None:
         pass
 
+    # Transactions are listed in (timestamp, id) order
     @abstractmethod
     def list_transactions(self) -> list[Transaction]:
         pass
 
+    # Balance of each account including every posting at or before the timestamp
+    @abstractmethod
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        pass
+
+    @abstractmethod
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        pass
+
+    # Period closes are listed in timestamp order
+    @abstractmethod
+    def list_period_closes(self) -> list[PeriodClose]:
+        pass
+
+    # Sum of each account's postings with start < timestamp <= end, the change in its balance over that range.
+    # Backends should override this to only read the postings in the range.
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        before = self.get_balances(account_ids, start)
+        after = self.get_balances(account_ids, end)
+        return {account_id: after[account_id] - before[account_id] for account_id in after}
+
+    # Batch operations. The defaults fall back to the single item methods,
+    # backends should override them with a single storage call where they can.
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        accounts = {}
+        for account_id in account_ids:
+            account = self.get_account(account_id)
+            if account is not None:
+                accounts[account_id] = account
+        return accounts
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return {transaction_id for transaction_id in transaction_ids if self.get_transaction(transaction_id) is not None}
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        for transaction in transactions:
+            self.add_transaction(transaction)
+
+    def get_latest_timestamp(self) -> datetime | None:
+        latest = None
+        for transaction in self.iter_transactions():
+            latest = transaction.timestamp
+        return latest
+
+    # Postings to one account with start <= timestamp <= end in (timestamp, transaction id) order.
+    # Backends should override this to read only that account's postings.
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        return [
+            Posting(transaction_id=transaction.id, timestamp=transaction.timestamp, value=entry.value)
+            for transaction in self.iter_transactions(start, end, [account_id])
+            for entry in transaction.entries
+            if entry.account_id == account_id
+        ]
+
+    # Lazily yields the transactions with start <= timestamp <= end in (timestamp, id) order.
+    # account_ids limits the result to transactions posting to any of those accounts,
+    # after resumes the iteration past the given (timestamp, id) cursor.
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        account_ids = set(account_ids) if account_ids is not None else None
+        for transaction in self.list_transactions():
+            if start is not None and transaction.timestamp < start:
+                continue
+            if after is not None and (transaction.timestamp, transaction.id) <= after:
+                continue
+            if end is not None and transaction.timestamp > end:
+                break
+            if account_ids is not None and not any(entry.account_id in account_ids for entry in transaction.entries):
+                continue
+            yield transaction
+
 class InMemoryDatabase(AbstractDatabase):
+    # Safe for concurrent use. Postings are guarded per account by striped locks, so writers
+    # to different accounts only share the short critical section that orders transactions by time.
+
     def __init__(self):
         self.accounts_by_id = {}
         self.accounts_by_name = {}
         self.transactions = {}
+        self.transactions_by_time = []
+        self.postings = PostingIndex()
+        self.period_closes = []
+        self.time_order_lock = threading.Lock()
+        self.account_locks = StripedLock()
 
     def add_account(self, account: Account) -> None:
         self.accounts_by_id[account.id] = account
@@ -52,10 +152,105 @@ class InMemoryDatabase(AbstractDatabase):
         return list(self.accounts_by_id.values())
 
     def add_transaction(self, transaction: Transaction) -> None:
-        self.transactions[transaction.id] = transaction
+        # Stored before it is indexed, so that everything found through the posting index can be looked up
+        with self.time_order_lock:
+            self.transactions[transaction.id] = transaction
+            insort(self.transactions_by_time, transaction, key=lambda txn: (txn.timestamp, txn.id))
+        with self.account_locks.acquire(entry.account_id for entry in transaction.entries):
+            self.postings.add_transaction(transaction)
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        # Each lock is taken once per batch. The sorted batch is merged into the time order in a
+        # single pass, or just appended when it is entirely newer, as imports usually are.
+        if not transactions:
+            return
+        key = lambda txn: (txn.timestamp, txn.id)
+        batch = sorted(transactions, key=key)
+        with self.time_order_lock:
+            for transaction in batch:
+                self.transactions[transaction.id] = transaction
+            if not self.transactions_by_time or key(self.transactions_by_time[-1]) <= key(batch[0]):
+                self.transactions_by_time.extend(batch)
+            else:
+                self.transactions_by_time[:] = heapq.merge(self.transactions_by_time, batch, key=key)
+        with self.account_locks.acquire(entry.account_id for transaction in batch for entry in transaction.entries):
+            for transaction in batch:
+                self.postings.add_transaction(transaction)
 
     def get_transaction(self, transaction_id: int) -> Transaction | None:
         return self.transactions.get(transaction_id)
 
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return {account_id: self.accounts_by_id[account_id] for account_id in account_ids if account_id in self.accounts_by_id}
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return self.transactions.keys() & set(transaction_ids)
+
     def list_transactions(self) -> list[Transaction]:
-        return self.transactions.values()
\ No newline at end of file
+        with self.time_order_lock:
+            return list(self.transactions_by_time)
+
+    def get_latest_timestamp(self) -> datetime | None:
+        with self.time_order_lock:
+            return self.transactions_by_time[-1].timestamp if self.transactions_by_time else None
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        if account_ids is not None:
+            yield from self._iter_account_transactions(account_ids, start, end, after)
+            return
+        # Transactions are copied out a chunk at a time and each chunk is found again from the
+        # last yielded key, so concurrent inserts never make the iteration skip or repeat one.
+        while True:
+            with self.time_order_lock:
+                first = 0 if start is None else bisect_left(self.transactions_by_time, start, key=lambda txn: txn.timestamp)
+                if after is not None:
+                    first = max(first, bisect_right(self.transactions_by_time, after, key=lambda txn: (txn.timestamp, txn.id)))
+                stop = len(self.transactions_by_time) if end is None else bisect_right(self.transactions_by_time, end, key=lambda txn: txn.timestamp)
+                chunk = self.transactions_by_time[first:min(stop, first + ITERATION_CHUNK_SIZE)]
+            yield from chunk
+            if len(chunk) < ITERATION_CHUNK_SIZE:
+                return
+            after = (chunk[-1].timestamp, chunk[-1].id)
+
+    def _iter_account_transactions(
+            self,
+            account_ids: Iterable[int],
+            start: datetime | None,
+            end: datetime | None,
+            after: TransactionCursor | None) -> Iterator[Transaction]:
+        # Merges the posting lists of the requested accounts, so the cost follows their activity rather than the whole ledger
+        account_ids = set(account_ids)
+        streams = []
+        with self.account_locks.acquire(account_ids):
+            for account_id in account_ids:
+                postings = self.postings.accounts.get(account_id)
+                if postings is not None:
+                    positions = postings.positions(start, end)
+                    streams.append(zip(postings.timestamps[positions.start:positions.stop], postings.transaction_ids[positions.start:positions.stop]))
+        previous = after
+        for key in heapq.merge(*streams):
+            if previous is not None and key <= previous:
+                continue
+            previous = key
+            yield self.transactions[key[1]]
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        with self.account_locks.acquire(account_ids):
+            return self.postings.get_balances(account_ids, timestamp)
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        with self.account_locks.acquire([account_id]):
+            postings = self.postings.accounts.get(account_id)
+            return postings.history(start, end) if postings is not None else []
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self.period_closes.append(period_close)
+        self.period_closes.sort(key=lambda close: close.timestamp)
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return list(self.period_closes)
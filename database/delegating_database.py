@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionCursor
+from database.database import AbstractDatabase
+
+class DelegatingDatabase(AbstractDatabase):
+    # Forwards every operation to another database. Base class for wrappers that add
+    # behaviour around any backend by overriding the operations they care about.
+
+    def __init__(self, db: AbstractDatabase):
+        self.db = db
+
+    def add_account(self, account: Account) -> None:
+        self.db.add_account(account)
+
+    def get_account(self, account_id: int) -> Account | None:
+        return self.db.get_account(account_id)
+
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        return self.db.get_account_by_name(account_name)
+
+    def list_accounts(self) -> list[Account]:
+        return self.db.list_accounts()
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        self.db.add_transaction(transaction)
+
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        return self.db.get_transaction(transaction_id)
+
+    def list_transactions(self) -> list[Transaction]:
+        return self.db.list_transactions()
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        return self.db.get_balances(account_ids, timestamp)
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self.db.add_period_close(period_close)
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return self.db.list_period_closes()
+
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        return self.db.get_balance_changes(account_ids, start, end)
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return self.db.get_accounts(account_ids)
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return self.db.get_existing_transaction_ids(transaction_ids)
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        self.db.add_transactions(transactions)
+
+    def get_latest_timestamp(self) -> datetime | None:
+        return self.db.get_latest_timestamp()
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        return self.db.iter_transactions(start, end, account_ids, after)
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        return self.db.get_account_history(account_id, start, end)
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from metrics.registry import timed, timed_iterator
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionCursor
+from database.delegating_database import DelegatingDatabase
+
+class InstrumentedDatabase(DelegatingDatabase):
+    # Records the latency of every storage operation of the wrapped backend as database.<operation>
+
+    @timed("database.add_account")
+    def add_account(self, account: Account) -> None:
+        self.db.add_account(account)
+
+    @timed("database.get_account")
+    def get_account(self, account_id: int) -> Account | None:
+        return self.db.get_account(account_id)
+
+    @timed("database.get_account_by_name")
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        return self.db.get_account_by_name(account_name)
+
+    @timed("database.list_accounts")
+    def list_accounts(self) -> list[Account]:
+        return self.db.list_accounts()
+
+    @timed("database.get_accounts")
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return self.db.get_accounts(account_ids)
+
+    @timed("database.add_transaction")
+    def add_transaction(self, transaction: Transaction) -> None:
+        self.db.add_transaction(transaction)
+
+    @timed("database.add_transactions")
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        self.db.add_transactions(transactions)
+
+    @timed("database.get_transaction")
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        return self.db.get_transaction(transaction_id)
+
+    @timed("database.get_existing_transaction_ids")
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return self.db.get_existing_transaction_ids(transaction_ids)
+
+    @timed("database.list_transactions")
+    def list_transactions(self) -> list[Transaction]:
+        return self.db.list_transactions()
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        return timed_iterator("database.iter_transactions", self.db.iter_transactions(start, end, account_ids, after))
+
+    @timed("database.get_balances")
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        return self.db.get_balances(account_ids, timestamp)
+
+    @timed("database.get_balance_changes")
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        return self.db.get_balance_changes(account_ids, start, end)
+
+    @timed("database.get_latest_timestamp")
+    def get_latest_timestamp(self) -> datetime | None:
+        return self.db.get_latest_timestamp()
+
+    @timed("database.add_period_close")
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self.db.add_period_close(period_close)
+
+    @timed("database.list_period_closes")
+    def list_period_closes(self) -> list[PeriodClose]:
+        return self.db.list_period_closes()
+
+    @timed("database.get_account_history")
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        return self.db.get_account_history(account_id, start, end)
@@ -0,0 +1,270 @@
+import os
+import struct
+import threading
+import zlib
+from typing import BinaryIO, Iterator
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Transaction
+from database.database import AbstractDatabase, InMemoryDatabase
+from database.delegating_database import DelegatingDatabase
+from database.record_codec import encode_account, encode_transaction, encode_period_close, decode_record
+
+# Durable storage for an in-memory database: a write-ahead journal of every added account,
+# transaction and period close plus periodic snapshots of the whole state, both in the binary record encoding of
+# database/record_codec.py. Files live in one directory and are numbered by generation:
+#
+#   snapshot-<generation>.bin   state before anything in journal-<generation>.log
+#                               magic b"LDGRSNP1", generation int64, record count int64, then frames
+#   journal-<generation>.log    frames appended since that snapshot
+#
+# A frame is a uint32 payload length, the uint32 crc32 of the payload and the payload itself.
+# Startup loads the newest snapshot and replays only the journals of the same or later
+# generations, so restart time follows the journal tail rather than the age of the ledger.
+
+SNAPSHOT_MAGIC = b"LDGRSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sqq")
+FRAME = struct.Struct("<II")
+DEFAULT_SNAPSHOT_INTERVAL = 100_000  # Journal records written before a new snapshot is taken
+
+def frame(payload: bytes) -> bytes:
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+def read_frames(file: BinaryIO) -> Iterator[tuple[bytes, int]]:
+    # Yields each payload with the file offset just past it, and stops at the first torn or corrupt frame
+    offset = file.tell()
+    while True:
+        header = file.read(FRAME.size)
+        if len(header) < FRAME.size:
+            return
+        length, checksum = FRAME.unpack(header)
+        payload = file.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        offset += FRAME.size + length
+        yield payload, offset
+
+
+class JournalWriter:
+    # Appends frames to a journal file with group commit: callers that arrive while an fsync is in
+    # progress are made durable together by the next one, so concurrent writers share disk flushes.
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.file = open(path, "ab")
+        self.lock = threading.Lock()       # Guards appends to the file buffer
+        self.sync_lock = threading.Lock()  # Held by the thread flushing the file to disk
+        self.written = 0  # Sequence number of the latest append
+        self.synced = 0   # Sequence number of the latest append known to be on disk
+
+    def append(self, payloads: list[bytes]) -> int:
+        # Buffers the frames and returns the sequence number to pass to sync
+        data = b"".join(frame(payload) for payload in payloads)
+        with self.lock:
+            self.file.write(data)
+            self.written += 1
+            return self.written
+
+    def sync(self, sequence: int) -> None:
+        # Returns once the append with the given sequence number is on disk
+        with self.sync_lock:
+            if self.synced >= sequence:
+                return
+            with self.lock:
+                self.file.flush()
+                target = self.written
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.synced = target
+
+    def close(self) -> None:
+        with self.sync_lock, self.lock:
+            if self.file.closed:
+                return
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.synced = self.written
+            self.file.close()
+
+
+class JournaledDatabase(DelegatingDatabase):
+    # Makes an in-memory database durable. Every add is journaled before it is applied, and calls
+    # return only once their records are on disk. add_transactions journals a batch with one write
+    # and one fsync.
+
+    def __init__(
+            self,
+            directory: str,
+            db: AbstractDatabase | None = None,
+            snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL,
+            fsync: bool = True):
+        super().__init__(db if db is not None else InMemoryDatabase())
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        # Serialises journal appends with applying them, so journal order is memory order
+        # and a snapshot always sees exactly the records journaled before it.
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()  # One snapshot is written at a time
+        os.makedirs(directory, exist_ok=True)
+        self.generation = self._recover()
+        self.journal = JournalWriter(self._journal_path(self.generation), fsync)
+        self.records_since_snapshot = 0
+
+    def add_account(self, account: Account) -> None:
+        self._write([encode_account(account)], lambda: self.db.add_account(account))
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        self._write([encode_transaction(transaction)], lambda: self.db.add_transaction(transaction))
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        if transactions:
+            self._write([encode_transaction(transaction) for transaction in transactions], lambda: self.db.add_transactions(transactions))
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self._write([encode_period_close(period_close)], lambda: self.db.add_period_close(period_close))
+
+    def snapshot(self) -> None:
+        with self.snapshot_lock:
+            self._take_snapshot()
+
+    def _take_snapshot(self) -> None:
+        # Starts a new journal generation and writes the state as of its start. Writers are only
+        # held up while the journal is rotated and the state is copied, not while it is written.
+        with self.lock:
+            self.journal.close()
+            self.generation += 1
+            generation = self.generation
+            self.journal = JournalWriter(self._journal_path(generation), self.fsync)
+            self.records_since_snapshot = 0
+            accounts = self.db.list_accounts()
+            transactions = self.db.list_transactions()
+            period_closes = self.db.list_period_closes()
+        path = self._snapshot_path(generation)
+        with open(path + ".tmp", "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, len(accounts) + len(transactions) + len(period_closes)))
+            for account in accounts:
+                file.write(frame(encode_account(account)))
+            for transaction in transactions:
+                file.write(frame(encode_transaction(transaction)))
+            for period_close in period_closes:
+                file.write(frame(encode_period_close(period_close)))
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_directory()
+        # Older snapshots and journals are covered by the new snapshot
+        for name in os.listdir(self.directory):
+            older = self._generation_of(name)
+            if older is not None and older < generation:
+                os.remove(os.path.join(self.directory, name))
+
+    def close(self, snapshot: bool = True) -> None:
+        # A snapshot on shutdown leaves nothing to replay on the next start
+        if snapshot and self.records_since_snapshot:
+            self.snapshot()
+        self.journal.close()
+
+    def _write(self, payloads: list[bytes], apply) -> None:
+        # Records are applied as soon as they are journaled and the disk flush happens outside
+        # the lock, which is what lets concurrent writers share one fsync.
+        with self.lock:
+            sequence = self.journal.append(payloads)
+            journal = self.journal
+            apply()
+            self.records_since_snapshot += len(payloads)
+            due = self.records_since_snapshot >= self.snapshot_interval
+        journal.sync(sequence)
+        if due:
+            with self.snapshot_lock:
+                # Writers that became due together take a single snapshot
+                if self.records_since_snapshot >= self.snapshot_interval:
+                    self._take_snapshot()
+
+    def _recover(self) -> int:
+        # Loads the newest readable snapshot, replays the journals after it and returns the current generation
+        snapshots = []
+        journals = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+                continue
+            generation = self._generation_of(name)
+            if generation is not None:
+                (snapshots if name.startswith("snapshot-") else journals).append(generation)
+        generation = 0
+        for candidate in sorted(snapshots, reverse=True):
+            if self._load_snapshot(candidate):
+                generation = candidate
+                break
+        replayed = sorted(journal for journal in journals if journal >= generation)
+        for journal in replayed:
+            self._replay_journal(journal, last=journal == replayed[-1])
+        return replayed[-1] if replayed else generation
+
+    def _load_snapshot(self, generation: int) -> bool:
+        with open(self._snapshot_path(generation), "rb") as file:
+            header = file.read(SNAPSHOT_HEADER.size)
+            if len(header) < SNAPSHOT_HEADER.size:
+                return False
+            magic, stored_generation, count = SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC or stored_generation != generation:
+                return False
+            records = [decode_record(payload) for payload, _ in read_frames(file)]
+        if len(records) != count:
+            return False
+        self._apply_records(records)
+        return True
+
+    def _replay_journal(self, generation: int, last: bool) -> None:
+        path = self._journal_path(generation)
+        with open(path, "rb") as file:
+            end = 0
+            records = []
+            for payload, end in read_frames(file):
+                records.append(decode_record(payload))
+            torn = end < os.fstat(file.fileno()).st_size
+        if torn and not last:
+            raise ValueError(f"Journal {path} is corrupt at offset {end}.")
+        if torn:
+            # A crash during the final append leaves a partial frame, which was never acknowledged
+            os.truncate(path, end)
+        self._apply_records(records)
+
+    def _apply_records(self, records: list[Account | Transaction | PeriodClose]) -> None:
+        transactions = []
+        for record in records:
+            if isinstance(record, Account):
+                self.db.add_account(record)
+            elif isinstance(record, PeriodClose):
+                self.db.add_period_close(record)
+            else:
+                transactions.append(record)
+        self.db.add_transactions(transactions)
+
+    def _sync_directory(self) -> None:
+        if self.fsync and hasattr(os, "O_DIRECTORY"):
+            descriptor = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"journal-{generation:08d}.log")
+
+    def _snapshot_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{generation:08d}.bin")
+
+    @staticmethod
+    def _generation_of(name: str) -> int | None:
+        for prefix, suffix in (("journal-", ".log"), ("snapshot-", ".bin")):
+            if name.startswith(prefix) and name.endswith(suffix):
+                number = name[len(prefix):-len(suffix)]
+                if number.isdigit():
+                    return int(number)
+        return None
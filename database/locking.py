@@ -0,0 +1,31 @@
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Iterable, Iterator
+
+DEFAULT_STRIPES = 64
+
+class StripedLock:
+    # A fixed pool of locks shared by hash, so that operations on different keys rarely contend
+    # while memory stays constant however many keys there are. Stripes are always acquired in
+    # index order, which keeps callers locking several keys at once free of deadlocks.
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def acquire(self, keys: Iterable[Hashable]) -> Iterator[None]:
+        indexes = sorted({hash(key) % len(self.locks) for key in keys})
+        acquired = []
+        try:
+            for index in indexes:
+                self.locks[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self.locks[index].release()
+
+    @contextmanager
+    def acquire_all(self) -> Iterator[None]:
+        with self.acquire(range(len(self.locks))):
+            yield
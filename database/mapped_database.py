@@ -0,0 +1,360 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, the columns are strided memoryviews without it
+    numpy = None
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionEntry, TransactionCursor
+from database.database import AbstractDatabase
+from database.journal import frame, read_frames
+from database.record_codec import encode_account, encode_period_close, decode_record
+from database.timestamps import to_epoch_micros, from_epoch_micros
+from database import vectorized
+
+# Append-only storage of fixed-width little-endian int64 records, read in place through mmap.
+# Balances are summed over views of the mapped records, so scans run over the OS page cache
+# without building Transaction objects, and opening a ledger only maps the files and reads a header.
+# Files live in one directory:
+#
+#   postings.seg      magic b"LDGRPST1" padded to 32 bytes, then one record per posting:
+#                     transaction id, timestamp, account id, value
+#   transactions.idx  magic b"LDGRIDX1", transaction count, posting count, latest timestamp and
+#                     flags, then one record per transaction: id, timestamp, first posting row
+#   catalog.log       accounts and period closes, frames as in database/journal.py
+#
+# Timestamps are epoch microseconds, see database/timestamps.py. The postings of transaction row i
+# are the posting rows from its first posting row up to the next transaction's.
+#
+# Files grow by doubling and the space past the counts is unused. Records are written before the
+# index header that counts them, so a crash mid-append leaves records that are overwritten by the
+# next one. With fsync=True the records are flushed to disk before the header too.
+# Not safe to share between threads.
+
+POSTINGS_MAGIC = b"LDGRPST1"
+INDEX_MAGIC = b"LDGRIDX1"
+POSTINGS_HEADER = struct.Struct("<8s24x")
+INDEX_HEADER = struct.Struct("<8sqqqq")
+POSTING_RECORD = struct.Struct("<qqqq")
+INDEX_RECORD = struct.Struct("<qqq")
+INITIAL_CAPACITY = 1 << 20  # Bytes allocated for a new file
+
+# Index header flags
+TIME_ORDERED = 1  # Transactions were appended in (timestamp, id) order
+ID_ORDERED = 2    # Transactions were appended in increasing id order
+
+class MappedDatabase(AbstractDatabase):
+
+    def __init__(self, directory: str, fsync: bool = False):
+        if sys.byteorder == "big":
+            raise ValueError("MappedDatabase needs a little-endian platform.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.accounts_by_id = {}
+        self.accounts_by_name = {}
+        self.period_closes: list[PeriodClose] = []
+        self.catalog = self._open_catalog(os.path.join(directory, "catalog.log"))
+        self.postings_file, self.postings_map = self._open_segment("postings.seg", POSTINGS_MAGIC, POSTINGS_HEADER.pack(POSTINGS_MAGIC))
+        self.index_file, self.index_map = self._open_segment(
+            "transactions.idx", INDEX_MAGIC, INDEX_HEADER.pack(INDEX_MAGIC, 0, 0, 0, TIME_ORDERED | ID_ORDERED))
+        _, self.transaction_count, self.posting_count, self.latest_timestamp, flags = INDEX_HEADER.unpack_from(self.index_map, 0)
+        self.time_ordered = bool(flags & TIME_ORDERED)
+        self.id_ordered = bool(flags & ID_ORDERED)
+        # Built on first use rather than on open, and kept up to date by appends after that:
+        # id -> row once ids are out of order, rows in (timestamp, id) order once rows are,
+        # and each account's posting rows.
+        self.rows_by_id: dict[int, int] | None = None
+        self.time_order = None
+        self.posting_rows_by_account: dict[int, array] | None = None
+
+    def add_account(self, account: Account) -> None:
+        self._append_catalog(encode_account(account))
+        self.accounts_by_id[account.id] = account
+        self.accounts_by_name[account.name] = account
+
+    def get_account(self, account_id: int) -> Account | None:
+        return self.accounts_by_id.get(account_id)
+
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        return self.accounts_by_name.get(account_name)
+
+    def list_accounts(self) -> list[Account]:
+        return list(self.accounts_by_id.values())
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        return {account_id: self.accounts_by_id[account_id] for account_id in account_ids if account_id in self.accounts_by_id}
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        self.add_transactions([transaction])
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        index_records = array("q")
+        posting_records = array("q")
+        last = self._key_at(self.transaction_count - 1) if self.transaction_count else None
+        time_ordered, id_ordered = self.time_ordered, self.id_ordered
+        latest = self.latest_timestamp if self.transaction_count else None
+        posting_row = self.posting_count
+        for transaction in transactions:
+            timestamp = to_epoch_micros(transaction.timestamp)
+            key = (timestamp, transaction.id)
+            if last is not None:
+                id_ordered = id_ordered and transaction.id > last[1]
+                time_ordered = time_ordered and key >= last
+            last = key
+            latest = timestamp if latest is None else max(latest, timestamp)
+            index_records.extend((transaction.id, timestamp, posting_row))
+            for entry in transaction.entries:
+                posting_records.extend((transaction.id, timestamp, entry.account_id, entry.value))
+            posting_row += len(transaction.entries)
+        if not index_records:
+            return
+        self.postings_map = self._write_at(
+            self.postings_file, self.postings_map, POSTINGS_HEADER.size + self.posting_count * POSTING_RECORD.size, posting_records.tobytes())
+        self.index_map = self._write_at(
+            self.index_file, self.index_map, INDEX_HEADER.size + self.transaction_count * INDEX_RECORD.size, index_records.tobytes())
+        if self.fsync:
+            os.fsync(self.postings_file.fileno())
+            os.fsync(self.index_file.fileno())
+        # The header is the commit point
+        first_row, first_posting_row = self.transaction_count, self.posting_count
+        flags = (TIME_ORDERED if time_ordered else 0) | (ID_ORDERED if id_ordered else 0)
+        self.index_map = self._write_at(
+            self.index_file, self.index_map, 0, INDEX_HEADER.pack(INDEX_MAGIC, first_row + len(transactions), posting_row, latest, flags))
+        if self.fsync:
+            os.fsync(self.index_file.fileno())
+        self.transaction_count += len(transactions)
+        self.posting_count = posting_row
+        self.latest_timestamp = latest
+        self.time_ordered, self.id_ordered = time_ordered, id_ordered
+        self.time_order = None
+        if self.rows_by_id is not None:
+            for row in range(first_row, self.transaction_count):
+                self.rows_by_id[index_records[(row - first_row) * 3]] = row
+        if self.posting_rows_by_account is not None:
+            for posting_row in range(first_posting_row, self.posting_count):
+                account_id = posting_records[(posting_row - first_posting_row) * 4 + 2]
+                self.posting_rows_by_account.setdefault(account_id, array("q")).append(posting_row)
+
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        row = self._find_row(transaction_id)
+        return self._transaction_at(row) if row is not None else None
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        return {transaction_id for transaction_id in transaction_ids if self._find_row(transaction_id) is not None}
+
+    def list_transactions(self) -> list[Transaction]:
+        return list(self.iter_transactions())
+
+    def get_latest_timestamp(self) -> datetime | None:
+        return from_epoch_micros(self.latest_timestamp) if self.transaction_count else None
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        account_ids = set(account_ids) if account_ids is not None else None
+        lower = (to_epoch_micros(start), float("-inf")) if start is not None else None
+        if after is not None:
+            cursor = (to_epoch_micros(after[0]), after[1])
+            lower = max(lower, cursor) if lower is not None else cursor
+        upper = to_epoch_micros(end) if end is not None else None
+        for row in self._rows_in_time_order(lower, upper):
+            transaction = self._transaction_at(row)
+            if account_ids is None or not account_ids.isdisjoint(entry.account_id for entry in transaction.entries):
+                yield transaction
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        _, timestamps, posting_account_ids, values = self._posting_columns()
+        return vectorized.sum_balances(
+            posting_account_ids, values, timestamps, to_epoch_micros(timestamp), account_ids, time_ordered=self.time_ordered)
+
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        _, timestamps, posting_account_ids, values = self._posting_columns()
+        return vectorized.sum_balances(
+            posting_account_ids, values, timestamps, to_epoch_micros(end), account_ids,
+            time_ordered=self.time_ordered, start=to_epoch_micros(start))
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        posting_rows = self._account_posting_rows().get(account_id, array("q"))
+        lower = to_epoch_micros(start) if start is not None else None
+        upper = to_epoch_micros(end) if end is not None else None
+        if self.time_ordered:
+            # The account's rows are in time order too, the bounds are binary searches
+            timestamp_of = self._posting_columns()[1].__getitem__
+            first = bisect_left(posting_rows, lower, key=timestamp_of) if lower is not None else 0
+            stop = bisect_right(posting_rows, upper, key=timestamp_of) if upper is not None else len(posting_rows)
+            posting_rows = posting_rows[first:stop]
+        postings = []
+        for posting_row in posting_rows:
+            transaction_id, timestamp, _, value = POSTING_RECORD.unpack_from(self.postings_map, POSTINGS_HEADER.size + posting_row * POSTING_RECORD.size)
+            if (lower is None or timestamp >= lower) and (upper is None or timestamp <= upper):
+                postings.append((timestamp, transaction_id, value))
+        if not self.time_ordered:
+            postings.sort()
+        return [
+            Posting(transaction_id=transaction_id, timestamp=from_epoch_micros(timestamp), value=value)
+            for timestamp, transaction_id, value in postings
+        ]
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        self._append_catalog(encode_period_close(period_close))
+        self.period_closes.append(period_close)
+        self.period_closes.sort(key=lambda close: close.timestamp)
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return list(self.period_closes)
+
+    def close(self) -> None:
+        for mapped in (self.postings_map, self.index_map):
+            _close_map(mapped)
+        self.postings_file.close()
+        self.index_file.close()
+        self.catalog.close()
+
+    def _open_catalog(self, path: str) -> BinaryIO:
+        if os.path.exists(path):
+            end = 0
+            with open(path, "rb") as file:
+                for payload, end in read_frames(file):
+                    record = decode_record(payload)
+                    if isinstance(record, Account):
+                        self.accounts_by_id[record.id] = record
+                        self.accounts_by_name[record.name] = record
+                    else:
+                        self.period_closes.append(record)
+            # A crash during the final append leaves a partial frame, which was never acknowledged
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+            self.period_closes.sort(key=lambda close: close.timestamp)
+        return open(path, "ab")
+
+    def _append_catalog(self, payload: bytes) -> None:
+        self.catalog.write(frame(payload))
+        self.catalog.flush()
+        if self.fsync:
+            os.fsync(self.catalog.fileno())
+
+    def _open_segment(self, name: str, magic: bytes, header: bytes) -> tuple[BinaryIO, mmap.mmap]:
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        file = open(path, "r+b", buffering=0)
+        if os.fstat(file.fileno()).st_size < len(header):
+            # A new file, or one torn before its first append was counted
+            file.truncate(0)
+            file.write(header)
+            file.truncate(INITIAL_CAPACITY)
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(magic)] != magic:
+            _close_map(mapped)
+            file.close()
+            raise ValueError(f"{path} is not a ledger {name} file.")
+        return file, mapped
+
+    @staticmethod
+    def _write_at(file: BinaryIO, mapped: mmap.mmap, offset: int, data: bytes) -> mmap.mmap:
+        # Writes through the file, which the shared mapping sees, and returns the mapping to read
+        # from, a new one when the file had to grow
+        if offset + len(data) > len(mapped):
+            file.truncate(max(offset + len(data), 2 * len(mapped)))
+            # Views handed out earlier keep the old mapping alive until they are dropped
+            _close_map(mapped)
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        file.seek(offset)
+        file.write(data)
+        return mapped
+
+    def _posting_columns(self) -> list:
+        # Transaction id, timestamp, account id and value views over the counted posting records
+        return _columns(self.postings_map, POSTINGS_HEADER.size, self.posting_count, 4)
+
+    def _index_columns(self) -> list:
+        # Id, timestamp and first posting row views over the counted transaction records
+        return _columns(self.index_map, INDEX_HEADER.size, self.transaction_count, 3)
+
+    def _key_at(self, row: int) -> tuple[int, int]:
+        transaction_id, timestamp, _ = INDEX_RECORD.unpack_from(self.index_map, INDEX_HEADER.size + row * INDEX_RECORD.size)
+        return timestamp, transaction_id
+
+    def _find_row(self, transaction_id: int) -> int | None:
+        if not self.id_ordered:
+            if self.rows_by_id is None:
+                transaction_ids = self._index_columns()[0].tolist()
+                self.rows_by_id = {row_id: row for row, row_id in enumerate(transaction_ids)}
+            return self.rows_by_id.get(transaction_id)
+        transaction_ids = self._index_columns()[0]
+        row = bisect_left(transaction_ids, transaction_id)
+        if row < self.transaction_count and transaction_ids[row] == transaction_id:
+            return row
+        return None
+
+    def _transaction_at(self, row: int) -> Transaction:
+        transaction_id, timestamp, first = INDEX_RECORD.unpack_from(self.index_map, INDEX_HEADER.size + row * INDEX_RECORD.size)
+        stop = self.posting_count
+        if row + 1 < self.transaction_count:
+            stop = INDEX_RECORD.unpack_from(self.index_map, INDEX_HEADER.size + (row + 1) * INDEX_RECORD.size)[2]
+        entries = []
+        for posting_row in range(first, stop):
+            _, _, account_id, value = POSTING_RECORD.unpack_from(self.postings_map, POSTINGS_HEADER.size + posting_row * POSTING_RECORD.size)
+            entries.append(TransactionEntry(account_id=account_id, value=value))
+        return Transaction(id=transaction_id, timestamp=from_epoch_micros(timestamp), entries=tuple(entries))
+
+    def _rows_in_time_order(self, lower: tuple[int, float] | None, upper: int | None) -> Iterator[int]:
+        # Yields rows with (timestamp, id) > lower and timestamp <= upper
+        if self.time_ordered:
+            order = range(self.transaction_count)
+        else:
+            if self.time_order is None:
+                transaction_ids, timestamps, _ = self._index_columns()
+                if numpy is not None:
+                    self.time_order = numpy.lexsort((transaction_ids, timestamps)).tolist()
+                else:
+                    self.time_order = sorted(range(self.transaction_count), key=lambda row: (timestamps[row], transaction_ids[row]))
+            order = self.time_order
+        key = self._key_at
+        first = bisect_right(order, lower, key=key) if lower is not None else 0
+        stop = bisect_right(order, (upper, float("inf")), key=key) if upper is not None else len(order)
+        for position in range(first, stop):
+            yield order[position]
+
+    def _account_posting_rows(self) -> dict[int, array]:
+        if self.posting_rows_by_account is None:
+            posting_account_ids = self._posting_columns()[2]
+            rows_by_account = {}
+            if numpy is not None:
+                order = numpy.argsort(posting_account_ids, kind="stable")
+                account_ids, starts = numpy.unique(posting_account_ids[order], return_index=True)
+                for account_id, rows in zip(account_ids.tolist(), numpy.split(order, starts[1:])):
+                    rows_by_account[account_id] = array("q", rows.tolist())
+            else:
+                for posting_row, account_id in enumerate(posting_account_ids):
+                    rows_by_account.setdefault(account_id, array("q")).append(posting_row)
+            self.posting_rows_by_account = rows_by_account
+        return self.posting_rows_by_account
+
+def _columns(mapped: mmap.mmap, offset: int, rows: int, fields: int) -> list:
+    # One zero-copy view per field of rows records of fields int64 values each
+    if numpy is not None:
+        records = numpy.frombuffer(mapped, dtype="<i8", count=rows * fields, offset=offset).reshape(rows, fields)
+        return [records[:, field] for field in range(fields)]
+    view = memoryview(mapped)[offset:offset + rows * fields * 8].cast("q")
+    return [view[field::fields] for field in range(fields)]
+
+def _close_map(mapped: mmap.mmap) -> None:
+    try:
+        mapped.close()
+    except BufferError:
+        # Still viewed by a caller, the mapping is released with the last view
+        pass
@@ -0,0 +1,115 @@
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Sequence
+
+from database.vectorized import numpy, sum_balances
+
+# Grouped posting sums split across a process pool. The posting columns are copied once into
+# shared memory and every worker sums a contiguous range of rows in place, so no postings or
+# Transaction objects are pickled; only the per-account partial sums travel back to be merged.
+
+# Fewer postings than this are summed in process, where starting the work costs more than it saves
+PARALLEL_MIN_POSTINGS = 1 << 20
+
+def _sum_partition(
+        names: tuple[str, str, str],
+        first: int,
+        stop: int,
+        cutoff: int,
+        wanted_ids: list[int],
+        time_ordered: bool,
+        start: int | None) -> dict[int, int]:
+    # Runs in a worker process: sums rows first:stop of the shared columns
+    blocks = [SharedMemory(name=name) for name in names]
+    try:
+        views = [block.buf[first * 8:stop * 8] for block in blocks]
+        try:
+            columns = [view.cast("q") for view in views]
+            balances = sum_balances(*columns, cutoff, wanted_ids, time_ordered, start)
+            for column in columns:
+                column.release()
+        finally:
+            for view in views:
+                view.release()
+    finally:
+        for block in blocks:
+            block.close()
+    return balances
+
+
+class ParallelAggregator:
+    # Owns the worker pool and the shared copy of the columns, both reused between calls.
+    # Columns are assumed append-only: rows already shared are never copied again.
+
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError(f"Worker count must be at least 1, got {workers}.")
+        self.workers = workers
+        self.pool: ProcessPoolExecutor | None = None
+        self.blocks: list[SharedMemory] = []
+        self.shared_rows = 0
+
+    def sum_balances(
+            self,
+            account_ids: Sequence[int],
+            values: Sequence[int],
+            timestamps: Sequence[int],
+            cutoff: int,
+            wanted_ids: list[int],
+            time_ordered: bool = False,
+            start: int | None = None) -> dict[int, int]:
+        # Same contract as vectorized.sum_balances
+        first, rows = 0, len(values)
+        if self.workers == 1 or rows < PARALLEL_MIN_POSTINGS:
+            return sum_balances(account_ids, values, timestamps, cutoff, wanted_ids, time_ordered, start)
+        if time_ordered:
+            # Only the rows between the bounds are partitioned, so every worker gets useful work
+            if numpy is not None:
+                times = numpy.frombuffer(timestamps, dtype=numpy.int64)
+                first = int(numpy.searchsorted(times, start, side="right")) if start is not None else 0
+                rows = int(numpy.searchsorted(times, cutoff, side="right"))
+            else:
+                first = bisect_right(timestamps, start) if start is not None else 0
+                rows = bisect_right(timestamps, cutoff)
+        self._share((account_ids, values, timestamps), len(values))
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        names = tuple(block.name for block in self.blocks)
+        size = max(1, -(-(rows - first) // self.workers))
+        futures = [
+            self.pool.submit(_sum_partition, names, partition, min(partition + size, rows), cutoff, wanted_ids, time_ordered, start)
+            for partition in range(first, rows, size)
+        ]
+        balances = {account_id: 0 for account_id in wanted_ids}
+        for future in futures:
+            for account_id, balance in future.result().items():
+                balances[account_id] += balance
+        return balances
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+        self.shared_rows = 0
+
+    def _share(self, columns: tuple[Sequence[int], ...], rows: int) -> None:
+        # Copies the rows appended since the last call, growing the blocks by doubling
+        capacity = self.blocks[0].size // 8 if self.blocks else 0
+        if rows > capacity:
+            previous = self.blocks
+            self.blocks = [SharedMemory(create=True, size=max(rows, capacity * 2) * 8) for _ in columns]
+            for old, new in zip(previous, self.blocks):
+                new.buf[:self.shared_rows * 8] = old.buf[:self.shared_rows * 8]
+                old.close()
+                old.unlink()
+        if rows > self.shared_rows:
+            for column, block in zip(columns, self.blocks):
+                source = memoryview(column).cast("B")
+                block.buf[self.shared_rows * 8:rows * 8] = source[self.shared_rows * 8:rows * 8]
+                source.release()
+            self.shared_rows = rows
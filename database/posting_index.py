@@ -0,0 +1,77 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from models.transaction import Posting, Transaction
+
+# Number of postings summed into each cumulative balance checkpoint
+CHECKPOINT_INTERVAL = 64
+
+class AccountPostings:
+    # Time ordered postings of a single account.
+    # checkpoints[i] holds the sum of the first i * CHECKPOINT_INTERVAL values, so an
+    # as-of balance is a binary search plus a tail sum of at most CHECKPOINT_INTERVAL values.
+
+    def __init__(self):
+        self.timestamps: list[datetime] = []
+        self.transaction_ids: list[int] = []
+        self.values: list[int] = []
+        self.checkpoints: list[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, timestamp: datetime, transaction_id: int, value: int) -> None:
+        position = bisect_right(self.timestamps, timestamp)
+        # Postings sharing a timestamp are kept in transaction id order
+        while position > 0 and self.timestamps[position - 1] == timestamp and self.transaction_ids[position - 1] > transaction_id:
+            position -= 1
+        self.timestamps.insert(position, timestamp)
+        self.transaction_ids.insert(position, transaction_id)
+        self.values.insert(position, value)
+        # Checkpoints covering the insertion point are stale, they are rebuilt lazily by balance_at
+        del self.checkpoints[position // CHECKPOINT_INTERVAL + 1:]
+
+    def positions(self, start: datetime | None = None, end: datetime | None = None) -> range:
+        # Positions of the postings with start <= timestamp <= end
+        first = 0 if start is None else bisect_left(self.timestamps, start)
+        stop = len(self.timestamps) if end is None else bisect_right(self.timestamps, end)
+        return range(first, stop)
+
+    def history(self, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        positions = self.positions(start, end)
+        return [
+            Posting(transaction_id=transaction_id, timestamp=timestamp, value=value)
+            for transaction_id, timestamp, value in zip(
+                self.transaction_ids[positions.start:positions.stop],
+                self.timestamps[positions.start:positions.stop],
+                self.values[positions.start:positions.stop])
+        ]
+
+    def balance_at(self, timestamp: datetime) -> int:
+        count = bisect_right(self.timestamps, timestamp)
+        block = count // CHECKPOINT_INTERVAL
+        while len(self.checkpoints) <= block:
+            start = (len(self.checkpoints) - 1) * CHECKPOINT_INTERVAL
+            self.checkpoints.append(self.checkpoints[-1] + sum(self.values[start:start + CHECKPOINT_INTERVAL]))
+        return self.checkpoints[block] + sum(self.values[block * CHECKPOINT_INTERVAL:count])
+
+
+class PostingIndex:
+    # Not synchronised itself, InMemoryDatabase guards each account's postings with its locks
+
+    def __init__(self):
+        self.accounts: dict[int, AccountPostings] = {}
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        for entry in transaction.entries:
+            postings = self.accounts.get(entry.account_id)
+            if postings is None:
+                postings = self.accounts[entry.account_id] = AccountPostings()
+            postings.add(transaction.timestamp, transaction.id, entry.value)
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        balances = {}
+        for account_id in account_ids:
+            postings = self.accounts.get(account_id)
+            balances[account_id] = postings.balance_at(timestamp) if postings is not None else 0
+        return balances
@@ -0,0 +1,79 @@
+import struct
+
+from models.account import Account, AccountType
+from models.period_close import PeriodClose
+from models.transaction import Transaction, TransactionEntry
+from database.timestamps import to_epoch_micros, from_epoch_micros
+
+# Compact little-endian binary encoding of accounts and transactions, shared by the files that persist them.
+#
+#   account      kind b"A", id int64, type uint8, name and description as uint32 length + utf-8
+#   transaction  kind b"T", id int64, timestamp int64 epoch micros, entry count uint32,
+#                then account id int64 + value int64 per entry
+#   period close kind b"C", timestamp int64 epoch micros, account count uint32,
+#                then account id int64 + balance int64 per account
+
+ACCOUNT_KIND = b"A"
+TRANSACTION_KIND = b"T"
+PERIOD_CLOSE_KIND = b"C"
+
+ACCOUNT_HEADER = struct.Struct("<cqB")
+TRANSACTION_HEADER = struct.Struct("<cqqI")
+PERIOD_CLOSE_HEADER = struct.Struct("<cqI")
+ENTRY = struct.Struct("<qq")
+TEXT_LENGTH = struct.Struct("<I")
+
+ACCOUNT_TYPES = (AccountType.DEBIT, AccountType.CREDIT)
+ACCOUNT_TYPE_CODES = {account_type: code for code, account_type in enumerate(ACCOUNT_TYPES)}
+
+def encode_account(account: Account) -> bytes:
+    name = account.name.encode("utf-8")
+    description = account.description.encode("utf-8")
+    return b"".join((
+        ACCOUNT_HEADER.pack(ACCOUNT_KIND, account.id, ACCOUNT_TYPE_CODES[account.type]),
+        TEXT_LENGTH.pack(len(name)), name,
+        TEXT_LENGTH.pack(len(description)), description))
+
+def encode_transaction(transaction: Transaction) -> bytes:
+    parts = [TRANSACTION_HEADER.pack(TRANSACTION_KIND, transaction.id, to_epoch_micros(transaction.timestamp), len(transaction.entries))]
+    parts.extend(ENTRY.pack(entry.account_id, entry.value) for entry in transaction.entries)
+    return b"".join(parts)
+
+def encode_period_close(period_close: PeriodClose) -> bytes:
+    parts = [PERIOD_CLOSE_HEADER.pack(PERIOD_CLOSE_KIND, to_epoch_micros(period_close.timestamp), len(period_close.balances))]
+    parts.extend(ENTRY.pack(account_id, balance) for account_id, balance in period_close.balances.items())
+    return b"".join(parts)
+
+def decode_record(data: bytes) -> Account | Transaction | PeriodClose:
+    kind = data[:1]
+    if kind == ACCOUNT_KIND:
+        return _decode_account(data)
+    if kind == TRANSACTION_KIND:
+        return _decode_transaction(data)
+    if kind == PERIOD_CLOSE_KIND:
+        return _decode_period_close(data)
+    raise ValueError(f"Unknown record kind {kind!r}.")
+
+def _decode_account(data: bytes) -> Account:
+    _, account_id, type_code = ACCOUNT_HEADER.unpack_from(data, 0)
+    offset = ACCOUNT_HEADER.size
+    (length,) = TEXT_LENGTH.unpack_from(data, offset)
+    offset += TEXT_LENGTH.size
+    name = data[offset:offset + length].decode("utf-8")
+    offset += length
+    (length,) = TEXT_LENGTH.unpack_from(data, offset)
+    offset += TEXT_LENGTH.size
+    description = data[offset:offset + length].decode("utf-8")
+    return Account(id=account_id, name=name, type=ACCOUNT_TYPES[type_code], description=description)
+
+def _decode_transaction(data: bytes) -> Transaction:
+    _, transaction_id, timestamp, count = TRANSACTION_HEADER.unpack_from(data, 0)
+    entries = tuple(
+        TransactionEntry(account_id=account_id, value=value)
+        for account_id, value in ENTRY.iter_unpack(data[TRANSACTION_HEADER.size:TRANSACTION_HEADER.size + count * ENTRY.size]))
+    return Transaction(id=transaction_id, timestamp=from_epoch_micros(timestamp), entries=entries)
+
+def _decode_period_close(data: bytes) -> PeriodClose:
+    _, timestamp, count = PERIOD_CLOSE_HEADER.unpack_from(data, 0)
+    balances = dict(ENTRY.iter_unpack(data[PERIOD_CLOSE_HEADER.size:PERIOD_CLOSE_HEADER.size + count * ENTRY.size]))
+    return PeriodClose(timestamp=from_epoch_micros(timestamp), balances=balances)
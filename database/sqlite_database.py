@@ -0,0 +1,230 @@
+import sqlite3
+from datetime import datetime
+from itertools import groupby
+from typing import Iterable, Iterator
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionEntry, TransactionCursor
+from database.database import AbstractDatabase
+from database.timestamps import to_epoch_micros, from_epoch_micros
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_by_timestamp ON transactions (timestamp, id);
+CREATE TABLE IF NOT EXISTS entries (
+    transaction_id INTEGER NOT NULL REFERENCES transactions (id),
+    position INTEGER NOT NULL,
+    account_id INTEGER NOT NULL REFERENCES accounts (id),
+    timestamp INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (transaction_id, position)
+);
+CREATE INDEX IF NOT EXISTS entries_by_account_timestamp ON entries (account_id, timestamp, value);
+CREATE TABLE IF NOT EXISTS period_closes (
+    timestamp INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS period_close_balances (
+    timestamp INTEGER NOT NULL REFERENCES period_closes (timestamp),
+    account_id INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (timestamp, account_id)
+);
+"""
+
+# Entries carry a copy of their transaction's timestamp so that the (account_id, timestamp)
+# index covers as-of balance queries without a join. A transaction without entries comes back
+# as one row of NULL entry columns.
+SELECT_TRANSACTIONS = """
+SELECT t.id, t.timestamp, e.account_id, e.value
+FROM transactions t LEFT JOIN entries e ON e.transaction_id = t.id
+"""
+
+# Larger account sets are aggregated without an IN clause, which also keeps the number of bound
+# parameters below SQLITE_MAX_VARIABLE_NUMBER on older sqlite builds
+MAX_QUERY_PARAMETERS = 500
+
+class SqliteDatabase(AbstractDatabase):
+    def __init__(self, path: str = ":memory:", check_same_thread: bool = True):
+        # check_same_thread=False lets other threads use the connection, callers then serialise access
+        self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add_account(self, account: Account) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO accounts (id, name, type, description) VALUES (?, ?, ?, ?)",
+                (account.id, account.name, account.type.value, account.description))
+
+    def get_account(self, account_id: int) -> Account | None:
+        row = self.connection.execute("SELECT id, name, type, description FROM accounts WHERE id = ?", (account_id,)).fetchone()
+        return _account_from_row(row) if row is not None else None
+
+    def get_account_by_name(self, account_name: str) -> Account | None:
+        row = self.connection.execute("SELECT id, name, type, description FROM accounts WHERE name = ?", (account_name,)).fetchone()
+        return _account_from_row(row) if row is not None else None
+
+    def list_accounts(self) -> list[Account]:
+        rows = self.connection.execute("SELECT id, name, type, description FROM accounts ORDER BY id")
+        return [_account_from_row(row) for row in rows]
+
+    def add_transaction(self, transaction: Transaction) -> None:
+        self.add_transactions([transaction])
+
+    def add_transactions(self, transactions: list[Transaction]) -> None:
+        transaction_rows = [(transaction.id, to_epoch_micros(transaction.timestamp)) for transaction in transactions]
+        entry_rows = [
+            (transaction_id, position, entry.account_id, timestamp, entry.value)
+            for (transaction_id, timestamp), transaction in zip(transaction_rows, transactions)
+            for position, entry in enumerate(transaction.entries)
+        ]
+        with self.connection:
+            self.connection.executemany("INSERT INTO transactions (id, timestamp) VALUES (?, ?)", transaction_rows)
+            self.connection.executemany(
+                "INSERT INTO entries (transaction_id, position, account_id, timestamp, value) VALUES (?, ?, ?, ?, ?)",
+                entry_rows)
+
+    def get_transaction(self, transaction_id: int) -> Transaction | None:
+        rows = self.connection.execute(SELECT_TRANSACTIONS + "WHERE t.id = ? ORDER BY e.position", (transaction_id,))
+        return next(_transactions_from_rows(rows), None)
+
+    def get_accounts(self, account_ids: Iterable[int]) -> dict[int, Account]:
+        accounts = {}
+        for chunk in _chunks(list(set(account_ids))):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(f"SELECT id, name, type, description FROM accounts WHERE id IN ({placeholders})", chunk)
+            accounts.update((row[0], _account_from_row(row)) for row in rows)
+        return accounts
+
+    def get_existing_transaction_ids(self, transaction_ids: Iterable[int]) -> set[int]:
+        existing_ids = set()
+        for chunk in _chunks(list(set(transaction_ids))):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.connection.execute(f"SELECT id FROM transactions WHERE id IN ({placeholders})", chunk)
+            existing_ids.update(row[0] for row in rows)
+        return existing_ids
+
+    def list_transactions(self) -> list[Transaction]:
+        return list(self.iter_transactions())
+
+    def get_latest_timestamp(self) -> datetime | None:
+        latest = self.connection.execute("SELECT MAX(timestamp) FROM transactions").fetchone()[0]
+        return from_epoch_micros(latest) if latest is not None else None
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append("t.timestamp >= ?")
+            parameters.append(to_epoch_micros(start))
+        if end is not None:
+            conditions.append("t.timestamp <= ?")
+            parameters.append(to_epoch_micros(end))
+        if after is not None:
+            conditions.append("(t.timestamp, t.id) > (?, ?)")
+            parameters.extend((to_epoch_micros(after[0]), after[1]))
+        wanted = None
+        if account_ids is not None:
+            account_ids = list(set(account_ids))
+        if account_ids is not None and len(account_ids) > MAX_QUERY_PARAMETERS:
+            # Too many ids to bind in one statement, the time ordered scan is filtered as it is read instead
+            wanted = set(account_ids)
+        elif account_ids is not None:
+            # Served by the (account_id, timestamp) index on entries
+            account_conditions = ["e2.account_id IN (" + ", ".join("?" * len(account_ids)) + ")"]
+            account_parameters = list(account_ids)
+            if start is not None:
+                account_conditions.append("e2.timestamp >= ?")
+                account_parameters.append(to_epoch_micros(start))
+            if end is not None:
+                account_conditions.append("e2.timestamp <= ?")
+                account_parameters.append(to_epoch_micros(end))
+            conditions.append(f"t.id IN (SELECT e2.transaction_id FROM entries e2 WHERE {' AND '.join(account_conditions)})")
+            parameters.extend(account_parameters)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self.connection.execute(SELECT_TRANSACTIONS + where + "ORDER BY t.timestamp, t.id, e.position", parameters)
+        if wanted is not None:
+            return (transaction for transaction in _transactions_from_rows(rows) if any(entry.account_id in wanted for entry in transaction.entries))
+        return _transactions_from_rows(rows)
+
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        return self._sum_entries(account_ids, None, to_epoch_micros(timestamp))
+
+    def get_balance_changes(self, account_ids: list[int], start: datetime, end: datetime) -> dict[int, int]:
+        return self._sum_entries(account_ids, to_epoch_micros(start), to_epoch_micros(end))
+
+    def _sum_entries(self, account_ids: list[int], start: int | None, end: int) -> dict[int, int]:
+        # Sums entries with start < timestamp <= end per account
+        balances = {account_id: 0 for account_id in account_ids}
+        unique_ids = list(balances)
+        bounds = "timestamp <= ?" if start is None else "timestamp > ? AND timestamp <= ?"
+        bound_parameters = (end,) if start is None else (start, end)
+        if len(unique_ids) > MAX_QUERY_PARAMETERS:
+            # Large account sets, such as the whole chart of accounts, are aggregated in a single pass
+            rows = self.connection.execute(f"SELECT account_id, SUM(value) FROM entries WHERE {bounds} GROUP BY account_id", bound_parameters)
+            balances.update((account_id, balance) for account_id, balance in rows if account_id in balances)
+            return balances
+        placeholders = ", ".join("?" * len(unique_ids))
+        rows = self.connection.execute(
+            f"SELECT account_id, SUM(value) FROM entries WHERE account_id IN ({placeholders}) AND {bounds} GROUP BY account_id",
+            (*unique_ids, *bound_parameters))
+        balances.update(rows)
+        return balances
+
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        # Range scan of the (account_id, timestamp) index on entries
+        conditions = ["account_id = ?"]
+        parameters = [account_id]
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(to_epoch_micros(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            parameters.append(to_epoch_micros(end))
+        rows = self.connection.execute(
+            f"SELECT transaction_id, timestamp, value FROM entries WHERE {' AND '.join(conditions)} ORDER BY timestamp, transaction_id, position",
+            parameters)
+        return [Posting(transaction_id=transaction_id, timestamp=from_epoch_micros(timestamp), value=value) for transaction_id, timestamp, value in rows]
+
+    def add_period_close(self, period_close: PeriodClose) -> None:
+        timestamp = to_epoch_micros(period_close.timestamp)
+        with self.connection:
+            self.connection.execute("INSERT INTO period_closes (timestamp) VALUES (?)", (timestamp,))
+            self.connection.executemany(
+                "INSERT INTO period_close_balances (timestamp, account_id, balance) VALUES (?, ?, ?)",
+                [(timestamp, account_id, balance) for account_id, balance in period_close.balances.items()])
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        balances = {timestamp: {} for (timestamp,) in self.connection.execute("SELECT timestamp FROM period_closes ORDER BY timestamp")}
+        for timestamp, account_id, balance in self.connection.execute("SELECT timestamp, account_id, balance FROM period_close_balances"):
+            balances[timestamp][account_id] = balance
+        return [PeriodClose(timestamp=from_epoch_micros(timestamp), balances=closing) for timestamp, closing in balances.items()]
+
+def _chunks(values: list) -> list[list]:
+    return [values[start:start + MAX_QUERY_PARAMETERS] for start in range(0, len(values), MAX_QUERY_PARAMETERS)]
+
+def _account_from_row(row: tuple) -> Account:
+    account_id, name, account_type, description = row
+    return Account(id=account_id, name=name, type=account_type, description=description)
+
+def _transactions_from_rows(rows) -> Iterator[Transaction]:
+    for (transaction_id, timestamp), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        entries = tuple(TransactionEntry(account_id=account_id, value=value) for _, _, account_id, value in group if account_id is not None)
+        yield Transaction(id=transaction_id, timestamp=from_epoch_micros(timestamp), entries=entries)
@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+from models.account import Account
+from database.database import InMemoryDatabase
+from database.cached_database import CachedDatabase
+
+class TestCachedDatabase(unittest.TestCase):
+    def setUp(self):
+        self.backend = mock.Mock(wraps=InMemoryDatabase())
+        self.db = CachedDatabase(self.backend, max_size=2)
+        self.cash = Account(id=1, name="Cash", type="debit")
+        self.equity = Account(id=2, name="Equity", type="credit")
+        self.loans = Account(id=3, name="Loans", type="credit")
+        for account in (self.cash, self.equity, self.loans):
+            self.db.add_account(account)
+
+    def test_read_through(self):
+        self.assertEqual(self.db.get_account(1), self.cash)
+        self.assertEqual(self.db.get_account(1), self.cash)
+        self.assertEqual(self.db.get_account_by_name("Cash"), self.cash)
+        self.backend.get_account.assert_called_once_with(1)
+        self.backend.get_account_by_name.assert_not_called()
+        stats = self.db.stats()
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        self.assertAlmostEqual(stats.hit_rate, 2 / 3)
+
+    def test_missing_accounts_are_not_cached(self):
+        self.assertIsNone(self.db.get_account(99))
+        self.assertIsNone(self.db.get_account(99))
+        self.assertEqual(self.backend.get_account.call_count, 2)
+        self.assertEqual(self.db.stats().size, 0)
+
+    def test_lru_eviction(self):
+        self.db.get_account(1)
+        self.db.get_account(2)
+        self.db.get_account(1)
+        self.db.get_account(3)  # Evicts 2, the least recently used
+        self.backend.get_account.reset_mock()
+        self.db.get_account(1)
+        self.db.get_account(3)
+        self.backend.get_account.assert_not_called()
+        self.db.get_account(2)
+        self.backend.get_account.assert_called_once_with(2)
+        self.assertEqual(self.db.stats().evictions, 2)
+
+    def test_get_accounts_fetches_misses_in_one_call(self):
+        self.db.get_account(1)
+        self.backend.get_accounts.reset_mock()
+        self.assertEqual(self.db.get_accounts([1, 2, 99]), {1: self.cash, 2: self.equity})
+        self.backend.get_accounts.assert_called_once()
+        self.assertEqual(sorted(self.backend.get_accounts.call_args.args[0]), [2, 99])
+
+    def test_add_account_invalidates(self):
+        self.db.get_account(1)
+        renamed = Account(id=1, name="Petty cash", type="debit")
+        self.db.add_account(renamed)
+        self.assertEqual(self.db.get_account(1), renamed)
+        self.assertEqual(self.db.get_account_by_name("Petty cash"), renamed)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            CachedDatabase(InMemoryDatabase(), max_size=0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime
+from models.account import Account
+from models.transaction import Posting, Transaction, TransactionEntry
+from database.columnar_database import ColumnarDatabase
+
+class TestColumnarDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = ColumnarDatabase()
+        self.account1 = Account(id=1, name="Cash", type="debit")
+        self.account2 = Account(id=2, name="Equity", type="credit")
+        self.account3 = Account(id=3, name="Bank", type="debit")
+        for account in (self.account1, self.account2, self.account3):
+            self.db.add_account(account)
+        self.t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        self.t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=3, value=20), TransactionEntry(account_id=2, value=20)))
+        self.t3 = Transaction(id=3, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=3, value=-30), TransactionEntry(account_id=1, value=0)))
+
+    def test_accounts(self):
+        self.assertEqual(self.db.get_account(1), self.account1)
+        self.assertEqual(self.db.get_account_by_name("Equity"), self.account2)
+        self.assertIsNone(self.db.get_account(999))
+        self.assertEqual(self.db.get_accounts([1, 999]), {1: self.account1})
+        self.assertEqual(len(self.db.list_accounts()), 3)
+
+    def test_get_transaction_in_id_order(self):
+        for transaction in (self.t1, self.t2, self.t3):
+            self.db.add_transaction(transaction)
+        self.assertIsNone(self.db.rows_by_id)
+        self.assertEqual(self.db.get_transaction(3), self.t3)
+        self.assertIsNone(self.db.get_transaction(4))
+        self.assertEqual(self.db.get_existing_transaction_ids([0, 1, 3, 4]), {1, 3})
+
+    def test_get_transaction_out_of_id_order(self):
+        for transaction in (self.t3, self.t1, self.t2):
+            self.db.add_transaction(transaction)
+        self.assertIsNotNone(self.db.rows_by_id)
+        self.assertEqual(self.db.get_transaction(1), self.t1)
+        self.assertEqual(self.db.get_transaction(3), self.t3)
+        self.assertIsNone(self.db.get_transaction(4))
+
+    def test_list_transactions_in_timestamp_order(self):
+        for transaction in (self.t3, self.t2, self.t1):
+            self.db.add_transaction(transaction)
+        self.assertFalse(self.db.time_ordered)
+        self.assertEqual(self.db.list_transactions(), [self.t1, self.t2, self.t3])
+        self.assertEqual(self.db.get_latest_timestamp(), datetime(2024, 2, 1))
+
+    def test_iter_transactions_filters(self):
+        for transaction in (self.t2, self.t1, self.t3):
+            self.db.add_transaction(transaction)
+        self.assertEqual(list(self.db.iter_transactions(start=datetime(2024, 2, 1))), [self.t2, self.t3])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 1, 31))), [self.t1])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1])), [self.t1, self.t3])
+        self.assertEqual(list(self.db.iter_transactions(after=(datetime(2024, 2, 1), 2))), [self.t3])
+
+    def test_get_balances(self):
+        for ordered in (True, False):
+            db = ColumnarDatabase()
+            transactions = [self.t1, self.t2, self.t3] if ordered else [self.t3, self.t1, self.t2]
+            for transaction in transactions:
+                db.add_transaction(transaction)
+            self.assertEqual(db.time_ordered, ordered)
+            self.assertEqual(db.get_balances([1, 2, 3], datetime(2023, 12, 31)), {1: 0, 2: 0, 3: 0})
+            self.assertEqual(db.get_balances([1, 2, 3], datetime(2024, 1, 1)), {1: 10, 2: 10, 3: 0})
+            self.assertEqual(db.get_balances([1, 3, 4], datetime(2024, 2, 1)), {1: 40, 3: -10, 4: 0})
+
+    def test_get_balance_changes(self):
+        for transaction in (self.t1, self.t2, self.t3):
+            self.db.add_transaction(transaction)
+        self.assertEqual(self.db.get_balance_changes([1, 2, 3], datetime(2024, 1, 1), datetime(2024, 2, 1)), {1: 30, 2: 20, 3: -10})
+        self.assertEqual(self.db.get_balance_changes([1], datetime(2024, 2, 1), datetime(2024, 3, 1)), {1: 0})
+
+    def test_get_account_history(self):
+        for ordered in (True, False):
+            db = ColumnarDatabase()
+            for transaction in ([self.t1, self.t2, self.t3] if ordered else [self.t3, self.t1, self.t2]):
+                db.add_transaction(transaction)
+            self.assertEqual(db.get_account_history(1), [
+                Posting(transaction_id=1, timestamp=datetime(2024, 1, 1), value=10),
+                Posting(transaction_id=3, timestamp=datetime(2024, 2, 1), value=30),
+                Posting(transaction_id=3, timestamp=datetime(2024, 2, 1), value=0),
+            ])
+            self.assertEqual(db.get_account_history(3, datetime(2024, 2, 1), datetime(2024, 2, 1)), [
+                Posting(transaction_id=2, timestamp=datetime(2024, 2, 1), value=20),
+                Posting(transaction_id=3, timestamp=datetime(2024, 2, 1), value=-30),
+            ])
+            self.assertEqual(db.get_account_history(2, end=datetime(2023, 12, 31)), [])
+            self.assertEqual(db.get_account_history(4), [])
+
+if __name__ == "__main__":
+    unittest.main()
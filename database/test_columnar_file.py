@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from database.columnar_file import ColumnarWriter, read_columnar, header_size
+
+class TestColumnarFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "data.col")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_with_spills(self):
+        with mock.patch("database.columnar_file.SPILL_SIZE", 3):
+            with ColumnarWriter(self.path, ["a", "b"]) as writer:
+                for i in range(10):
+                    writer.append((i, -i * 2**40))
+        columns = read_columnar(self.path)
+        self.assertEqual(columns["a"].tolist(), list(range(10)))
+        self.assertEqual(columns["b"].tolist(), [-i * 2**40 for i in range(10)])
+        self.assertEqual(os.path.getsize(self.path), header_size(2) + 10 * 2 * 8)
+
+    def test_empty_file(self):
+        with ColumnarWriter(self.path, ["a"]):
+            pass
+        self.assertEqual(read_columnar(self.path)["a"].tolist(), [])
+
+    def test_long_column_name(self):
+        with self.assertRaises(ValueError):
+            ColumnarWriter(self.path, ["x" * 17])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
+import threading
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest import mock
 from models.account import Account
-from models.transaction import Transaction, TransactionEntry
-from database.database import InMemoryDatabase
+from models.transaction import Posting, Transaction, TransactionEntry
+from database.database import AbstractDatabase, InMemoryDatabase
 
 class TestDatabase(unittest.TestCase):
     def setUp(self):
@@ -53,5 +55,110 @@ class TestDatabase(unittest.TestCase):
         self.assertIn(transaction, transactions)
         self.assertEqual(len(transactions), 1)
 
+    def test_list_transactions_in_timestamp_order(self):
+        late = Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        early = Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        middle = Transaction(id=3, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=2, value=30)))
+        for transaction in (late, early, middle):
+            self.db.add_transaction(transaction)
+        self.assertEqual(self.db.list_transactions(), [early, middle, late])
+
+    def test_get_balances(self):
+        self.db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10))))
+        self.db.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20))))
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2023, 12, 31)), {1: 0, 2: 0})
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2024, 3, 1)), {1: 20, 2: 20})
+        self.assertEqual(self.db.get_balances([1], datetime(2024, 6, 1)), {1: 30})
+
+    def test_iter_transactions_window(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=2, value=30)))
+        for transaction in (t3, t1, t2):
+            self.db.add_transaction(transaction)
+        self.assertEqual(list(self.db.iter_transactions()), [t1, t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(start=datetime(2024, 2, 1))), [t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 2, 1))), [t1, t2])
+        self.assertEqual(list(self.db.iter_transactions(datetime(2024, 1, 15), datetime(2024, 2, 15))), [t2])
+
+    def test_iter_transactions_by_account_and_cursor(self):
+        if self.db.get_account(3) is None:
+            self.db.add_account(Account(id=3, name="Bank", type="debit"))
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=3, value=20), TransactionEntry(account_id=2, value=20)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=3, value=-30)))
+        t4 = Transaction(id=4, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=1, value=-5)))
+        for transaction in (t4, t3, t2, t1):
+            self.db.add_transaction(transaction)
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1])), [t1, t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1, 3])), [t1, t2, t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 2, 1), account_ids=[3])), [t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(after=(datetime(2024, 2, 1), 2))), [t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1, 3], after=(datetime(2024, 2, 1), 2))), [t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[999])), [])
+
+    def test_get_latest_timestamp(self):
+        self.assertIsNone(self.db.get_latest_timestamp())
+        self.db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10))))
+        self.db.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20))))
+        self.assertEqual(self.db.get_latest_timestamp(), datetime(2024, 6, 1))
+
+    def test_get_accounts(self):
+        self.assertEqual(self.db.get_accounts([1, 2, 999]), {1: self.account1, 2: self.account2})
+
+    def test_add_transactions_and_existing_ids(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        self.db.add_transactions([t1, t2])
+        self.assertEqual(self.db.list_transactions(), [t1, t2])
+        self.assertEqual(self.db.get_existing_transaction_ids([1, 2, 3]), {1, 2})
+
+    def test_add_transactions_merges_into_time_order(self):
+        make = lambda i, day: Transaction(id=i, timestamp=datetime(2024, 1, day), entries=(TransactionEntry(account_id=1, value=i), TransactionEntry(account_id=2, value=i)))
+        self.db.add_transactions([make(1, 2), make(2, 4)])
+        # Older than, between and after what is stored, and out of order within the batch
+        with mock.patch.object(self.db, "time_order_lock", wraps=self.db.time_order_lock) as time_order_lock:
+            self.db.add_transactions([make(5, 5), make(3, 1), make(4, 3)])
+        self.assertEqual(time_order_lock.__enter__.call_count, 1)
+        self.assertEqual([transaction.id for transaction in self.db.list_transactions()], [3, 1, 4, 2, 5])
+        self.assertEqual(self.db.get_latest_timestamp(), datetime(2024, 1, 5))
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2024, 1, 3)), {1: 8, 2: 8})
+        self.db.add_transactions([])
+        self.assertEqual(len(self.db.list_transactions()), 5)
+
+    def test_iterate_during_concurrent_inserts(self):
+        transactions = [
+            Transaction(id=i, timestamp=datetime(2024, 1, 1) + timedelta(seconds=i), entries=(TransactionEntry(account_id=1, value=1), TransactionEntry(account_id=2, value=1)))
+            for i in range(5000)
+        ]
+        for transaction in transactions[::2]:
+            self.db.add_transaction(transaction)
+        writer = threading.Thread(target=lambda: [self.db.add_transaction(transaction) for transaction in transactions[1::2]])
+        with mock.patch("database.database.ITERATION_CHUNK_SIZE", 16):
+            writer.start()
+            seen = [(transaction.timestamp, transaction.id) for transaction in self.db.iter_transactions()]
+            writer.join()
+        # Whatever the interleaving, the iteration never repeats or reorders transactions
+        self.assertEqual(seen, sorted(set(seen)))
+        self.assertEqual(self.db.get_balances([1], datetime(2025, 1, 1)), {1: 5000})
+
+    def test_get_account_history(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=-4), TransactionEntry(account_id=2, value=-4)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 1, 15), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=1, value=-5)))
+        self.db.add_transactions([t1, t2, t3])
+        expected = [
+            Posting(transaction_id=1, timestamp=datetime(2024, 1, 1), value=10),
+            Posting(transaction_id=3, timestamp=datetime(2024, 1, 15), value=5),
+            Posting(transaction_id=3, timestamp=datetime(2024, 1, 15), value=-5),
+            Posting(transaction_id=2, timestamp=datetime(2024, 2, 1), value=-4),
+        ]
+        self.assertEqual(self.db.get_account_history(1), expected)
+        self.assertEqual(self.db.get_account_history(1, datetime(2024, 1, 15), datetime(2024, 1, 31)), expected[1:3])
+        self.assertEqual(self.db.get_account_history(999), [])
+        # The default built on iter_transactions agrees with the posting index
+        self.assertEqual(AbstractDatabase.get_account_history(self.db, 1), expected)
+        self.assertEqual(AbstractDatabase.get_account_history(self.db, 1, datetime(2024, 1, 15), datetime(2024, 1, 31)), expected[1:3])
+
 if __name__ == "__main__":
     unittest.main()
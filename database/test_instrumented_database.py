@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime
+
+from metrics import registry as metrics
+from metrics.registry import MetricsRegistry
+from models.account import Account
+from models.transaction import Transaction, TransactionEntry
+from database.database import InMemoryDatabase
+from database.delegating_database import DelegatingDatabase
+from database.instrumented_database import InstrumentedDatabase
+
+class TestInstrumentedDatabase(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.enable(MetricsRegistry())
+        self.db = InstrumentedDatabase(InMemoryDatabase())
+        self.db.add_account(Account(id=1, name="Cash", type="debit"))
+        self.db.add_account(Account(id=2, name="Equity", type="credit"))
+        self.transaction = Transaction(
+            id=1,
+            timestamp=datetime(2024, 1, 1),
+            entries=(TransactionEntry(account_id=1, value=50), TransactionEntry(account_id=2, value=50)))
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_delegates_to_backend(self):
+        self.db.add_transaction(self.transaction)
+        self.assertEqual(self.db.get_transaction(1), self.transaction)
+        self.assertEqual(self.db.get_account_by_name("Cash").id, 1)
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2024, 1, 1)), {1: 50, 2: 50})
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1])), [self.transaction])
+        self.assertEqual(self.db.get_latest_timestamp(), datetime(2024, 1, 1))
+
+    def test_records_operations(self):
+        self.db.add_transactions([self.transaction])
+        self.db.get_balances([1, 2], datetime(2024, 1, 1))
+        list(self.db.iter_transactions())
+        self.assertEqual(self.registry.histograms["database.add_account"].count, 2)
+        self.assertEqual(self.registry.histograms["database.add_transactions"].count, 1)
+        self.assertEqual(self.registry.histograms["database.get_balances"].count, 1)
+        self.assertEqual(self.registry.histograms["database.iter_transactions"].count, 1)
+
+    def test_every_operation_is_instrumented(self):
+        operations = {name for name in vars(DelegatingDatabase) if not name.startswith("_")}
+        self.assertEqual(operations - set(vars(InstrumentedDatabase)), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Transaction, TransactionEntry
+from database.journal import JournaledDatabase
+
+def make_transaction(transaction_id: int) -> Transaction:
+    return Transaction(
+        id=transaction_id,
+        timestamp=datetime(2024, 1, 1 + transaction_id % 28),
+        entries=(TransactionEntry(account_id=1, value=transaction_id), TransactionEntry(account_id=2, value=transaction_id)))
+
+class TestJournaledDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.db = self.open()
+        self.db.add_account(Account(id=1, name="Cash", type="debit"))
+        self.db.add_account(Account(id=2, name="Equity", type="credit"))
+
+    def tearDown(self):
+        self.db.close(snapshot=False)
+        self.directory.cleanup()
+
+    def open(self, **kwargs) -> JournaledDatabase:
+        return JournaledDatabase(self.path, **kwargs)
+
+    def reopen(self, **kwargs) -> JournaledDatabase:
+        self.db.close(snapshot=False)
+        self.db = self.open(**kwargs)
+        return self.db
+
+    def test_replays_journal(self):
+        self.db.add_transaction(make_transaction(1))
+        self.db.add_transactions([make_transaction(2), make_transaction(3)])
+        expected = self.db.list_transactions()
+        db = self.reopen()
+        self.assertEqual(db.list_transactions(), expected)
+        self.assertEqual(db.get_account_by_name("Equity").id, 2)
+        self.assertEqual(db.get_balances([1], datetime(2024, 12, 31)), {1: 6})
+
+    def test_snapshot_bounds_replay(self):
+        db = self.reopen(snapshot_interval=10)
+        db.add_transactions([make_transaction(i) for i in range(1, 11)])
+        db.add_transaction(make_transaction(11))
+        # The snapshot replaced the first journal, only the last transaction is left to replay
+        self.assertEqual(sorted(os.listdir(self.path)), ["journal-00000001.log", "snapshot-00000001.bin"])
+        expected = db.list_transactions()
+        db = self.reopen()
+        self.assertEqual(db.list_transactions(), expected)
+        self.assertEqual(len(db.list_accounts()), 2)
+
+    def test_close_takes_snapshot(self):
+        self.db.add_transaction(make_transaction(1))
+        self.db.close()
+        self.assertIn("snapshot-00000001.bin", os.listdir(self.path))
+        self.db = self.open()
+        self.assertEqual(self.db.list_transactions(), [make_transaction(1)])
+
+    def test_torn_tail_is_discarded(self):
+        self.db.add_transaction(make_transaction(1))
+        self.db.add_transaction(make_transaction(2))
+        self.db.close(snapshot=False)
+        journal = os.path.join(self.path, "journal-00000000.log")
+        os.truncate(journal, os.path.getsize(journal) - 3)
+        self.db = self.open()
+        self.assertEqual(self.db.list_transactions(), [make_transaction(1)])
+        # Appends continue after the last complete record
+        self.db.add_transaction(make_transaction(3))
+        db = self.reopen()
+        self.assertEqual([transaction.id for transaction in db.list_transactions()], [1, 3])
+
+    def test_interrupted_snapshot_falls_back_to_journal(self):
+        self.db.add_transaction(make_transaction(1))
+        self.db.close(snapshot=False)
+        with open(os.path.join(self.path, "snapshot-00000001.bin.tmp"), "wb") as file:
+            file.write(b"partial")
+        self.db = self.open()
+        self.assertEqual(self.db.list_transactions(), [make_transaction(1)])
+        self.assertNotIn("snapshot-00000001.bin.tmp", os.listdir(self.path))
+
+    def test_concurrent_writers(self):
+        db = self.reopen(snapshot_interval=50)
+        def write(first):
+            for transaction_id in range(first, first + 40):
+                db.add_transaction(make_transaction(transaction_id))
+        threads = [threading.Thread(target=write, args=(first,)) for first in (1, 101, 201, 301)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(db.list_transactions()), 160)
+        db = self.reopen()
+        self.assertEqual(len(db.list_transactions()), 160)
+
+    def test_period_closes_are_journaled(self):
+        period_close = PeriodClose(timestamp=datetime(2024, 1, 31), balances={1: 10, 2: 10})
+        self.db.add_period_close(period_close)
+        db = self.reopen()
+        self.assertEqual(db.list_period_closes(), [period_close])
+        db.snapshot()
+        db = self.reopen()
+        self.assertEqual(db.list_period_closes(), [period_close])
+
+if __name__ == "__main__":
+    unittest.main()
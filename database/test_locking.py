@@ -0,0 +1,47 @@
+import threading
+import unittest
+
+from database.locking import StripedLock
+
+class TestStripedLock(unittest.TestCase):
+
+    def test_same_key_excludes(self):
+        locks = StripedLock(stripes=4)
+        with locks.acquire([1]):
+            self.assertTrue(locks.locks[1].locked())
+            self.assertFalse(locks.locks[1].acquire(blocking=False))
+        self.assertFalse(locks.locks[1].locked())
+
+    def test_keys_sharing_a_stripe_acquire_it_once(self):
+        locks = StripedLock(stripes=4)
+        with locks.acquire([1, 5, 2]):
+            self.assertEqual([lock.locked() for lock in locks.locks], [False, True, True, False])
+
+    def test_released_on_error(self):
+        locks = StripedLock(stripes=4)
+        with self.assertRaises(ValueError):
+            with locks.acquire([0, 3]):
+                raise ValueError()
+        self.assertFalse(any(lock.locked() for lock in locks.locks))
+
+    def test_overlapping_key_sets_do_not_deadlock(self):
+        locks = StripedLock(stripes=8)
+        counter = [0]
+        def work(keys):
+            for _ in range(2000):
+                with locks.acquire(keys):
+                    counter[0] += 1
+        threads = [threading.Thread(target=work, args=(keys,)) for keys in ([1, 2, 3], [3, 2, 1], [2, 7], [7, 1])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertEqual(counter[0], 8000)
+
+    def test_acquire_all(self):
+        locks = StripedLock(stripes=4)
+        with locks.acquire_all():
+            self.assertTrue(all(lock.locked() for lock in locks.locks))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Transaction, TransactionEntry
+from database import mapped_database, vectorized
+from database.database import InMemoryDatabase
+from database.mapped_database import MappedDatabase, INDEX_HEADER, INDEX_RECORD, POSTINGS_HEADER, POSTING_RECORD
+
+def transaction(transaction_id: int, day: int, *entries: tuple[int, int]) -> Transaction:
+    return Transaction(
+        id=transaction_id,
+        timestamp=datetime(2024, 1, 1) + timedelta(days=day),
+        entries=tuple(TransactionEntry(account_id, value) for account_id, value in entries))
+
+TRANSACTIONS = [
+    transaction(1, 0, (1, 100), (2, 100)),
+    transaction(2, 3, (1, -30), (3, 30)),
+    transaction(3, 5, (2, 7), (3, -7)),
+]
+
+# Out of both id and timestamp order
+UNORDERED = [
+    transaction(5, 4, (1, 10), (2, 10)),
+    transaction(2, 1, (1, -3), (3, 3)),
+    transaction(9, 4, (2, 1), (3, -1)),
+    transaction(4, 0, (1, 8), (3, 8)),
+]
+
+class TestMappedDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.db = self.open()
+
+    def open(self) -> MappedDatabase:
+        db = MappedDatabase(self.directory.name)
+        self.addCleanup(db.close)
+        return db
+
+    def reopen(self) -> MappedDatabase:
+        self.db.close()
+        self.db = self.open()
+        return self.db
+
+    def populate(self, db, transactions: list[Transaction]) -> None:
+        for account_id, name in ((1, "Cash"), (2, "Equity"), (3, "Sales")):
+            db.add_account(Account(id=account_id, name=name, type="debit"))
+        db.add_transactions(transactions)
+
+    def assert_matches_memory(self, transactions: list[Transaction]) -> None:
+        reference = InMemoryDatabase()
+        self.populate(reference, transactions)
+        cutoffs = [datetime(2024, 1, 1) + timedelta(days=day) for day in range(-1, 7)]
+        self.assertEqual(self.db.list_transactions(), reference.list_transactions())
+        self.assertEqual(self.db.get_latest_timestamp(), reference.get_latest_timestamp())
+        for cutoff in cutoffs:
+            self.assertEqual(self.db.get_balances([1, 2, 3, 4], cutoff), reference.get_balances([1, 2, 3, 4], cutoff))
+            if cutoff >= cutoffs[1]:
+                self.assertEqual(
+                    self.db.get_balance_changes([1, 2, 3], cutoffs[1], cutoff),
+                    reference.get_balance_changes([1, 2, 3], cutoffs[1], cutoff))
+            self.assertEqual(
+                list(self.db.iter_transactions(start=cutoffs[2], end=cutoff, account_ids=[3])),
+                list(reference.iter_transactions(start=cutoffs[2], end=cutoff, account_ids=[3])))
+        for account_id in (1, 2, 3, 4):
+            self.assertEqual(self.db.get_account_history(account_id), reference.get_account_history(account_id))
+            self.assertEqual(
+                self.db.get_account_history(account_id, cutoffs[2], cutoffs[5]),
+                reference.get_account_history(account_id, cutoffs[2], cutoffs[5]))
+        for transaction in transactions:
+            self.assertEqual(self.db.get_transaction(transaction.id), transaction)
+            self.assertEqual(
+                list(self.db.iter_transactions(after=(transaction.timestamp, transaction.id))),
+                list(reference.iter_transactions(after=(transaction.timestamp, transaction.id))))
+        self.assertIsNone(self.db.get_transaction(7))
+        self.assertEqual(self.db.get_existing_transaction_ids([1, 2, 7]), {1, 2} & {t.id for t in transactions})
+
+    def test_matches_in_memory_database(self):
+        self.populate(self.db, TRANSACTIONS)
+        self.assertTrue(self.db.time_ordered and self.db.id_ordered)
+        self.assert_matches_memory(TRANSACTIONS)
+
+    def test_matches_in_memory_database_out_of_order(self):
+        self.populate(self.db, UNORDERED[:2])
+        for transaction in UNORDERED[2:]:
+            self.db.add_transaction(transaction)
+        self.assertFalse(self.db.time_ordered or self.db.id_ordered)
+        self.assert_matches_memory(UNORDERED)
+
+    def test_matches_in_memory_database_without_numpy(self):
+        with mock.patch.object(mapped_database, "numpy", None), mock.patch.object(vectorized, "numpy", None):
+            self.populate(self.db, UNORDERED)
+            self.assert_matches_memory(UNORDERED)
+
+    def test_reopens_without_replay(self):
+        self.populate(self.db, UNORDERED)
+        self.db.add_period_close(PeriodClose(timestamp=datetime(2024, 1, 3), balances={1: 5}))
+        self.reopen()
+        self.assertEqual([account.name for account in self.db.list_accounts()], ["Cash", "Equity", "Sales"])
+        self.assertEqual(self.db.get_account_by_name("Sales").id, 3)
+        self.assertEqual(self.db.list_period_closes()[0].balances, {1: 5})
+        self.assertFalse(self.db.time_ordered or self.db.id_ordered)
+        # Nothing is indexed until it is first needed
+        self.assertIsNone(self.db.rows_by_id)
+        self.assertIsNone(self.db.posting_rows_by_account)
+        self.assert_matches_memory(UNORDERED)
+        # Appends after a reopen keep the lazily built indexes up to date
+        self.db.add_transaction(transaction(11, 6, (1, 1), (3, 1)))
+        self.assertEqual(self.db.get_transaction(11).entries[0].value, 1)
+        self.assertEqual(self.db.get_account_history(3)[-1].transaction_id, 11)
+        self.assert_matches_memory(UNORDERED + [transaction(11, 6, (1, 1), (3, 1))])
+
+    def test_grows_files_while_views_are_held(self):
+        with mock.patch.object(mapped_database, "INITIAL_CAPACITY", 64):
+            self.reopen()
+            self.populate(self.db, TRANSACTIONS[:1])
+            held = self.db._posting_columns()
+            for transaction in TRANSACTIONS[1:]:
+                self.db.add_transaction(transaction)
+        self.assertEqual(len(held[0]), 2)
+        self.assertEqual(self.db.get_balances([3], datetime.max), {3: 23})
+        self.assertGreater(os.path.getsize(os.path.join(self.directory.name, "postings.seg")), 64)
+        self.reopen()
+        self.assert_matches_memory(TRANSACTIONS)
+
+    def test_uncounted_records_are_ignored_and_overwritten(self):
+        self.populate(self.db, TRANSACTIONS[:2])
+        # A crash after writing records but before the header counting them
+        with open(os.path.join(self.directory.name, "postings.seg"), "r+b") as file:
+            file.seek(POSTINGS_HEADER.size + 4 * POSTING_RECORD.size)
+            file.write(POSTING_RECORD.pack(8, 0, 1, 999) * 2)
+        with open(os.path.join(self.directory.name, "transactions.idx"), "r+b") as file:
+            file.seek(INDEX_HEADER.size + 2 * INDEX_RECORD.size)
+            file.write(INDEX_RECORD.pack(8, 0, 4))
+        with open(os.path.join(self.directory.name, "catalog.log"), "ab") as file:
+            file.write(b"\x10\x00")
+        self.reopen()
+        self.assertIsNone(self.db.get_transaction(8))
+        self.assertEqual(self.db.get_balances([1], datetime.max), {1: 70})
+        self.db.add_account(Account(id=4, name="Bank", type="debit"))
+        self.db.add_transaction(TRANSACTIONS[2])
+        self.reopen()
+        self.assertEqual(self.db.get_account(4).name, "Bank")
+        self.assert_matches_memory(TRANSACTIONS)
+
+    def test_rejects_other_files(self):
+        self.db.close()
+        with open(os.path.join(self.directory.name, "transactions.idx"), "r+b") as file:
+            file.write(b"NOTLEDGR")
+        with self.assertRaisesRegex(ValueError, "not a ledger transactions.idx file"):
+            MappedDatabase(self.directory.name)
+
+if __name__ == "__main__":
+    unittest.main()
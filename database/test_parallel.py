@@ -0,0 +1,52 @@
+import random
+import unittest
+from array import array
+from unittest import mock
+
+from database.parallel import ParallelAggregator
+from database.vectorized import sum_balances
+
+class TestParallelAggregator(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.rows = 5000
+        self.account_ids = array("q", (rng.randint(1, 50) for _ in range(self.rows)))
+        self.values = array("q", (rng.randint(-10**12, 10**12) for _ in range(self.rows)))
+        self.timestamps = array("q", sorted(rng.randint(0, 10**9) for _ in range(self.rows)))
+        self.aggregator = ParallelAggregator(workers=3)
+        self.addCleanup(self.aggregator.close)
+        patcher = mock.patch("database.parallel.PARALLEL_MIN_POSTINGS", 100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matches_sequential_sums(self):
+        wanted = list(range(0, 52))
+        for time_ordered in (True, False):
+            for cutoff in (-1, 10**8, 10**9):
+                self.assertEqual(
+                    self.aggregator.sum_balances(self.account_ids, self.values, self.timestamps, cutoff, wanted, time_ordered),
+                    sum_balances(self.account_ids, self.values, self.timestamps, cutoff, wanted, time_ordered))
+
+    def test_appended_rows_are_shared(self):
+        wanted = [1, 2, 3]
+        self.aggregator.sum_balances(self.account_ids, self.values, self.timestamps, 10**9, wanted)
+        for _ in range(3000):
+            self.account_ids.append(1)
+            self.values.append(5)
+            self.timestamps.append(10**9)
+        expected = sum_balances(self.account_ids, self.values, self.timestamps, 10**9, wanted)
+        self.assertEqual(self.aggregator.sum_balances(self.account_ids, self.values, self.timestamps, 10**9, wanted), expected)
+        self.assertEqual(self.aggregator.shared_rows, 8000)
+
+    def test_small_inputs_stay_in_process(self):
+        aggregator = ParallelAggregator(workers=4)
+        with mock.patch("database.parallel.PARALLEL_MIN_POSTINGS", 10**6):
+            aggregator.sum_balances(self.account_ids, self.values, self.timestamps, 10**9, [1])
+        self.assertIsNone(aggregator.pool)
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            ParallelAggregator(workers=0)
+
+if __name__ == "__main__":
+    unittest.main()
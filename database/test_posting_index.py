@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta
+from models.transaction import Posting, Transaction, TransactionEntry
+from database.posting_index import AccountPostings, PostingIndex, CHECKPOINT_INTERVAL
+
+class TestAccountPostings(unittest.TestCase):
+    def setUp(self):
+        self.postings = AccountPostings()
+        self.start = datetime(2024, 1, 1)
+
+    def test_empty_balance(self):
+        self.assertEqual(self.postings.balance_at(self.start), 0)
+
+    def test_postings_kept_in_time_order(self):
+        self.postings.add(self.start + timedelta(days=2), 1, 10)
+        self.postings.add(self.start, 2, 20)
+        self.postings.add(self.start + timedelta(days=1), 3, 30)
+        self.assertEqual(self.postings.transaction_ids, [2, 3, 1])
+        self.assertEqual(self.postings.values, [20, 30, 10])
+
+    def test_equal_timestamps_ordered_by_transaction_id(self):
+        self.postings.add(self.start, 5, 1)
+        self.postings.add(self.start, 3, 1)
+        self.postings.add(self.start, 4, 1)
+        self.assertEqual(self.postings.transaction_ids, [3, 4, 5])
+
+    def test_balance_at_across_checkpoints(self):
+        count = CHECKPOINT_INTERVAL * 3 + 5
+        for i in range(count):
+            self.postings.add(self.start + timedelta(hours=i), i, i)
+        for i in (0, CHECKPOINT_INTERVAL - 1, CHECKPOINT_INTERVAL, count - 1):
+            self.assertEqual(self.postings.balance_at(self.start + timedelta(hours=i)), sum(range(i + 1)))
+        self.assertEqual(self.postings.balance_at(self.start - timedelta(hours=1)), 0)
+
+    def test_back_dated_posting_invalidates_checkpoints(self):
+        count = CHECKPOINT_INTERVAL * 2
+        for i in range(count):
+            self.postings.add(self.start + timedelta(hours=i), i, 1)
+        end = self.start + timedelta(hours=count)
+        self.assertEqual(self.postings.balance_at(end), count)
+        self.postings.add(self.start - timedelta(hours=1), count, 100)
+        self.assertEqual(self.postings.balance_at(end), count + 100)
+        self.assertEqual(self.postings.balance_at(self.start - timedelta(hours=1)), 100)
+
+    def test_history(self):
+        self.postings.add(self.start + timedelta(days=2), 1, 10)
+        self.postings.add(self.start, 2, -20)
+        self.postings.add(self.start + timedelta(days=1), 3, 30)
+        self.assertEqual(self.postings.history(), [
+            Posting(transaction_id=2, timestamp=self.start, value=-20),
+            Posting(transaction_id=3, timestamp=self.start + timedelta(days=1), value=30),
+            Posting(transaction_id=1, timestamp=self.start + timedelta(days=2), value=10),
+        ])
+        self.assertEqual([posting.transaction_id for posting in self.postings.history(self.start + timedelta(days=1), self.start + timedelta(days=1))], [3])
+
+
+class TestPostingIndex(unittest.TestCase):
+    def test_get_balances(self):
+        index = PostingIndex()
+        index.add_transaction(Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(
+            TransactionEntry(account_id=1, value=100),
+            TransactionEntry(account_id=2, value=100),
+        )))
+        index.add_transaction(Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(
+            TransactionEntry(account_id=1, value=50),
+            TransactionEntry(account_id=3, value=-50),
+        )))
+        self.assertEqual(index.get_balances([1, 2, 3, 4], datetime(2024, 1, 15)), {1: 100, 2: 100, 3: 0, 4: 0})
+        self.assertEqual(index.get_balances([1, 3], datetime(2024, 2, 1)), {1: 150, 3: -50})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from datetime import datetime, timezone
+
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Transaction, TransactionEntry
+from database.record_codec import encode_account, encode_transaction, encode_period_close, decode_record
+
+class TestRecordCodec(unittest.TestCase):
+
+    def test_account_round_trip(self):
+        account = Account(id=7, name="Caixa €", type="debit", description="petty cash")
+        self.assertEqual(decode_record(encode_account(account)), account)
+
+    def test_transaction_round_trip(self):
+        transaction = Transaction(
+            id=2**40,
+            timestamp=datetime(2024, 2, 29, 12, 30, 0, 123456),
+            entries=(TransactionEntry(account_id=1, value=-2**62), TransactionEntry(account_id=2, value=2**62)))
+        self.assertEqual(decode_record(encode_transaction(transaction)), transaction)
+
+    def test_aware_timestamp_is_stored_as_utc(self):
+        transaction = Transaction(id=1, timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc), entries=())
+        self.assertEqual(decode_record(encode_transaction(transaction)).timestamp, datetime(2024, 1, 1))
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            decode_record(b"X")
+
+    def test_period_close_round_trip(self):
+        period_close = PeriodClose(timestamp=datetime(2024, 1, 31, 23, 59), balances={1: 2**62, 2: -2**62, 3: 0})
+        self.assertEqual(decode_record(encode_period_close(period_close)), period_close)
+
+if __name__ == "__main__":
+    unittest.main()
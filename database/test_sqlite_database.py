@@ -0,0 +1,181 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from models.account import Account
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionEntry
+from database.sqlite_database import SqliteDatabase
+from database.transaction_dao import TransactionDao
+
+class TestSqliteDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = SqliteDatabase()
+        self.account1 = Account(id=1, name="Cash", type="debit", description="money in my pocket")
+        self.account2 = Account(id=2, name="Equity", type="credit")
+        self.db.add_account(self.account1)
+        self.db.add_account(self.account2)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_add_and_get_account(self):
+        self.assertEqual(self.db.get_account(1), self.account1)
+        self.assertIsNone(self.db.get_account(999))
+
+    def test_get_account_by_name(self):
+        self.assertEqual(self.db.get_account_by_name("Equity"), self.account2)
+        self.assertIsNone(self.db.get_account_by_name("NonExistent"))
+
+    def test_list_accounts(self):
+        self.assertEqual(self.db.list_accounts(), [self.account1, self.account2])
+
+    def test_get_transaction(self):
+        transaction = Transaction(id=2, timestamp=datetime(2024, 1, 1, 12, 30, 15, 250), entries=(
+            TransactionEntry(account_id=2, value=-50),
+            TransactionEntry(account_id=1, value=50),
+        ))
+        self.db.add_transaction(transaction)
+        self.assertEqual(self.db.get_transaction(2), transaction)
+        self.assertIsNone(self.db.get_transaction(999))
+
+    def test_transaction_without_entries(self):
+        empty = Transaction(id=3, timestamp=datetime(2024, 2, 1), entries=())
+        other = Transaction(id=4, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=2, value=5)))
+        self.db.add_transactions([empty, other])
+        self.assertEqual(self.db.get_transaction(3), empty)
+        self.assertEqual(self.db.list_transactions(), [empty, other])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1])), [other])
+        # So the DAO's duplicate check sees it, rather than the insert failing on the primary key
+        with self.assertRaisesRegex(ValueError, "A Transaction with ID 3 already exists"):
+            TransactionDao(self.db).add_transaction(empty)
+
+    def test_list_transactions_empty(self):
+        self.assertEqual(self.db.list_transactions(), [])
+
+    def test_list_transactions_in_timestamp_order(self):
+        late = Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        early = Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        for transaction in (late, early):
+            self.db.add_transaction(transaction)
+        self.assertEqual(self.db.list_transactions(), [early, late])
+
+    def test_get_balances(self):
+        self.db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10))))
+        self.db.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20))))
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2023, 12, 31)), {1: 0, 2: 0})
+        self.assertEqual(self.db.get_balances([1, 2], datetime(2024, 3, 1)), {1: 20, 2: 20})
+        self.assertEqual(self.db.get_balances([1, 3], datetime(2024, 6, 1)), {1: 30, 3: 0})
+
+    def test_get_balances_many_accounts(self):
+        for account_id in range(3, 1003):
+            self.db.add_account(Account(id=account_id, name=f"Account {account_id}", type="debit"))
+        self.db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=1000, value=-10))))
+        balances = self.db.get_balances(list(range(1, 1003)), datetime(2024, 1, 1))
+        self.assertEqual(len(balances), 1002)
+        self.assertEqual(balances[1], 10)
+        self.assertEqual(balances[1000], -10)
+        self.assertEqual(balances[2], 0)
+
+    def test_iter_transactions_window(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=2, value=30)))
+        for transaction in (t3, t1, t2):
+            self.db.add_transaction(transaction)
+        self.assertEqual(list(self.db.iter_transactions()), [t1, t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(start=datetime(2024, 2, 1))), [t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 2, 1))), [t1, t2])
+        self.assertEqual(list(self.db.iter_transactions(datetime(2024, 1, 15), datetime(2024, 2, 15))), [t2])
+
+    def test_iter_transactions_by_account_and_cursor(self):
+        if self.db.get_account(3) is None:
+            self.db.add_account(Account(id=3, name="Bank", type="debit"))
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=3, value=20), TransactionEntry(account_id=2, value=20)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=30), TransactionEntry(account_id=3, value=-30)))
+        t4 = Transaction(id=4, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=1, value=-5)))
+        for transaction in (t4, t3, t2, t1):
+            self.db.add_transaction(transaction)
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1])), [t1, t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1, 3])), [t1, t2, t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 2, 1), account_ids=[3])), [t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(after=(datetime(2024, 2, 1), 2))), [t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[1, 3], after=(datetime(2024, 2, 1), 2))), [t3, t4])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=[999])), [])
+
+    def test_iter_transactions_by_many_accounts(self):
+        for account_id in range(3, 1003):
+            self.db.add_account(Account(id=account_id, name=f"Account {account_id}", type="debit"))
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1000, value=5), TransactionEntry(account_id=2, value=5)))
+        t3 = Transaction(id=3, timestamp=datetime(2024, 3, 1), entries=(TransactionEntry(account_id=999, value=5), TransactionEntry(account_id=1001, value=-5)))
+        self.db.add_transactions([t1, t2, t3])
+        # More ids than can be bound in one statement
+        account_ids = list(range(3, 1001))
+        self.assertEqual(list(self.db.iter_transactions(account_ids=account_ids)), [t2, t3])
+        self.assertEqual(list(self.db.iter_transactions(end=datetime(2024, 2, 1), account_ids=account_ids)), [t2])
+        self.assertEqual(list(self.db.iter_transactions(account_ids=account_ids, after=(datetime(2024, 2, 1), 2))), [t3])
+
+    def test_get_latest_timestamp(self):
+        self.assertIsNone(self.db.get_latest_timestamp())
+        self.db.add_transaction(Transaction(id=1, timestamp=datetime(2024, 6, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10))))
+        self.db.add_transaction(Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20))))
+        self.assertEqual(self.db.get_latest_timestamp(), datetime(2024, 6, 1))
+
+    def test_get_accounts(self):
+        self.assertEqual(self.db.get_accounts([1, 2, 999]), {1: self.account1, 2: self.account2})
+
+    def test_add_transactions_and_existing_ids(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        self.db.add_transactions([t2, t1])
+        self.assertEqual(self.db.list_transactions(), [t1, t2])
+        self.assertEqual(self.db.get_existing_transaction_ids([1, 2, 3]), {1, 2})
+
+    def test_data_persists_between_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ledger.db")
+            db = SqliteDatabase(path)
+            db.add_account(self.account1)
+            db.add_account(self.account2)
+            transaction = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+            db.add_transaction(transaction)
+            db.close()
+            reopened = SqliteDatabase(path)
+            self.assertEqual(reopened.list_accounts(), [self.account1, self.account2])
+            self.assertEqual(reopened.get_transaction(1), transaction)
+            reopened.close()
+
+    def test_period_closes_persist_between_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ledger.db")
+            db = SqliteDatabase(path)
+            period_close = PeriodClose(timestamp=datetime(2024, 1, 31), balances={1: 10, 2: -10})
+            db.add_period_close(period_close)
+            db.close()
+            reopened = SqliteDatabase(path)
+            self.assertEqual(reopened.list_period_closes(), [period_close])
+            reopened.close()
+
+    def test_get_balance_changes(self):
+        self.db.add_transactions([
+            Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10))),
+            Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=5), TransactionEntry(account_id=2, value=5))),
+        ])
+        self.assertEqual(self.db.get_balance_changes([1, 2], datetime(2024, 1, 1), datetime(2024, 2, 1)), {1: 5, 2: 5})
+        self.assertEqual(self.db.get_balance_changes([1], datetime(2024, 2, 1), datetime(2024, 3, 1)), {1: 0})
+
+    def test_get_account_history(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=-4), TransactionEntry(account_id=2, value=-4)))
+        self.db.add_transactions([t1, t2])
+        self.assertEqual(self.db.get_account_history(1), [
+            Posting(transaction_id=2, timestamp=datetime(2024, 1, 1), value=-4),
+            Posting(transaction_id=1, timestamp=datetime(2024, 1, 2), value=10),
+        ])
+        self.assertEqual(self.db.get_account_history(2, start=datetime(2024, 1, 2)), [Posting(transaction_id=1, timestamp=datetime(2024, 1, 2), value=10)])
+        self.assertEqual(self.db.get_account_history(2, end=datetime(2023, 12, 31)), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from datetime import datetime, timezone, timedelta
+from database.timestamps import to_epoch_micros, from_epoch_micros
+
+class TestTimestamps(unittest.TestCase):
+    def test_round_trip(self):
+        for timestamp in (datetime(1970, 1, 1), datetime(2024, 2, 29, 23, 59, 59, 999999), datetime(1900, 6, 1)):
+            self.assertEqual(from_epoch_micros(to_epoch_micros(timestamp)), timestamp)
+
+    def test_epoch_micros(self):
+        self.assertEqual(to_epoch_micros(datetime(1970, 1, 1, 0, 0, 1)), 1_000_000)
+
+    def test_aware_timestamp_normalised_to_utc(self):
+        aware = datetime(2024, 1, 1, 2, 0, tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(to_epoch_micros(aware), to_epoch_micros(datetime(2024, 1, 1)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -121,5 +121,63 @@ class TestTransactionDao(unittest.TestCase):
         result = list(self.dao.list_transactions())
         self.assertEqual(set(result), {t1, t2})
 
+    def test_add_transactions_success(self):
+        t1 = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        t2 = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=3, value=50), TransactionEntry(account_id=4, value=50)))
+        result = self.dao.add_transactions([t1, t2])
+        self.assertEqual(result.added, (t1, t2))
+        self.assertEqual(result.rejected, ())
+        self.assertEqual(self.db.list_transactions(), [t1, t2])
+
+    def test_add_transactions_atomic_rejects_whole_batch(self):
+        valid = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        unbalanced = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=50)))
+        with self.assertRaises(ValueError) as context:
+            self.dao.add_transactions([valid, unbalanced])
+        self.assertIn("Transaction 2", str(context.exception))
+        self.assertEqual(self.db.list_transactions(), [])
+
+    def test_add_transactions_reports_rejected_items(self):
+        existing = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        self.dao.add_transaction(existing)
+        valid = Transaction(id=2, timestamp=datetime(2024, 1, 2), entries=(TransactionEntry(account_id=1, value=10), TransactionEntry(account_id=2, value=10)))
+        duplicate_in_batch = Transaction(id=2, timestamp=datetime(2024, 1, 3), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=2, value=20)))
+        unknown_account = Transaction(id=3, timestamp=datetime(2024, 1, 3), entries=(TransactionEntry(account_id=1, value=20), TransactionEntry(account_id=999, value=20)))
+        result = self.dao.add_transactions([existing, valid, duplicate_in_batch, unknown_account], atomic=False)
+        self.assertEqual(result.added, (valid,))
+        self.assertEqual([transaction for transaction, _ in result.rejected], [existing, duplicate_in_batch, unknown_account])
+        self.assertIn("already exists", result.rejected[0][1])
+        self.assertIn("999", result.rejected[2][1])
+        self.assertEqual(self.db.list_transactions(), [existing, valid])
+
+    def test_close_period(self):
+        first = Transaction(id=1, timestamp=datetime(2024, 1, 1), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        second = Transaction(id=2, timestamp=datetime(2024, 2, 1), entries=(TransactionEntry(account_id=1, value=-30), TransactionEntry(account_id=3, value=30)))
+        self.dao.add_transactions([first, second])
+        period_close = self.dao.close_period([1, 2, 3], datetime(2024, 1, 31))
+        self.assertEqual(period_close.balances, {1: 100, 2: 100, 3: 0})
+        self.assertEqual(self.dao.list_period_closes(), [period_close])
+        self.assertEqual(self.dao.get_balances([1, 3], datetime(2024, 1, 15)), {1: 100, 3: 0})
+        self.assertEqual(self.dao.get_balances([1, 3], datetime(2024, 2, 1)), {1: 70, 3: 30})
+        # A new dao picks the closes up from the database
+        self.assertEqual(TransactionDao(self.db).closed_through, datetime(2024, 1, 31))
+
+    def test_close_period_rejects_back_dated_transactions(self):
+        self.dao.close_period([1, 2], datetime(2024, 1, 31))
+        back_dated = Transaction(id=1, timestamp=datetime(2024, 1, 31), entries=(TransactionEntry(account_id=1, value=100), TransactionEntry(account_id=2, value=100)))
+        with self.assertRaises(ValueError) as context:
+            self.dao.add_transaction(back_dated)
+        self.assertIn("closed", str(context.exception))
+        result = self.dao.add_transactions([back_dated], atomic=False)
+        self.assertEqual(result.added, ())
+        self.assertEqual(self.db.list_transactions(), [])
+
+    def test_close_period_rejects_closed_periods(self):
+        self.dao.close_period([1, 2], datetime(2024, 1, 31))
+        for timestamp in (datetime(2024, 1, 31), datetime(2024, 1, 1)):
+            with self.assertRaises(ValueError):
+                self.dao.close_period([1, 2], timestamp)
+        self.assertEqual(len(self.dao.list_period_closes()), 1)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from array import array
+from unittest import mock
+
+from database import vectorized
+from database.vectorized import sum_balances
+
+class TestSumBalances(unittest.TestCase):
+    def setUp(self):
+        self.account_ids = array("q", [1, 2, 1, 3, 2, 1])
+        self.values = array("q", [10, 20, 2**62, -5, 7, -2**62])
+        self.timestamps = array("q", [0, 5, 5, 10, 20, 30])
+
+    def check(self):
+        self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, 10, [1, 2, 3, 4], time_ordered=True), {1: 10 + 2**62, 2: 20, 3: -5, 4: 0})
+        self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, 30, [1, 2], time_ordered=True), {1: 10, 2: 27})
+        self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, -1, [1], time_ordered=True), {1: 0})
+        shuffled = [5, 0, 3, 1, 4, 2]
+        account_ids = array("q", [self.account_ids[i] for i in shuffled])
+        values = array("q", [self.values[i] for i in shuffled])
+        timestamps = array("q", [self.timestamps[i] for i in shuffled])
+        self.assertEqual(sum_balances(account_ids, values, timestamps, 10, [1, 2, 3]), {1: 10 + 2**62, 2: 20, 3: -5})
+
+    def test_sum_balances(self):
+        self.check()
+
+    def test_sparse_account_ids(self):
+        self.account_ids[3] = 2**40
+        with mock.patch("database.vectorized.MAX_DENSE_ACCOUNT_RANGE", 4):
+            self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, 10, [1, 2**40], time_ordered=True), {1: 10 + 2**62, 2**40: -5})
+
+    def test_without_numpy(self):
+        with mock.patch.object(vectorized, "numpy", None):
+            self.check()
+
+    def test_start_bound(self):
+        for time_ordered in (True, False):
+            self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, 20, [1, 2, 3], time_ordered, start=5), {1: 0, 2: 7, 3: -5})
+            with mock.patch.object(vectorized, "numpy", None):
+                self.assertEqual(sum_balances(self.account_ids, self.values, self.timestamps, 20, [1, 2, 3], time_ordered, start=5), {1: 0, 2: 7, 3: -5})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,15 @@
+from datetime import datetime, timedelta, timezone
+
+# Timestamps are persisted as integer microseconds since the unix epoch.
+# Naive datetimes are stored as-is, aware datetimes are normalised to naive UTC.
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+def to_epoch_micros(timestamp: datetime) -> int:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - EPOCH) // ONE_MICROSECOND
+
+def from_epoch_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
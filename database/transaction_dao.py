@@ -1,45 +1,156 @@
-from models.account import AccountType
-from models.transaction import Transaction
+from bisect import bisect_right
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+
+from models.account import Account, AccountType
+from models.period_close import PeriodClose
+from models.transaction import Posting, Transaction, TransactionBatchResult, TransactionCursor
 from database.database import AbstractDatabase
+from database.locking import StripedLock
+from metrics import registry as metrics
+from metrics.registry import timed
+
+def check_transaction(transaction: Transaction, known_accounts: dict[int, Account]) -> None:
+    # Raises ValueError unless every entry posts to one of known_accounts and debits equal credits
+    for entry in transaction.entries:
+        if entry.account_id not in known_accounts:
+            raise ValueError(f"Account with ID {entry.account_id} does not exist.")
+
+    debit_total = 0
+    credit_total = 0
+    for entry in transaction.entries:
+        account = known_accounts[entry.account_id]
+        match(account.type):
+            case AccountType.DEBIT:
+                debit_total += entry.value
+            case AccountType.CREDIT:
+                credit_total += entry.value
+            case _:
+                raise ValueError(f"Unknown account type '{account.type}' for account ID {account.id}.")
+
+    if debit_total != credit_total:
+        raise ValueError(f"Transaction is not balanced: debit total {debit_total} != credit total {credit_total}.")
+
+def check_period_open(transaction: Transaction, closed_through: datetime | None) -> None:
+    # Raises ValueError if the transaction is dated in a closed period
+    if closed_through is not None and transaction.timestamp <= closed_through:
+        raise ValueError(f"Transaction is dated {transaction.timestamp.isoformat()}, in the period closed at {closed_through.isoformat()}.")
+
+def screen_transactions(
+        transactions: list[Transaction],
+        existing_ids: set[int],
+        known_accounts: dict[int, Account],
+        atomic: bool,
+        validate: Callable[[Transaction, dict[int, Account]], None] = check_transaction) -> TransactionBatchResult:
+    # Splits a batch into the transactions to add and the rejected ones, without touching storage.
+    # With atomic set, any invalid transaction rejects the batch, otherwise it is reported and skipped.
+    added = []
+    rejected = []
+    batch_ids = set()
+    for transaction in transactions:
+        try:
+            if transaction.id in existing_ids or transaction.id in batch_ids:
+                raise ValueError(f"A Transaction with ID {transaction.id} already exists.")
+            validate(transaction, known_accounts)
+        except ValueError as e:
+            if atomic:
+                raise ValueError(f"Transaction {transaction.id} rejected, no transactions were added: {e}") from e
+            rejected.append((transaction, str(e)))
+            continue
+        batch_ids.add(transaction.id)
+        added.append(transaction)
+    return TransactionBatchResult(added=tuple(added), rejected=tuple(rejected))
 
 class TransactionDao:
     def __init__(self, db: AbstractDatabase):
         self.db = db
+        # Held per transaction id from the duplicate check until the insert, so concurrent
+        # writers of the same id can't both pass the check
+        self.transaction_locks = StripedLock()
+        self.period_closes = self.db.list_period_closes()
 
-    def validate_transaction(self, transaction: Transaction) -> None:
-        accounts_by_id = {}
-        for entry in transaction.entries:
-            if entry.account_id in accounts_by_id:
-                continue
-            account = self.db.get_account(entry.account_id)
-            if account is None:
-                raise ValueError(f"Account with ID {entry.account_id} does not exist.")
-            accounts_by_id[entry.account_id] = account
-
-        debit_total = 0
-        credit_total = 0
-        for entry in transaction.entries:
-            account = accounts_by_id[entry.account_id]
-            match(account.type):
-                case AccountType.DEBIT:
-                    debit_total += entry.value
-                case AccountType.CREDIT:
-                    credit_total += entry.value
-                case _:
-                    raise ValueError(f"Unknown account type '{account.type}' for account ID {account.id}.")
-        
-        if debit_total != credit_total:
-            raise ValueError(f"Transaction is not balanced: debit total {debit_total} != credit total {credit_total}.")
+    @property
+    def closed_through(self) -> datetime | None:
+        # Postings dated at or before this timestamp fall in a closed period
+        return self.period_closes[-1].timestamp if self.period_closes else None
 
+    @timed("transaction_dao.validate_transaction")
+    def validate_transaction(self, transaction: Transaction, known_accounts: dict[int, Account] | None = None) -> None:
+        check_period_open(transaction, self.closed_through)
+        if known_accounts is None:
+            known_accounts = self.db.get_accounts({entry.account_id for entry in transaction.entries})
+        check_transaction(transaction, known_accounts)
 
+    @timed("transaction_dao.add_transaction")
     def add_transaction(self, transaction: Transaction) -> None:
-        if self.db.get_transaction(transaction.id) is not None:
-            raise ValueError(f"A Transaction with ID {transaction.id} already exists.")
-        self.validate_transaction(transaction)
-        self.db.add_transaction(transaction)
+        with self.transaction_locks.acquire([transaction.id]):
+            if self.db.get_transaction(transaction.id) is not None:
+                raise ValueError(f"A Transaction with ID {transaction.id} already exists.")
+            self.validate_transaction(transaction)
+            self.db.add_transaction(transaction)
+
+    @timed("transaction_dao.add_transactions")
+    def add_transactions(self, transactions: Iterable[Transaction], atomic: bool = True) -> TransactionBatchResult:
+        # The whole batch shares one duplicate id lookup, one account lookup and one insert
+        transactions = list(transactions)
+        with self.transaction_locks.acquire(transaction.id for transaction in transactions):
+            return self._add_transactions(transactions, atomic)
 
+    def _add_transactions(self, transactions: list[Transaction], atomic: bool) -> TransactionBatchResult:
+        existing_ids = self.db.get_existing_transaction_ids([transaction.id for transaction in transactions])
+        known_accounts = self.db.get_accounts({entry.account_id for transaction in transactions for entry in transaction.entries})
+        result = screen_transactions(transactions, existing_ids, known_accounts, atomic, self.validate_transaction)
+        if result.added:
+            self.db.add_transactions(list(result.added))
+        metrics.increment("transaction_dao.transactions_added", len(result.added))
+        metrics.increment("transaction_dao.transactions_rejected", len(result.rejected))
+        return result
+
+    @timed("transaction_dao.get_transaction")
     def get_transaction(self, transaction_id: int) -> Transaction | None:
         return self.db.get_transaction(transaction_id)
     
+    @timed("transaction_dao.list_transactions")
     def list_transactions(self) -> list[Transaction]:
         return self.db.list_transactions()
+
+    def get_latest_timestamp(self) -> datetime | None:
+        return self.db.get_latest_timestamp()
+
+    def iter_transactions(
+            self,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            account_ids: Iterable[int] | None = None,
+            after: TransactionCursor | None = None) -> Iterator[Transaction]:
+        return self.db.iter_transactions(start, end, account_ids, after)
+
+    @timed("transaction_dao.get_account_history")
+    def get_account_history(self, account_id: int, start: datetime | None = None, end: datetime | None = None) -> list[Posting]:
+        return self.db.get_account_history(account_id, start, end)
+
+    @timed("transaction_dao.get_balances")
+    def get_balances(self, account_ids: list[int], timestamp: datetime) -> dict[int, int]:
+        # Starts from the closing balances of the latest period closed at or before the timestamp,
+        # so only the postings since that close are summed
+        position = bisect_right(self.period_closes, timestamp, key=lambda period_close: period_close.timestamp)
+        if position == 0:
+            return self.db.get_balances(account_ids, timestamp)
+        period_close = self.period_closes[position - 1]
+        changes = self.db.get_balance_changes(account_ids, period_close.timestamp, timestamp)
+        return {account_id: period_close.balances.get(account_id, 0) + change for account_id, change in changes.items()}
+
+    @timed("transaction_dao.close_period")
+    def close_period(self, account_ids: list[int], timestamp: datetime) -> PeriodClose:
+        # Every transaction id stripe is held so that no posting is being validated or inserted while the balances are taken
+        with self.transaction_locks.acquire_all():
+            closed_through = self.closed_through
+            if closed_through is not None and timestamp <= closed_through:
+                raise ValueError(f"Periods up to {closed_through.isoformat()} are already closed.")
+            period_close = PeriodClose(timestamp=timestamp, balances=self.get_balances(account_ids, timestamp))
+            self.db.add_period_close(period_close)
+            self.period_closes.append(period_close)
+            return period_close
+
+    def list_period_closes(self) -> list[PeriodClose]:
+        return list(self.period_closes)
@@ -0,0 +1,73 @@
+from bisect import bisect_right
+from typing import Sequence
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, aggregation falls back to a python loop without it
+    numpy = None
+
+# Grouped sums over int64 posting columns. The columns may be array('q'), memoryview or any
+# other buffer of native int64 values; with numpy they are wrapped without copying. numpy arrays,
+# e.g. strided views over memory-mapped records, are used as they are.
+
+# Largest account id range summed into a dense array, wider ranges are grouped by sorting
+MAX_DENSE_ACCOUNT_RANGE = 1 << 22
+
+def sum_balances(
+        account_ids: Sequence[int],
+        values: Sequence[int],
+        timestamps: Sequence[int],
+        cutoff: int,
+        wanted_ids: list[int],
+        time_ordered: bool = False,
+        start: int | None = None) -> dict[int, int]:
+    # Sums the values of postings with start < timestamp <= cutoff per account, for each of wanted_ids.
+    # time_ordered tells that timestamps are non-decreasing, so the bounds are binary searches.
+    if numpy is not None:
+        return _sum_balances_numpy(account_ids, values, timestamps, cutoff, wanted_ids, time_ordered, start)
+    balances = {account_id: 0 for account_id in wanted_ids}
+    if time_ordered:
+        first = bisect_right(timestamps, start) if start is not None else 0
+        count = bisect_right(timestamps, cutoff)
+        for account_id, value in zip(account_ids[first:count], values[first:count]):
+            if account_id in balances:
+                balances[account_id] += value
+        return balances
+    for account_id, value, timestamp in zip(account_ids, values, timestamps):
+        if timestamp <= cutoff and (start is None or timestamp > start) and account_id in balances:
+            balances[account_id] += value
+    return balances
+
+def _sum_balances_numpy(account_ids, values, timestamps, cutoff, wanted_ids, time_ordered, start) -> dict[int, int]:
+    balances = {account_id: 0 for account_id in wanted_ids}
+    ids, amounts, times = _as_int64(account_ids), _as_int64(values), _as_int64(timestamps)
+    if time_ordered:
+        first = int(numpy.searchsorted(times, start, side="right")) if start is not None else 0
+        count = int(numpy.searchsorted(times, cutoff, side="right"))
+        ids, amounts = ids[first:count], amounts[first:count]
+    else:
+        included = times <= cutoff
+        if start is not None:
+            included &= times > start
+        ids, amounts = ids[included], amounts[included]
+    if len(ids) == 0:
+        return balances
+    low, high = int(ids.min()), int(ids.max())
+    if high - low < MAX_DENSE_ACCOUNT_RANGE:
+        # numpy.add.at keeps the sums exact in int64, unlike bincount's float64 weights
+        sums = numpy.zeros(high - low + 1, dtype=numpy.int64)
+        numpy.add.at(sums, ids - low, amounts)
+        for account_id in balances:
+            if low <= account_id <= high:
+                balances[account_id] = int(sums[account_id - low])
+        return balances
+    unique_ids, slots = numpy.unique(ids, return_inverse=True)
+    sums = numpy.zeros(len(unique_ids), dtype=numpy.int64)
+    numpy.add.at(sums, slots, amounts)
+    for account_id, balance in zip(unique_ids.tolist(), sums.tolist()):
+        if account_id in balances:
+            balances[account_id] = balance
+    return balances
+
+def _as_int64(column):
+    return column if isinstance(column, numpy.ndarray) else numpy.frombuffer(column, dtype=numpy.int64)
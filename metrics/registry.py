@@ -0,0 +1,190 @@
+import functools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Iterator
+
+# Opt-in operation counters and latency histograms.
+#
+# Instrumented code wraps operations with @timed("<component>.<operation>"). Nothing is recorded
+# until a registry is enabled, so disabled instrumentation costs one global lookup per call.
+# Every module imports this one, so the sinks import logging and tempfile only when they are used.
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the quantile, capped at the largest observation
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsSink(ABC):
+    # Receives the registry whenever it is flushed
+
+    @abstractmethod
+    def emit(self, registry: "MetricsRegistry") -> None:
+        pass
+
+
+class LogSink(MetricsSink):
+
+    def __init__(self, logger: "logging.Logger | None" = None, level: int | None = None):
+        import logging
+        self.logger = logger or logging.getLogger("ledger.metrics")
+        self.level = logging.INFO if level is None else level
+
+    def emit(self, registry: "MetricsRegistry") -> None:
+        for line in registry.text_lines():
+            self.logger.log(self.level, line)
+
+
+class PrometheusFileSink(MetricsSink):
+    # Writes the Prometheus text exposition format, e.g. for the node exporter textfile collector
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def emit(self, registry: "MetricsRegistry") -> None:
+        # Replaced atomically so that a scrape never reads a partial file
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as file:
+            file.write(registry.prometheus_text())
+        os.replace(file.name, self.path)
+
+
+class MetricsRegistry:
+
+    def __init__(self, sinks: list[MetricsSink] | None = None):
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.sinks = list(sinks or [])
+        self.lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.emit(self)
+
+    def text_lines(self) -> list[str]:
+        with self.lock:
+            lines = []
+            for name, histogram in sorted(self.histograms.items()):
+                lines.append(
+                    f"{name}: calls={histogram.count} total={histogram.sum * 1e3:.3f}ms "
+                    f"mean={histogram.sum / histogram.count * 1e6:.1f}us p50<={histogram.quantile(0.5) * 1e6:.1f}us "
+                    f"p95<={histogram.quantile(0.95) * 1e6:.1f}us max={histogram.max * 1e6:.1f}us")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name}: {value}")
+            return lines
+
+    def prometheus_text(self) -> str:
+        with self.lock:
+            lines = []
+            if self.histograms:
+                lines.append("# HELP ledger_operation_seconds Latency of instrumented ledger operations.")
+                lines.append("# TYPE ledger_operation_seconds histogram")
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'ledger_operation_seconds_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'ledger_operation_seconds_sum{{operation="{name}"}} {histogram.sum!r}')
+                lines.append(f'ledger_operation_seconds_count{{operation="{name}"}} {histogram.count}')
+            if self.counters:
+                lines.append("# HELP ledger_events_total Counters of ledger events.")
+                lines.append("# TYPE ledger_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'ledger_events_total{{event="{name}"}} {value}')
+            return "\n".join(lines) + "\n"
+
+
+_registry: MetricsRegistry | None = None
+
+def enable(registry: MetricsRegistry) -> MetricsRegistry:
+    global _registry
+    _registry = registry
+    return registry
+
+def disable() -> None:
+    global _registry
+    _registry = None
+
+def get_registry() -> MetricsRegistry | None:
+    return _registry
+
+def increment(name: str, amount: int = 1) -> None:
+    if _registry is not None:
+        _registry.increment(name, amount)
+
+def timed(name: str) -> Callable:
+    # Records the latency of every call in the histogram `name`, and failed calls in the counter `name.errors`
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            registry = _registry
+            if registry is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                registry.increment(f"{name}.errors")
+                raise
+            finally:
+                registry.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def timed_iterator(name: str, iterator: Iterator) -> Iterator:
+    # Records the time spent producing the items of a lazy iterator, once it is exhausted or closed
+    registry = _registry
+    if registry is None:
+        yield from iterator
+        return
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        registry.observe(name, elapsed)
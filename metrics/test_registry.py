@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from metrics import registry as metrics
+from metrics.registry import MetricsRegistry, MetricsSink, LogSink, PrometheusFileSink, Histogram, timed, timed_iterator
+
+class TestHistogram(unittest.TestCase):
+
+    def test_observe_and_quantile(self):
+        histogram = Histogram()
+        for seconds in [2e-6] * 9 + [0.2]:
+            histogram.observe(seconds)
+        self.assertEqual(histogram.count, 10)
+        self.assertAlmostEqual(histogram.sum, 9 * 2e-6 + 0.2)
+        self.assertEqual(histogram.quantile(0.5), 5e-6)
+        self.assertEqual(histogram.quantile(1.0), 0.2)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.enable(MetricsRegistry())
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_timed_records_calls(self):
+        @timed("test.operation")
+        def operation(value):
+            return value * 2
+
+        self.assertEqual(operation(2), 4)
+        self.assertEqual(operation(3), 6)
+        self.assertEqual(self.registry.histograms["test.operation"].count, 2)
+
+    def test_timed_counts_errors(self):
+        @timed("test.failing")
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            failing()
+        self.assertEqual(self.registry.counters["test.failing.errors"], 1)
+        self.assertEqual(self.registry.histograms["test.failing"].count, 1)
+
+    def test_timed_iterator_records_once(self):
+        items = list(timed_iterator("test.iterate", iter([1, 2, 3])))
+        self.assertEqual(items, [1, 2, 3])
+        self.assertEqual(self.registry.histograms["test.iterate"].count, 1)
+
+    def test_disabled_records_nothing(self):
+        metrics.disable()
+
+        @timed("test.operation")
+        def operation():
+            return 1
+
+        operation()
+        metrics.increment("test.counter")
+        self.assertEqual(self.registry.histograms, {})
+        self.assertEqual(self.registry.counters, {})
+
+    def test_text_lines(self):
+        self.registry.observe("ledger.add_account", 1e-4)
+        self.registry.increment("transaction_dao.transactions_added", 3)
+        lines = self.registry.text_lines()
+        self.assertTrue(lines[0].startswith("ledger.add_account: calls=1"))
+        self.assertEqual(lines[1], "transaction_dao.transactions_added: 3")
+
+    def test_prometheus_text(self):
+        self.registry.observe("ledger.add_account", 1e-4)
+        self.registry.increment("transaction_dao.transactions_added", 3)
+        text = self.registry.prometheus_text()
+        self.assertIn('ledger_operation_seconds_bucket{operation="ledger.add_account",le="0.0001"} 1', text)
+        self.assertIn('ledger_operation_seconds_bucket{operation="ledger.add_account",le="+Inf"} 1', text)
+        self.assertIn('ledger_operation_seconds_count{operation="ledger.add_account"} 1', text)
+        self.assertIn('ledger_events_total{event="transaction_dao.transactions_added"} 3', text)
+
+    def test_prometheus_file_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ledger.prom")
+            self.registry.sinks.append(PrometheusFileSink(path))
+            self.registry.increment("transaction_dao.transactions_added")
+            self.registry.flush()
+            with open(path) as file:
+                self.assertEqual(file.read(), self.registry.prometheus_text())
+
+    def test_log_sink(self):
+        logger = mock.Mock()
+        self.registry.sinks.append(LogSink(logger))
+        self.registry.increment("transaction_dao.transactions_added")
+        self.registry.flush()
+        logger.log.assert_called_once()
+
+    def test_sinks_implement_emit(self):
+        class NoEmitSink(MetricsSink):
+            pass
+        with self.assertRaises(TypeError):
+            NoEmitSink()
+
+
+if __name__ == '__main__':
+    unittest.main()
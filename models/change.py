@@ -0,0 +1,30 @@
+from dataclasses import dataclass, field
+from enum import Enum
+
+from models.account import Account
+from models.transaction import Transaction
+
+class ChangeKind(Enum):
+
+    ACCOUNT_ADDED = "account_added"
+    TRANSACTION_POSTED = "transaction_posted"
+
+    def __str__(self):
+        return str(self.value)
+
+# One entry of the ledger's change feed. Sequence numbers start at 1 and have no gaps.
+# A posted transaction carries the net change of each account it posts to, and each of those
+# accounts' balance right after it.
+@dataclass(frozen=True)
+class Change:
+    sequence: int
+    kind: ChangeKind
+    account: Account | None = None  # Set for ACCOUNT_ADDED
+    transaction: Transaction | None = None  # Set for TRANSACTION_POSTED
+    balance_deltas: dict[int, int] = field(default_factory=dict)  # Net change by account ID
+    balances: dict[int, int] = field(default_factory=dict)  # Balance after the change by account ID
+
+    def __str__(self):
+        if self.kind == ChangeKind.ACCOUNT_ADDED:
+            return f"Change(sequence={self.sequence}, kind='{self.kind}', account_id={self.account.id})"
+        return f"Change(sequence={self.sequence}, kind='{self.kind}', transaction_id={self.transaction.id}, balance_deltas={self.balance_deltas})"
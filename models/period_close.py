@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+@dataclass(frozen=True)
+class PeriodClose:
+    # Balances of every account at the end of a closed accounting period. Postings dated at or
+    # before a close are rejected, so these balances never change.
+    timestamp: datetime
+    balances: dict[int, int]  # Closing balance by account ID
+
+    def __str__(self):
+        return f"PeriodClose(timestamp='{self.timestamp.isoformat()}', accounts={len(self.balances)})"
@@ -1,11 +1,14 @@
 from dataclasses import dataclass
 from datetime import datetime
-from prettytable import PrettyTable
+from typing import Iterator
+
+from metrics.registry import timed
 
 from models.account import Account, AccountType
-from models.transaction import Transaction
+from models.transaction import Posting, Transaction, TransactionCursor
 
-# Immutable dataclasses for representing a report
+# Immutable dataclasses for representing a report.
+# prettytable is imported by the table_str methods on first use, sessions that never render a table don't load it.
 
 @dataclass(frozen=True)
 class ReportEntry:
@@ -33,7 +36,9 @@ class TrialBalanceReport:
                 f"debits={debits_str}, debits_total={self.debits_total}, "
                 f"credits={credits_str}, credits_total={self.credits_total})")
     
+    @timed("report.trial_balance.table_str")
     def table_str(self) -> str:
+        from prettytable import PrettyTable
         table = PrettyTable()
         table.field_names = ["Account ID", "Account Name", "Type", "Balance"]
         table.add_rows(
@@ -48,23 +53,83 @@ class TrialBalanceReport:
         table.add_row(["", "Total Credits", "", self.credits_total], divider=True)
         return table.get_string(title=f"Trial Balance Report as of {self.timestamp.isoformat()}")
 
+# A page of transactions in (timestamp, id) order, with a column for each of the report's accounts.
+# next_cursor is set when more transactions follow the page.
 @dataclass(frozen=True)
 class TransactionReport:
     timestamp: datetime
     accounts: list[Account]
     transactions: list[Transaction]
+    start: datetime | None = None
+    next_cursor: TransactionCursor | None = None
 
-    def table_str(self) -> str:
+    def sorted_accounts(self) -> list[Account]:
         debit_accounts = sorted([account for account in self.accounts if account.type == AccountType.DEBIT], key=lambda a: a.id)
         credit_accounts = sorted([account for account in self.accounts if account.type == AccountType.CREDIT], key=lambda a: a.id)
-        sorted_accounts = debit_accounts + credit_accounts
-        sorted_account_ids = [account.id for account in sorted_accounts]
+        return debit_accounts + credit_accounts
+
+    def iter_rows(self) -> Iterator[list]:
+        columns = {account.id: column for column, account in enumerate(self.sorted_accounts())}
+        for txn in self.transactions:
+            values = [0] * len(columns)
+            for entry in txn.entries:
+                column = columns.get(entry.account_id)
+                if column is not None:
+                    values[column] = entry.value
+            yield [txn.id, txn.timestamp.isoformat(), *values]
+
+    @timed("report.transaction.table_str")
+    def table_str(self) -> str:
+        from prettytable import PrettyTable
         table = PrettyTable()
-        table.field_names = ["Transaction ID", "Timestamp"] + [a.name for a in sorted_accounts]
-        for txn in sorted(self.transactions, key=lambda t: t.timestamp):
-            row = [txn.id, txn.timestamp.isoformat()]
-            account_values = {entry.account_id: entry.value for entry in txn.entries}
-            value_list = [account_values.get(account_id, 0) for account_id in sorted_account_ids]
-            row += value_list
+        table.field_names = ["Transaction ID", "Timestamp"] + [a.name for a in self.sorted_accounts()]
+        for row in self.iter_rows():
             table.add_row(row)
-        return table.get_string(title=f"Transaction Report as of {self.timestamp.isoformat()}")
\ No newline at end of file
+        title = f"Transaction Report as of {self.timestamp.isoformat()}"
+        if self.start is not None:
+            title = f"Transaction Report from {self.start.isoformat()} to {self.timestamp.isoformat()}"
+        return table.get_string(title=title)
+
+# One account's postings between start and timestamp in (timestamp, transaction id) order,
+# shown as a T-account: debits on the left, credits on the right and the running balance.
+# opening_balance is the balance before start.
+@dataclass(frozen=True)
+class TAccountReport:
+    timestamp: datetime
+    account: Account
+    postings: list[Posting]
+    opening_balance: int = 0
+    start: datetime | None = None
+
+    @property
+    def closing_balance(self) -> int:
+        return self.opening_balance + sum(posting.value for posting in self.postings)
+
+    def sides(self, value: int) -> tuple[int | str, int | str]:
+        # Positive values increase the balance, which is a debit for debit accounts and a credit for credit accounts
+        increases_debits = (value >= 0) == (self.account.type == AccountType.DEBIT)
+        return (abs(value), "") if increases_debits else ("", abs(value))
+
+    def iter_rows(self) -> Iterator[list]:
+        balance = self.opening_balance
+        for posting in self.postings:
+            balance += posting.value
+            yield [posting.transaction_id, posting.timestamp.isoformat(), *self.sides(posting.value), balance]
+
+    @timed("report.t_account.table_str")
+    def table_str(self) -> str:
+        from prettytable import PrettyTable
+        table = PrettyTable()
+        table.field_names = ["Transaction ID", "Timestamp", "Debit", "Credit", "Balance"]
+        table.add_row(["", "Opening Balance", "", "", self.opening_balance], divider=True)
+        rows = list(self.iter_rows())
+        table.add_rows(rows[:-1])
+        if rows:
+            table.add_row(rows[-1], divider=True)
+        debits_total = sum(row[2] for row in rows if row[2] != "")
+        credits_total = sum(row[3] for row in rows if row[3] != "")
+        table.add_row(["", "Totals", debits_total, credits_total, self.closing_balance])
+        title = f"T-Account {self.account.name} ({self.account.type}) as of {self.timestamp.isoformat()}"
+        if self.start is not None:
+            title = f"T-Account {self.account.name} ({self.account.type}) from {self.start.isoformat()} to {self.timestamp.isoformat()}"
+        return table.get_string(title=title)
@@ -3,6 +3,9 @@ from datetime import datetime
 
 # Immutable dataclasses for representing a financial transaction
 
+# Position in the (timestamp, id) ordering of transactions, used to resume paged reads
+TransactionCursor = tuple[datetime, int]
+
 @dataclass(frozen=True)
 class TransactionEntry:
     account_id: int
@@ -18,4 +21,18 @@ class Transaction:
 
     def __str__(self):
         entries_str = ", ".join(f"(Account ID: {e.account_id}, Value: {e.value})" for e in self.entries)
-        return f"Transaction(id={self.id}, timestamp='{self.timestamp.isoformat()}', entries=[{entries_str}])"
\ No newline at end of file
+        return f"Transaction(id={self.id}, timestamp='{self.timestamp.isoformat()}', entries=[{entries_str}])"
+
+
+@dataclass(frozen=True)
+class TransactionBatchResult:
+    added: tuple[Transaction, ...]
+    rejected: tuple[tuple[Transaction, str], ...]  # Each rejected transaction with the reason
+
+
+# One entry of a transaction as seen from the account it posts to
+@dataclass(frozen=True)
+class Posting:
+    transaction_id: int
+    timestamp: datetime
+    value: int